@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from api.server import ApiServer
+from system.food_delivery_system import FoodDeliverySystem
+from utils.histogram import LatencyHistogram
+from utils.security import hash_passwords
+
+async def timed_logins(api: ApiServer, usernames: list, concurrency: int) -> tuple:
+    """Log every user in, at most `concurrency` at a time. Returns (elapsed seconds, histogram, tokens)."""
+    histogram = LatencyHistogram()
+    tokens = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login(username: str) -> None:
+        async with semaphore:
+            body = json.dumps({"username": username, "password": "bench-pass"}).encode()
+            start = time.perf_counter()
+            status, payload = await api.handle("POST", "/login", body=body)
+            histogram.record(time.perf_counter() - start)
+            if status == 200:
+                tokens.append(payload["token"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login(username) for username in usernames))
+    return time.perf_counter() - start, histogram, tokens
+
+async def timed_session_calls(api: ApiServer, tokens: list) -> tuple:
+    """Make one authenticated call per token. Returns (elapsed seconds, histogram)."""
+    histogram = LatencyHistogram()
+    start = time.perf_counter()
+    for token in tokens:
+        call_start = time.perf_counter()
+        await api.handle("GET", "/orders?limit=1", {"authorization": f"Bearer {token}"})
+        histogram.record(time.perf_counter() - call_start)
+    return time.perf_counter() - start, histogram
+
+def summarise(count: int, elapsed: float, histogram: LatencyHistogram) -> dict:
+    """Throughput and latency percentiles of one phase."""
+    return {
+        "calls": count,
+        "elapsed_s": round(elapsed, 3),
+        "per_second": round(count / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {f"p{p}": round((histogram.percentile(p) or 0) * 1000, 3) for p in (50, 95, 99)}
+    }
+
+async def run_benchmark(args) -> dict:
+    """Log users in sequentially and concurrently, then reuse their sessions."""
+    system = FoodDeliverySystem()
+    system.set_autosave(False)      # Benchmark in memory only
+    usernames = [f"bench-{i}" for i in range(args.users)]
+    records = [{"username": u, "password_hash": h, "name": u}
+               for u, h in zip(usernames, hash_passwords(["bench-pass"] * args.users))]
+    system.register_customers_bulk(records)
+    api = ApiServer(system)
+
+    sequential = await timed_logins(api, usernames, 1)
+    concurrent = await timed_logins(api, usernames, args.concurrency)
+    session_elapsed, session_histogram = await timed_session_calls(api, concurrent[2])
+    return {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "workers": os.cpu_count() or 1,
+        "sequential_logins": summarise(args.users, sequential[0], sequential[1]),
+        "concurrent_logins": summarise(args.users, concurrent[0], concurrent[1]),
+        "cached_session_calls": summarise(len(concurrent[2]), session_elapsed, session_histogram)
+    }
+
+def main(argv: list = None) -> None:
+    """Entry point of the login benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark login throughput and session reuse.")
+    parser.add_argument("--users", type=int, default=200, help="Customers to log in.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Logins in flight at once.")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
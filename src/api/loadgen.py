@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.histogram import LatencyHistogram
+
+class HttpClient:
+    def __init__(self, host: str, port: int):
+        """
+        Initialize a minimal keep-alive HTTP/JSON client for load generation.
+        """
+        self.host = host
+        self.port = port
+        self.token = None
+        self._reader = None
+        self._writer = None
+
+    async def connect(self) -> None:
+        """Open the connection."""
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        """Close the connection."""
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def request(self, method: str, path: str, payload: dict = None) -> tuple:
+        """Send one request and return (status, decoded JSON body)."""
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n")
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self._writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        data = await self._reader.readexactly(length) if length else b""
+        return status, json.loads(data) if data else {}
+
+async def run_client(index: int, args, histogram: LatencyHistogram, counters: dict, deadline: float) -> None:
+    """Register and log in one virtual user, then place orders and list them until the deadline."""
+    client = HttpClient(args.host, args.port)
+    await client.connect()
+    try:
+        username = f"load-{args.run_id}-{index}"
+        await client.request("POST", "/customers", {"username": username, "password": "load-pass", "name": username})
+        status, body = await client.request("POST", "/login", {"username": username, "password": "load-pass"})
+        if status != 200:
+            counters["errors"] += 1
+            return
+        client.token = body["token"]
+
+        requests_sent = 0
+        while time.perf_counter() < deadline:
+            if requests_sent % 2 == 0:
+                method, path, payload = "POST", "/orders", {"order_type": "Takeaway", "items": {"Pizza": 1}}
+            else:
+                method, path, payload = "GET", "/orders", None
+            start = time.perf_counter()
+            status, _ = await client.request(method, path, payload)
+            histogram.record(time.perf_counter() - start)
+            counters["requests"] += 1
+            if status >= 400:
+                counters["errors"] += 1
+            requests_sent += 1
+    finally:
+        await client.close()
+
+async def run_load(args) -> dict:
+    """Run all virtual users concurrently and summarise throughput and latency."""
+    histogram = LatencyHistogram()
+    counters = {"requests": 0, "errors": 0}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(run_client(i, args, histogram, counters, deadline) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "clients": args.clients,
+        "duration_s": round(elapsed, 3),
+        "requests": counters["requests"],
+        "errors": counters["errors"],
+        "requests_per_second": round(counters["requests"] / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {f"p{p}": round((histogram.percentile(p) or 0) * 1000, 3) for p in (50, 95, 99)}
+    }
+
+def main(argv: list = None) -> None:
+    """Entry point of the load generator."""
+    parser = argparse.ArgumentParser(description="Load generator for the HTTP/JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to generate load for.")
+    parser.add_argument("--run-id", default=str(int(time.time())), help="Suffix that keeps usernames unique.")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_load(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+import asyncio
+import functools
+import json
+import re
+import signal
+import urllib.parse
+from system.export import order_record
+from system.metrics import REGISTRY
+from system.notifications import NotificationWorker
+from system.sessions import SessionCache
+from utils.constants import TENANT_IDLE_SECONDS
+from utils.security import get_hash_executor, hash_password
+
+# Seconds between background dispatch sweeps and background saves
+DISPATCH_INTERVAL = 1.0
+FLUSH_INTERVAL = 1.0
+# Seconds between sweeps of expired sessions
+SESSION_PURGE_INTERVAL = 60.0
+# Seconds between moves of old finished orders to the archive
+ARCHIVE_INTERVAL = 3600.0
+# Longest wait between checks for idle restaurants to unload, when serving several
+TENANT_EVICT_INTERVAL = 60.0
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 1024 * 1024
+# Default and largest page size of order listings
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized",
+               403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+class ApiError(Exception):
+    """An error returned to the client with an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class ApiServer:
+    def __init__(self, system, dispatch_interval: float = DISPATCH_INTERVAL, flush_interval: float = FLUSH_INTERVAL,
+                 sessions: SessionCache = None, metrics_file: str = None):
+        """
+        Initialize an HTTP/JSON API in front of a FoodDeliverySystem.
+        Requests are handled on one event loop; system calls run in worker threads, saving and
+        dispatching run as background tasks, and password hashing runs in a worker pool, so no
+        request stalls the others.
+        Metrics are served at /metrics and, if `metrics_file` is given, written there on every flush.
+        """
+        self.system = system
+        self.dispatch_interval = dispatch_interval
+        self.flush_interval = flush_interval
+        self.sessions = sessions if sessions is not None else SessionCache()
+        self.metrics_file = metrics_file
+        self._server = None
+        self._tasks = []
+        self._routes = [
+            ("POST", r"/customers", self.register),
+            ("POST", r"/login", self.login),
+            ("POST", r"/manager/login", self.manager_login),
+            ("POST", r"/logout", self.logout),
+            ("GET", r"/orders", self.list_orders),
+            ("POST", r"/orders", self.place_order),
+            ("POST", r"/orders/batch", self.place_orders_batch),
+            ("GET", r"/orders/(?P<order_id>[^/]+)", self.order_details),
+            ("POST", r"/orders/(?P<order_id>[^/]+)/cancel", self.cancel_order),
+            ("POST", r"/orders/(?P<order_id>[^/]+)/rate", self.rate_order),
+            ("POST", r"/orders/(?P<order_id>[^/]+)/reorder", self.reorder),
+            ("GET", r"/manager/orders", self.manager_list_orders),
+            ("GET", r"/reports/dashboard", self.report_dashboard),
+            ("GET", r"/reports/popular-items", self.report_popular_items),
+            ("GET", r"/reports/latency", self.report_latency),
+            ("GET", r"/reports/top-customers", self.report_top_customers),
+            ("GET", r"/metrics", self.metrics),
+        ]
+        self._routes = [(method, re.compile(pattern + "$"), handler) for method, pattern, handler in self._routes]
+
+    # --- Sessions ---
+
+    @staticmethod
+    def _token(headers: dict) -> str:
+        """Read the bearer token of a request."""
+        auth = headers.get("authorization", "")
+        return auth[7:] if auth.startswith("Bearer ") else ""
+
+    def _session(self, headers: dict, role: str) -> str:
+        """Return the username of the request's session, checking its role."""
+        session = self.sessions.resolve(self._token(headers))
+        if session is None:
+            raise ApiError(401, "Missing or invalid session token.")
+        if session[0] != role:
+            raise ApiError(403, "This session cannot access this resource.")
+        return session[1]
+
+    def _customer(self, headers: dict):
+        """Return the customer of the request's session."""
+        username = self._session(headers, "customer")
+        if username not in self.system.customers:
+            raise ApiError(401, "Customer no longer exists.")
+        return self.system.customers[username]
+
+    # --- Handlers ---
+
+    @staticmethod
+    async def _in_hash_pool(func, *args):
+        """Run a password hashing call in the worker pool."""
+        return await asyncio.get_running_loop().run_in_executor(get_hash_executor(), func, *args)
+
+    @staticmethod
+    async def _in_thread(func, *args, **kwargs):
+        """
+        Run a system call in a worker thread, so a call waiting for a lock (e.g. while a snapshot
+        is taken) or scanning the history does not hold up the event loop.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def register(self, headers, query, body):
+        username, password, name = body.get("username", ""), body.get("password", ""), body.get("name", "")
+        if not username or not password or not name:
+            raise ValueError("Username, password, and name are required for registration.")
+        if username in self.system.customers:
+            raise ValueError("Username already exists.")
+        password_hash = await self._in_hash_pool(hash_password, password)
+        customer = await self._in_thread(self.system.register_customer, username, None, name,
+                                         password_hash=password_hash)
+        return 201, {"username": customer.username, "name": customer.name}
+
+    async def login(self, headers, query, body):
+        username, password = body.get("username", ""), body.get("password", "")
+        customer = self.system.customers.get(username)
+        if customer is None:
+            # Spend the time of a password check, so unknown usernames cannot be told apart
+            await self._in_hash_pool(hash_password, password)
+            raise ApiError(401, "Invalid username or password.")
+        if not await self._in_hash_pool(customer.check_password, password):
+            raise ApiError(401, "Invalid username or password.")
+        if customer.needs_rehash():
+            password_hash = await self._in_hash_pool(hash_password, password)
+            await self._in_thread(self.system.update_password, username, password_hash=password_hash)
+        return 200, {"token": self.sessions.issue("customer", customer.username)}
+
+    async def manager_login(self, headers, query, body):
+        manager = self.system.manager
+        if body.get("username") != manager.username or \
+                not await self._in_hash_pool(manager.check_password, body.get("password", "")):
+            raise ApiError(401, "Invalid manager credentials.")
+        return 200, {"token": self.sessions.issue("manager", manager.username)}
+
+    def logout(self, headers, query, body):
+        if not self.sessions.revoke(self._token(headers)):
+            raise ApiError(401, "Missing or invalid session token.")
+        return 200, {"logged_out": True}
+
+    @staticmethod
+    def _page_size(query: dict) -> int:
+        """Read the limit query parameter."""
+        try:
+            limit = int(query.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ApiError(400, "limit must be an integer.")
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise ApiError(400, f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+        return limit
+
+    async def list_orders(self, headers, query, body):
+        customer = self._customer(headers)
+        orders, next_cursor = await self._in_thread(self.system.get_customer_orders_page, customer,
+                                                    self._page_size(query), query.get("cursor"))
+        return 200, {"orders": [order_record(order) for order in orders], "next_cursor": next_cursor}
+
+    async def manager_list_orders(self, headers, query, body):
+        self._session(headers, "manager")
+        orders, next_cursor = await self._in_thread(self.system.list_orders_page, self._page_size(query),
+                                                    query.get("cursor"), status=query.get("status"))
+        return 200, {"orders": [order_record(order) for order in orders], "next_cursor": next_cursor}
+
+    async def place_order(self, headers, query, body):
+        customer = self._customer(headers)
+        items = body.get("items")
+        if not isinstance(items, dict):
+            raise ApiError(400, "Order must contain an items object.")
+        order = await self._in_thread(self.system.place_order, customer, body.get("order_type", ""), items,
+                                      special_instructions=body.get("special_instructions", ""),
+                                      promo_code=body.get("promo_code") or None)
+        return 201, order_record(order)
+
+    async def place_orders_batch(self, headers, query, body):
+        self._session(headers, "manager")
+        entries = body.get("orders")
+        if not isinstance(entries, list):
+            raise ApiError(400, "Batch must contain an orders list.")
+        orders, errors = await self._in_thread(self.system.place_orders_batch, entries)
+        return 201, {"placed": [order.order_id for order in orders],
+                     "errors": [{"index": index, "error": message} for index, message in errors]}
+
+    async def order_details(self, headers, query, body, order_id):
+        order = await self._in_thread(self.system.find_order, order_id, self._customer(headers))
+        if order is None:
+            raise ApiError(404, f"Order {order_id} not found.")
+        return 200, order_record(order)
+
+    async def cancel_order(self, headers, query, body, order_id):
+        # The freed agent is picked up by the dispatch loop, not on the request path
+        await self._in_thread(self.system.cancel_order, self._customer(headers), order_id, dispatch=False)
+        return 200, {"order_id": order_id, "status": "Cancelled"}
+
+    async def rate_order(self, headers, query, body, order_id):
+        rating = body.get("rating")
+        if not isinstance(rating, int):
+            raise ApiError(400, "Rating must be an integer between 1 and 5.")
+        await self._in_thread(self.system.rate_order, self._customer(headers), order_id, rating,
+                              body.get("feedback", ""))
+        return 200, {"order_id": order_id, "rating": rating}
+
+    async def reorder(self, headers, query, body, order_id):
+        order = await self._in_thread(self.system.reorder_previous, self._customer(headers), order_id)
+        return 201, order_record(order)
+
+    async def _history_report(self, generate) -> str:
+        """Run a report over the full history (memory and archive) in a worker thread."""
+        return await self._in_thread(lambda: generate(self.system.order_history()))
+
+    async def report_dashboard(self, headers, query, body):
+        self._session(headers, "manager")
+        return 200, {"report": await self._history_report(self.system.manager.view_restaurant_pov)}
+
+    async def report_popular_items(self, headers, query, body):
+        self._session(headers, "manager")
+        return 200, {"report": await self._history_report(self.system.manager.generate_popular_items_report)}
+
+    async def report_latency(self, headers, query, body):
+        self._session(headers, "manager")
+        return 200, {"report": await self._history_report(self.system.manager.generate_latency_report)}
+
+    async def report_top_customers(self, headers, query, body):
+        self._session(headers, "manager")
+        try:
+            n = int(query.get("n", 10))
+        except ValueError:
+            raise ApiError(400, "n must be an integer.")
+        by = query.get("by", "total_spend")
+        top = await self._in_thread(self.system.get_top_customers, n, by)
+        return 200, {"customers": [stats.to_dict() for stats in top]}
+
+    def metrics(self, headers, query, body):
+        """Metrics in the Prometheus text format (returned as text, not JSON)."""
+        return 200, REGISTRY.render()
+
+    # --- Request handling ---
+
+    async def handle(self, method: str, target: str, headers: dict = None, body: bytes = b"") -> tuple:
+        """
+        Route one request and return (status, payload).
+        Handlers may be coroutines (e.g. to wait for password hashing).
+        Validation errors from the system are returned as 400 responses.
+        """
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        path = url.path.rstrip("/") or "/"
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ApiError(400, "Request body must be a JSON object.")
+            path_matched = False
+            for route_method, pattern, handler in self._routes:
+                match = pattern.match(path)
+                if not match:
+                    continue
+                path_matched = True
+                if route_method == method:
+                    result = handler(headers or {}, query, data, **match.groupdict())
+                    return await result if asyncio.iscoroutine(result) else result
+            if path_matched:
+                raise ApiError(405, f"Method {method} not allowed.")
+            raise ApiError(404, f"No route for {path}.")
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except json.JSONDecodeError:
+            return 400, {"error": "Request body is not valid JSON."}
+        except (ValueError, TypeError) as e:
+            return 400, {"error": str(e)}
+
+    async def _read_request(self, reader):
+        """Read one HTTP/1.1 request, or return None when the client closed the connection."""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise ApiError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise ApiError(400, "Invalid Content-Length header.")
+        if length < 0:
+            raise ApiError(400, "Invalid Content-Length header.")
+        if length > MAX_BODY_SIZE:
+            raise ApiError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, version, headers, body
+
+    @staticmethod
+    def _response(status: int, payload, keep_alive: bool) -> bytes:
+        """Encode an HTTP response with a JSON body, or a plain text one if the payload is a string."""
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, default=str).encode(), "application/json"
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + body
+
+    async def _handle_connection(self, reader, writer) -> None:
+        """Serve requests on one connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ApiError as e:
+                    writer.write(self._response(e.status, {"error": str(e)}, False))
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    status, payload = await self.handle(method, target, headers, body)
+                except Exception as e:
+                    status, payload = 500, {"error": f"Internal error: {e}"}
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # --- Background work ---
+
+    def _systems(self) -> list:
+        """The systems whose background work this server runs."""
+        return [self.system]
+
+    def _session_caches(self) -> list:
+        """The session caches to purge."""
+        return [self.sessions]
+
+    async def _dispatch_loop(self) -> None:
+        """Assign waiting orders to agents periodically, in a worker thread, instead of on every request."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.dispatch_interval)
+            for system in self._systems():
+                await loop.run_in_executor(None, system.check_unassigned_orders)
+
+    async def _flush_loop(self) -> None:
+        """
+        Save pending changes periodically. Both taking the snapshot (under the exclusive state
+        lock) and writing it run in a worker thread, so requests keep being served meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            for system in self._systems():
+                if system.has_unsaved_changes():
+                    await loop.run_in_executor(None, system.flush)
+            if self.metrics_file:
+                await loop.run_in_executor(None, REGISTRY.write, self.metrics_file)
+
+    async def _purge_sessions_loop(self) -> None:
+        """Drop expired sessions periodically so the cache does not fill with dead tokens."""
+        while True:
+            await asyncio.sleep(SESSION_PURGE_INTERVAL)
+            for sessions in self._session_caches():
+                sessions.purge_expired()
+
+    async def _archive_loop(self) -> None:
+        """Move old finished orders out of memory periodically, in a worker thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(ARCHIVE_INTERVAL)
+            for system in self._systems():
+                await loop.run_in_executor(None, system.archive_orders)
+
+    def _background_loops(self) -> list:
+        """Coroutines run as background tasks while serving."""
+        return [self._dispatch_loop(), self._flush_loop(), self._purge_sessions_loop(), self._archive_loop()]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        """Start listening and the background tasks. Returns the asyncio server."""
+        for system in self._systems():
+            system.set_autosave(False)
+        self._server = await asyncio.start_server(self._handle_connection, host, port, backlog=4096)
+        self._tasks = [asyncio.create_task(coroutine) for coroutine in self._background_loops()]
+        return self._server
+
+    async def stop(self) -> None:
+        """Stop listening, cancel background tasks and save pending changes."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for system in self._systems():
+            system.set_autosave(True)
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        """Run the API until cancelled or sent SIGTERM."""
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, AttributeError):
+            pass  # No signal handlers on this platform
+        server = await self.start(host, port)
+        print(f"Serving HTTP/JSON API on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+class TenantApiServer(ApiServer):
+    TENANT_PATH = re.compile(r"^/tenants/(?P<tenant_id>[^/?]+)(?P<rest>/[^?]*)?(?P<query>\?.*)?$")
+
+    def __init__(self, registry, dispatch_interval: float = DISPATCH_INTERVAL, flush_interval: float = FLUSH_INTERVAL,
+                 idle_seconds: float = TENANT_IDLE_SECONDS, metrics_file: str = None, sink_factory=None):
+        """
+        Initialize one HTTP/JSON API serving every restaurant of a TenantRegistry, at
+        /tenants/<tenant_id>/<the single-restaurant routes>. Each restaurant has its own sessions;
+        its system is loaded on its first request (in a worker thread), kept loaded while requests
+        use it, and unloaded once idle for `idle_seconds`. With a sink_factory(tenant_id), each
+        loaded restaurant delivers customer notifications through its own NotificationWorker.
+        """
+        super().__init__(None, dispatch_interval, flush_interval, metrics_file=metrics_file)
+        self.registry = registry
+        self.idle_seconds = idle_seconds
+        self.sink_factory = sink_factory
+        self._apis = {}         # tenant_id -> ApiServer holding the restaurant's sessions (and system while loaded)
+        self._notifiers = {}    # tenant_id -> (system, NotificationWorker)
+
+    def _systems(self) -> list:
+        return list(self.registry.loaded_systems().values())
+
+    def _session_caches(self) -> list:
+        return [api.sessions for api in self._apis.values()]
+
+    def _serve_system(self, tenant_id: str, system) -> ApiServer:
+        """Get the restaurant's API, pointed at its currently loaded system."""
+        api = self._apis.get(tenant_id)
+        if api is None:
+            api = self._apis[tenant_id] = ApiServer(system)
+        if api.system is not system:     # Reloaded since its last request
+            api.system = system
+        system.set_autosave(False)       # Saved by the flush loop
+        if self.sink_factory is not None:
+            current = self._notifiers.get(tenant_id)
+            if current is None or current[0] is not system:
+                if current is not None:
+                    current[1].stop()
+                notifier = NotificationWorker(system, self.sink_factory(tenant_id))
+                notifier.start()
+                self._notifiers[tenant_id] = (system, notifier)
+        return api
+
+    async def handle(self, method: str, target: str, headers: dict = None, body: bytes = b"") -> tuple:
+        """Route a request to its restaurant, keeping the restaurant loaded until it is answered."""
+        if urllib.parse.urlsplit(target).path.rstrip("/") == "/metrics":
+            return 200, REGISTRY.render()
+        match = self.TENANT_PATH.match(target)
+        if not match:
+            return 404, {"error": "Please address a restaurant: /tenants/<tenant_id>/..."}
+        tenant_id = match.group("tenant_id")
+        try:
+            if self.registry.is_loaded(tenant_id):
+                system = self.registry.pin(tenant_id)
+            else:
+                system = await asyncio.get_running_loop().run_in_executor(None, self.registry.pin, tenant_id)
+        except ValueError as e:
+            return 404, {"error": str(e)}
+        try:
+            api = self._serve_system(tenant_id, system)
+            return await api.handle(method, (match.group("rest") or "/") + (match.group("query") or ""),
+                                    headers, body)
+        finally:
+            self.registry.unpin(tenant_id)
+            self._release_unloaded()    # Loading or unpinning may have unloaded others over the limit
+
+    def _stop_notifiers(self, tenant_ids) -> None:
+        for tenant_id in tenant_ids:
+            current = self._notifiers.pop(tenant_id, None)
+            if current is not None:
+                current[1].stop()
+
+    def _release_unloaded(self) -> None:
+        """Let go of the systems of restaurants the registry unloaded, keeping their sessions."""
+        unloaded = [tenant_id for tenant_id in set(self._apis) | set(self._notifiers)
+                    if not self.registry.is_loaded(tenant_id)]
+        for tenant_id in unloaded:
+            api = self._apis.get(tenant_id)
+            if api is not None:
+                api.system = None
+        self._stop_notifiers(unloaded)
+
+    async def _evict_loop(self) -> None:
+        """Save and unload restaurants idle for idle_seconds, in a worker thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(self.idle_seconds, TENANT_EVICT_INTERVAL))
+            await loop.run_in_executor(None, self.registry.evict_idle, self.idle_seconds)
+            self._release_unloaded()
+
+    def _background_loops(self) -> list:
+        return super()._background_loops() + [self._evict_loop()]
+
+    async def stop(self) -> None:
+        """Stop serving and save every loaded restaurant."""
+        await super().stop()
+        self._stop_notifiers(list(self._notifiers))
+
+def run_server(system, host: str = "127.0.0.1", port: int = 8080, metrics_file: str = None) -> None:
+    """Run the API server until interrupted."""
+    _serve(ApiServer(system, metrics_file=metrics_file), host, port)
+
+def run_tenant_server(registry, host: str = "127.0.0.1", port: int = 8080, metrics_file: str = None,
+                      sink_factory=None) -> None:
+    """Run one API server for every restaurant of a registry until interrupted."""
+    _serve(TenantApiServer(registry, metrics_file=metrics_file, sink_factory=sink_factory), host, port)
+
+def _serve(api: ApiServer, host: str, port: int) -> None:
+    try:
+        asyncio.run(api.serve_forever(host, port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    print("Server stopped.")
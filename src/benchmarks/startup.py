@@ -0,0 +1,153 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC_DIR)
+
+from system.datagen import generate_dataset
+from system.food_delivery_system import FoodDeliverySystem
+from system.persistence import load_system, save_system
+from utils.constants import PERSISTENCE_FILE
+
+DEFAULT_SIZES = [0, 10000, 100000, 1000000]
+DEFAULT_REPEATS = 3
+# Printed by the main menu; the app is ready once it is waiting here
+FIRST_PROMPT = b"Enter your choice: "
+# Percentage time to first prompt may grow over the baseline before it counts as a regression
+DEFAULT_THRESHOLD = 20.0
+PROMPT_TIMEOUT = 600
+
+def write_store(size: int, seed: int, workdir: str) -> str:
+    """Generate a store of `size` orders and save it. Returns the directory holding it."""
+    system = FoodDeliverySystem()
+    system.persistence_file = os.path.join(workdir, "generated.pkl")
+    system.set_autosave(False)
+    if size:
+        generate_dataset(system, size, seed=seed)
+    directory = os.path.join(workdir, str(size))
+    os.makedirs(directory)
+    save_system(system, os.path.join(directory, PERSISTENCE_FILE))
+    return directory
+
+def time_to_prompt(directory: str) -> float:
+    """Start the interactive app against the store in `directory` and time it until the main menu prompt."""
+    # Archival at startup would shrink the store after the first run, so it is left out
+    env = dict(os.environ, PYTHONUNBUFFERED="1", FDS_ARCHIVE_AFTER_DAYS="0")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, "main.py")], cwd=directory, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        output = b""
+        while not output.endswith(FIRST_PROMPT):
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError(f"The app exited before its first prompt: {output[-200:]!r}")
+            output += chunk
+            if time.perf_counter() - start > PROMPT_TIMEOUT:
+                raise RuntimeError("The app did not reach its first prompt in time.")
+        elapsed = time.perf_counter() - start
+        process.communicate(b"4\n", timeout=PROMPT_TIMEOUT)     # Quit
+        return elapsed
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+def time_load(path: str) -> float:
+    """Time loading a store in this process."""
+    start = time.perf_counter()
+    load_system(FoodDeliverySystem, path)
+    return time.perf_counter() - start
+
+def run_size(size: int, seed: int, repeats: int, workdir: str, progress=None) -> dict:
+    """Measure startup against a store of `size` orders."""
+    directory = write_store(size, seed, workdir)
+    if progress:
+        progress(f"{size} orders")
+    path = os.path.join(directory, PERSISTENCE_FILE)
+    prompts = [time_to_prompt(directory) for _ in range(repeats)]
+    loads = [time_load(path) for _ in range(repeats)]
+    return {
+        "size": size,
+        "file_bytes": os.path.getsize(path),
+        "time_to_prompt_s": round(statistics.median(prompts), 4),
+        "time_to_prompt_min_s": round(min(prompts), 4),
+        "load_s": round(statistics.median(loads), 4),
+    }
+
+def check(results: list, budget: float = None, baseline: dict = None, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Find startups slower than the budget (seconds to first prompt), or slower than in a baseline
+    report by more than `threshold` percent.
+    """
+    previous = {r["size"]: r for r in (baseline or {}).get("results", [])}
+    failures = []
+    for result in results:
+        elapsed = result["time_to_prompt_s"]
+        if budget is not None and elapsed > budget:
+            failures.append({"size": result["size"], "time_to_prompt_s": elapsed,
+                             "reason": f"over the {budget}s budget"})
+        before = previous.get(result["size"])
+        if before and before["time_to_prompt_s"]:
+            change = (elapsed - before["time_to_prompt_s"]) / before["time_to_prompt_s"] * 100
+            if change > threshold:
+                failures.append({"size": result["size"], "time_to_prompt_s": elapsed,
+                                 "reason": f"{round(change, 2)}% slower than the baseline"})
+    return failures
+
+def main(argv: list = None) -> int:
+    """Entry point of the startup benchmark. Returns 1 if a startup was over budget or regressed."""
+    parser = argparse.ArgumentParser(description="Time how long the app takes to reach its first prompt.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Store sizes, in orders.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Startups timed per store.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--budget", type=float, help="Seconds to first prompt any store may take.")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Growth in time to first prompt, in percent, that counts as a regression.")
+    parser.add_argument("--out", help="Write the JSON report here instead of to stdout.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print progress.")
+    args = parser.parse_args(argv)
+
+    progress = (lambda message: print(message, file=sys.stderr)) if not args.quiet else None
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            results.append(run_size(size, args.seed, args.repeats, workdir, progress))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    failures = check(results, args.budget, baseline, args.threshold)
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "budget_s": args.budget,
+        },
+        "results": results,
+        "failures": failures,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    for failure in failures:
+        print(f"Slow startup: {failure['size']} orders took "
+              f"{failure['time_to_prompt_s']}s, {failure['reason']}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from system.food_delivery_system import FoodDeliverySystem
+from system.persistence import load_system, save_system
+from utils.constants import ORDER_TYPES
+from utils.histogram import LatencyHistogram
+from utils.security import hash_password
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+# Calls timed per operation; slow whole-store operations are repeated fewer times
+DEFAULT_ITERATIONS = {
+    "register_customer": 50,
+    "place_order": 2000,
+    "check_unassigned_orders": 5,
+    "cancel_order": 200,
+    "get_order_details": 2000,
+    "save_system": 3,
+    "load_system": 3,
+    "view_restaurant_pov": 3,
+    "generate_popular_items_report": 3,
+}
+OPERATIONS = list(DEFAULT_ITERATIONS)
+# Calls per operation in the separate pass that measures memory (tracemalloc slows calls down)
+MEMORY_ITERATIONS = 20
+# Percentage a throughput may drop below the baseline before it counts as a regression
+DEFAULT_THRESHOLD = 10.0
+POPULATE_CHUNK_SIZE = 10000
+
+def populate(system: FoodDeliverySystem, order_count: int, seed: int = 42) -> None:
+    """Fill a system with customers, agents and `order_count` orders (about ten per customer)."""
+    rng = random.Random(seed)
+    password_hash = hash_password("bench-pass")   # Hashing once keeps population fast
+    customer_count = max(10, order_count // 10)
+    system.register_customers_bulk([{"username": f"bench-{i}", "password_hash": password_hash,
+                                     "name": f"Bench {i}"} for i in range(customer_count)])
+    system.add_delivery_agents([{"agent_id": f"BA{i}", "name": f"Bench Agent {i}"} for i in range(20)])
+    items = list(system.menu)
+    for start in range(0, order_count, POPULATE_CHUNK_SIZE):
+        entries = []
+        for _ in range(min(POPULATE_CHUNK_SIZE, order_count - start)):
+            basket = {item: rng.randint(1, 3) for item in rng.sample(items, rng.randint(1, 3))}
+            entries.append({"username": f"bench-{rng.randrange(customer_count)}",
+                            "order_type": rng.choice(ORDER_TYPES), "items": basket})
+        system.place_orders_batch(entries)
+
+def operation_calls(system: FoodDeliverySystem, operation: str, iterations: int, rng: random.Random) -> list:
+    """Build the zero-argument calls to time for one operation."""
+    customers = list(system.customers.values())
+    if operation == "register_customer":
+        base = len(system.customers)
+        return [lambda i=i: system.register_customer(f"new-{base + i}", "bench-pass", "New")
+                for i in range(iterations)]
+    if operation == "place_order":
+        return [lambda c=rng.choice(customers): system.place_order(c, "Takeaway", {"Pizza": 1})
+                for _ in range(iterations)]
+    if operation == "check_unassigned_orders":
+        return [system.check_unassigned_orders] * iterations
+    if operation == "cancel_order":
+        open_orders = [o for o in system.all_orders if o.status == "Placed"]
+        orders = rng.sample(open_orders, min(iterations, len(open_orders)))
+        return [lambda o=o: system.cancel_order(system.customers[o.customer], o.order_id) for o in orders]
+    if operation == "get_order_details":
+        order_ids = [rng.choice(system.all_orders).order_id for _ in range(iterations)]
+        return [lambda order_id=order_id: system.get_order_details(order_id) for order_id in order_ids]
+    if operation == "save_system":
+        return [lambda: save_system(system, system.persistence_file)] * iterations
+    if operation == "load_system":
+        return [lambda: load_system(FoodDeliverySystem, system.persistence_file)] * iterations
+    if operation == "view_restaurant_pov":
+        return [lambda: system.manager.view_restaurant_pov(system.all_orders)] * iterations
+    if operation == "generate_popular_items_report":
+        return [lambda: system.manager.generate_popular_items_report(system.all_orders)] * iterations
+    raise ValueError(f"Unknown operation: {operation}")
+
+def time_calls(calls: list) -> dict:
+    """Run calls one by one, returning throughput and latency percentiles."""
+    histogram = LatencyHistogram()
+    gc.collect()
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        call()
+        histogram.record(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    return {
+        "count": len(calls),
+        "elapsed_s": round(elapsed, 6),
+        "ops_per_second": round(len(calls) / elapsed, 2) if calls and elapsed else None,
+        "latency_ms": {f"p{p}": round((histogram.percentile(p) or 0) * 1000, 4) for p in (50, 99)},
+    }
+
+def peak_memory(calls: list) -> int:
+    """Largest amount of memory allocated while running the calls, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for call in calls:
+            call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def max_rss_bytes() -> int:
+    """Peak resident memory of the whole process, or None where unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024   # Linux reports KiB
+
+def build_system(size: int, seed: int, workdir: str, dataset: str = None) -> FoodDeliverySystem:
+    """A system to benchmark: populated with `size` orders, or loaded from a generated dataset."""
+    if dataset:
+        system = load_system(FoodDeliverySystem, dataset)
+    else:
+        system = FoodDeliverySystem()
+    system.persistence_file = os.path.join(workdir, f"bench-{size or 'dataset'}.pkl")   # Never overwrite the dataset
+    system.set_autosave(False)      # Time the operations themselves; saving is measured by save_system
+    if not dataset:
+        populate(system, size, seed)
+    save_system(system, system.persistence_file)
+    return system
+
+def run_size(system: FoodDeliverySystem, operations: list, iterations: dict, seed: int, measure_memory: bool,
+             progress=None) -> list:
+    """Benchmark the operations against a system, labelling results with its order count."""
+    size = len(system.all_orders)
+    rng = random.Random(seed)
+    results = []
+    for operation in operations:
+        if progress:
+            progress(f"{size} orders: {operation}")
+        result = {"size": size, "operation": operation}
+        result.update(time_calls(operation_calls(system, operation, iterations[operation], rng)))
+        if measure_memory:
+            count = min(MEMORY_ITERATIONS, iterations[operation])
+            result["peak_memory_bytes"] = peak_memory(operation_calls(system, operation, count, rng))
+        results.append(result)
+    return results
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """
+    Compare results with a baseline report. Returns one entry per operation measured in both,
+    flagging a regression when throughput dropped by more than `threshold` percent.
+    """
+    previous = {(r["size"], r["operation"]): r for r in baseline.get("results", [])}
+    comparisons = []
+    for result in results:
+        before = previous.get((result["size"], result["operation"]))
+        if not before or not before.get("ops_per_second") or not result.get("ops_per_second"):
+            continue
+        change = (result["ops_per_second"] - before["ops_per_second"]) / before["ops_per_second"] * 100
+        comparisons.append({
+            "size": result["size"],
+            "operation": result["operation"],
+            "baseline_ops_per_second": before["ops_per_second"],
+            "ops_per_second": result["ops_per_second"],
+            "change_percent": round(change, 2),
+            "baseline_p99_ms": before["latency_ms"]["p99"],
+            "p99_ms": result["latency_ms"]["p99"],
+            "regression": change < -threshold,
+        })
+    return comparisons
+
+def run_suite(args) -> dict:
+    """Run every requested size and operation, and compare with the baseline if given."""
+    iterations = dict(DEFAULT_ITERATIONS)
+    if args.iterations:
+        iterations = {operation: args.iterations for operation in iterations}
+    progress = (lambda message: print(message, file=sys.stderr)) if not args.quiet else None
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in ([None] if args.dataset else args.sizes):
+            system = build_system(size, args.seed, workdir, args.dataset)
+            results.extend(run_size(system, args.operations, iterations, args.seed, not args.no_memory, progress))
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "dataset": args.dataset,
+            "max_rss_bytes": max_rss_bytes(),
+        },
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(results, json.load(f), args.threshold)
+    return report
+
+def main(argv: list = None) -> int:
+    """Entry point of the benchmark suite. Returns 1 if a regression was found."""
+    parser = argparse.ArgumentParser(description="Benchmark core FoodDeliverySystem operations.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Store sizes, in orders.")
+    parser.add_argument("--dataset", help="Benchmark a store written by 'main.py generate' instead of --sizes.")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--iterations", type=int, help="Calls per operation (default: per-operation counts).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Write the JSON report here instead of to stdout.")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Throughput drop, in percent, that counts as a regression.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory pass.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print progress.")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    regressions = [c for c in report.get("comparison", []) if c["regression"]]
+    for regression in regressions:
+        print(f"Regression: {regression['operation']} at {regression['size']} orders "
+              f"{regression['change_percent']}% ops/s", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,122 @@
 from system.food_delivery_system import FoodDeliverySystem
-from ui.cli import main_menu
+from system.journal import JournalRecorder
+from system.metrics import REGISTRY
+from system.notifications import NotificationWorker
+from system.persistence import freeze_loaded_state
+from system.tenants import TenantRegistry
+from api.server import run_tenant_server
+from ui import cli
+from ui.commands import build_parser, build_notification_sink, run_command
+from utils.constants import PROFILE_FILE
+from utils.profiling import SessionProfiler
+import os
+import sys
 
-def main():
+# Modes serving customers: the interactive menu (no subcommand) and the API server
+SESSION_COMMANDS = (None, "serve")
+# Subcommands working on stores of their own, which never load the default (or --tenant) store
+STANDALONE_COMMANDS = ("tenants", "generate", "replay")
+
+def start_profiler(args):
+    """Start a profiler if profiling was asked for on the command line or in FDS_PROFILE."""
+    mode = args.profile or os.environ.get("FDS_PROFILE")
+    if not mode:
+        return None
+    profiler = SessionProfiler(mode)    # Raises ValueError for an unknown mode
+    profiler.time_handlers(cli)
+    profiler.start()
+    return profiler
+
+def write_profile(profiler, args) -> None:
+    """Stop the profiler and write its report."""
+    profiler.stop()
+    path = args.profile_out or os.environ.get("FDS_PROFILE_OUT") or PROFILE_FILE
+    profiler.write(path)
+    print(f"Profile written to {path}.", file=sys.stderr)
+
+def archive_old_orders(system) -> None:
+    """Move finished orders older than FDS_ARCHIVE_AFTER_DAYS out of memory before the session starts."""
+    archived = system.archive_orders()
+    if archived:
+        print(f"Archived {archived} old orders.", file=sys.stderr)
+
+def start_recorder(system, args):
+    """Record the session's calls if a trace was asked for on the command line or in FDS_RECORD_TRACE."""
+    path = args.record_trace or os.environ.get("FDS_RECORD_TRACE")
+    if not path or args.command in STANDALONE_COMMANDS:
+        return None
+    if system is None:
+        raise ValueError("Traces are recorded for a single store; they cannot be used with serve --all-tenants.")
+    return JournalRecorder(path).attach(system)
+
+def serves_all_tenants(args) -> bool:
+    """Check if one API server was asked to serve every restaurant."""
+    return args.command == "serve" and args.all_tenants
+
+def serve_all_tenants(registry, args) -> None:
+    """Serve every restaurant of the registry, each notifying its customers through its own sink."""
+    run_tenant_server(registry, args.host, args.port, metrics_file=args.metrics_file,
+                      sink_factory=lambda tenant_id: build_notification_sink(args))
+
+def main(argv: list = None):
     """Entry point of the application."""
-    system = FoodDeliverySystem.get_instance()
-    main_menu(system)
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.no_metrics:
+        REGISTRY.enabled = False
+    registry = None
+    try:
+        profiler = start_profiler(args)
+        sink = build_notification_sink(args) if args.command in SESSION_COMMANDS else None
+        if serves_all_tenants(args):
+            if args.tenant:
+                raise ValueError("--tenant cannot be used with serve --all-tenants.")
+            registry = TenantRegistry()
+            system = None
+        elif args.command in STANDALONE_COMMANDS:
+            system = None
+        elif args.tenant:
+            registry = TenantRegistry()
+            system = registry.get(args.tenant)
+        else:
+            system = FoodDeliverySystem.get_instance()
+        if system is not None:
+            # Only sessions archive: exports, reports and the like leave the store as it is
+            if args.command in SESSION_COMMANDS:
+                archive_old_orders(system)
+            freeze_loaded_state()   # Once, for the store this process works on
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        recorder = start_recorder(system, args)
+    except ValueError as e:
+        parser.error(str(e))
+    except OSError as e:
+        parser.error(f"Cannot record a trace: {e}")
+    # Deliver customer notifications in the background while customers are served
+    notifier = NotificationWorker(system, sink) if sink is not None and system is not None else None
+    if notifier is not None:
+        notifier.start()
+    try:
+        if serves_all_tenants(args):
+            serve_all_tenants(registry, args)
+            return
+        if args.command:
+            run_command(system, args)
+            return
+        cli.main_menu(system)
+    finally:
+        if notifier is not None:
+            notifier.stop()
+        if recorder is not None:
+            recorder.close()
+            print(f"Trace of {recorder.count} calls written to {recorder.path}.", file=sys.stderr)
+        if registry is not None:
+            registry.close()
+        if args.metrics_file and REGISTRY.enabled:
+            REGISTRY.write(args.metrics_file)
+        if profiler is not None:
+            write_profile(profiler, args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,23 +1,50 @@
 from models.order import Order
+from utils.security import hash_password, verify_password, needs_rehash
+import hmac
 
 class Customer:
-    def __init__(self, username: str, password: str, name: str):
+    def __init__(self, username: str, password: str, name: str, password_hash: str = None):
         """
         Initialize a new customer.
+        The password is stored only as a salted hash; pass password_hash instead of a
+        password when it was already hashed (e.g. in a worker pool or by an import).
         """
-        if not username or not password or not name:
+        if not username or not (password or password_hash) or not name:
             raise ValueError("Username, password, and name are required for registration.")
         self.username = username
-        self.password = password
+        self.password_hash = password_hash or hash_password(password)
         self.name = name
         self.orders = []  # List of Order objects
         self.address = ""
         self.notifications_enabled = True
 
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled customer. Plaintext passwords from older stores are kept until the next login."""
+        if "password_hash" not in state:
+            state["_legacy_password"] = state.pop("password", None)
+            state["password_hash"] = None
+        self.__dict__.update(state)
+
+    def check_password(self, password: str) -> bool:
+        """Check a password against the stored hash."""
+        if self.password_hash is None:
+            legacy = getattr(self, "_legacy_password", None) or ""
+            return hmac.compare_digest(legacy.encode(), (password or "").encode())
+        return verify_password(password, self.password_hash)
+
+    def needs_rehash(self) -> bool:
+        """Check if the stored password should be re-hashed with the current settings."""
+        return self.password_hash is None or needs_rehash(self.password_hash)
+
+    def set_password(self, password: str = None, password_hash: str = None) -> None:
+        """Replace the password, storing only its hash."""
+        self.password_hash = password_hash or hash_password(password)
+        self.__dict__.pop("_legacy_password", None)
+
     def place_order(self, order: Order) -> None:
         """Add an order to the customer's order history."""
         self.orders.append(order)
-        
+
     def get_order_history(self) -> list:
         """Return the customer's order history."""
-        return self.orders
\ No newline at end of file
+        return self.orders
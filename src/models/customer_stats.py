@@ -0,0 +1,90 @@
+import datetime
+
+class CustomerStats:
+    def __init__(self, username: str):
+        """
+        Initialize the lifetime statistics of a customer.
+        """
+        self.username = username
+        self.order_count = 0        # Orders placed, including cancelled ones
+        self.cancelled_count = 0
+        self.total_spend = 0.0      # Totals of orders that were not cancelled
+        self.first_order_time = None
+        self.last_order_time = None
+        self.item_counts = {}       # item -> quantity over orders that were not cancelled
+        self.rating_sum = 0
+        self.rating_count = 0
+
+    def record_order(self, order) -> None:
+        """Account for a newly placed order."""
+        self.order_count += 1
+        self.total_spend += order.total
+        if self.first_order_time is None or order.order_time < self.first_order_time:
+            self.first_order_time = order.order_time
+        if self.last_order_time is None or order.order_time > self.last_order_time:
+            self.last_order_time = order.order_time
+        for item, qty in order.items.items():
+            self.item_counts[item] = self.item_counts.get(item, 0) + qty
+
+    def record_cancellation(self, order) -> None:
+        """Remove a cancelled order's spend and items."""
+        self.cancelled_count += 1
+        self.total_spend -= order.total
+        for item, qty in order.items.items():
+            remaining = self.item_counts.get(item, 0) - qty
+            if remaining > 0:
+                self.item_counts[item] = remaining
+            else:
+                self.item_counts.pop(item, None)
+
+    def record_rating(self, rating: int, previous_rating: int = None) -> None:
+        """Account for a new rating, replacing the previous one if the order was rated before."""
+        if previous_rating is not None:
+            self.rating_sum -= previous_rating
+            self.rating_count -= 1
+        self.rating_sum += rating
+        self.rating_count += 1
+
+    @property
+    def completed_count(self) -> int:
+        """Number of orders that were not cancelled."""
+        return self.order_count - self.cancelled_count
+
+    @property
+    def favourite_item(self) -> str:
+        """Most ordered item, or None if the customer has no orders."""
+        if not self.item_counts:
+            return None
+        return max(self.item_counts.items(), key=lambda x: x[1])[0]
+
+    @property
+    def average_rating(self) -> float:
+        """Average rating given by the customer, or None if nothing was rated."""
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def average_basket(self) -> float:
+        """Average spend per order that was not cancelled."""
+        return self.total_spend / self.completed_count if self.completed_count else 0.0
+
+    @property
+    def order_frequency(self) -> float:
+        """Orders per week since the first order (at least one week is assumed)."""
+        if not self.completed_count:
+            return 0.0
+        weeks = max((datetime.datetime.now() - self.first_order_time).total_seconds() / (7 * 24 * 3600), 1)
+        return self.completed_count / weeks
+
+    def to_dict(self) -> dict:
+        """Return the statistics as a plain dictionary."""
+        return {
+            "username": self.username,
+            "order_count": self.order_count,
+            "cancelled_count": self.cancelled_count,
+            "total_spend": round(self.total_spend, 2),
+            "average_basket": round(self.average_basket, 2),
+            "order_frequency": round(self.order_frequency, 2),
+            "last_order_time": self.last_order_time,
+            "favourite_item": self.favourite_item,
+            "average_rating": self.average_rating
+        }
@@ -1,46 +1,93 @@
 import datetime
-from utils.constants import MENU
+from utils.security import hash_password, verify_password
+from system.latency import collect_latency_metrics, format_latency_report, FINISHED_STATUSES
+from system.parallel_reports import run_parallel_report, format_history_report
 
 class Manager:
     def __init__(self, username: str, password: str):
         """
-        Initialize a new manager.
+        Initialize a new manager. Only a salted hash of the password is stored.
         """
         self.username = username
-        self.password = password
+        self.password_hash = hash_password(password)
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled manager, hashing the plaintext password of older stores."""
+        if "password_hash" not in state:
+            state["password_hash"] = hash_password(state.pop("password"))
+        self.__dict__.update(state)
+
+    def check_password(self, password: str) -> bool:
+        """Check a password against the stored hash."""
+        return verify_password(password, self.password_hash)
 
     def view_restaurant_pov(self, all_orders: list) -> str:
         """
         Generate a report with restaurant statistics.
         """
-        total_orders = len(all_orders)
-        home_delivery = sum(1 for order in all_orders if order.order_type == "Home Delivery")
-        takeaway = total_orders - home_delivery
-        
-        # Calculate revenue
-        revenue = 0.0
+        # One pass, since the history may be streamed from the archive
+        total_orders = home_delivery = 0
+        revenue = net_revenue = estimated_seconds = 0
+        durations = []
         for order in all_orders:
-            for item, qty in order.items.items():
-                revenue += MENU.get(item, 0) * qty
-                
-        avg_delivery_time = self.calculate_avg_delivery_time(all_orders)
+            total_orders += 1
+            home_delivery += order.order_type == "Home Delivery"
+            # Revenue from the price snapshots taken when each order was placed
+            revenue += order.subtotal
+            net_revenue += order.total
+            estimated_seconds += (order.estimated_time - order.order_time).total_seconds()
+            finished = order.status_time(*FINISHED_STATUSES)
+            if finished:
+                durations.append((finished - order.order_time).total_seconds())
+        takeaway = total_orders - home_delivery
+
+        avg_delivery_time = str(datetime.timedelta(seconds=int(estimated_seconds / total_orders))) \
+            if total_orders else "N/A"
+        avg_actual_time = str(datetime.timedelta(seconds=int(sum(durations) / len(durations)))) \
+            if durations else "N/A"
         
         report = (f"Total Orders: {total_orders}\n"
                   f"Home Delivery Orders: {home_delivery}\n"
                   f"Takeaway Orders: {takeaway}\n"
                   f"Revenue: ${revenue:.2f}\n"
-                  f"Average Estimated Time: {avg_delivery_time}\n")
+                  f"Net Revenue (after discounts): ${net_revenue:.2f}\n"
+                  f"Average Estimated Time: {avg_delivery_time}\n"
+                  f"Average Actual Time: {avg_actual_time}\n")
+        return report
+
+    def generate_latency_report(self, all_orders: list) -> str:
+        """
+        Generate p50/p95/p99 latencies for prep, agent wait, delivery and ETA error.
+        """
+        if not all_orders:
+            return "No orders to analyze."
+        return format_latency_report(collect_latency_metrics(all_orders))
+
+    def generate_top_customers_report(self, top_stats: list, by: str = "total_spend") -> str:
+        """
+        Generate a report of the top customers from their lifetime statistics.
+        """
+        if not top_stats:
+            return "No customers to analyze."
+        report = f"Top Customers by {by.replace('_', ' ').title()}:\n"
+        report += "-" * 30 + "\n"
+        for i, stats in enumerate(top_stats, 1):
+            average_rating = f"{stats.average_rating:.1f}/5" if stats.average_rating is not None else "N/A"
+            last_order = stats.last_order_time.strftime('%Y-%m-%d %H:%M') if stats.last_order_time else "N/A"
+            report += (f"{i}. {stats.username}: {stats.completed_count} orders, "
+                       f"spent ${stats.total_spend:.2f} (avg ${stats.average_basket:.2f}), "
+                       f"favourite: {stats.favourite_item or 'N/A'}, rating: {average_rating}, "
+                       f"last order: {last_order}\n")
         return report
 
-    def calculate_avg_delivery_time(self, orders: list) -> str:
+    def generate_full_history_report(self, all_orders: list, workers: int = None, statuses: list = None,
+                                     start_date: datetime.datetime = None, end_date: datetime.datetime = None) -> str:
         """
-        Calculate the average estimated delivery time.
+        Generate a report over the full order history, aggregating time partitions in parallel.
         """
-        if not orders:
-            return "N/A"
-        total_seconds = sum((order.estimated_time - order.order_time).total_seconds() for order in orders)
-        avg_seconds = total_seconds / len(orders)
-        return str(datetime.timedelta(seconds=int(avg_seconds)))
+        aggregate = run_parallel_report(all_orders, workers=workers, statuses=statuses,
+                                        start_date=start_date, end_date=end_date)
+        return format_history_report(aggregate)
         
     def generate_popular_items_report(self, all_orders: list) -> str:
         """
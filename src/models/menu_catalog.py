@@ -0,0 +1,181 @@
+import bisect
+import collections.abc
+import contextlib
+import threading
+import time
+
+class MenuItem:
+    def __init__(self, item_id: str, name: str, price: float, category: str = "", available: bool = True):
+        """
+        Initialize a menu item. The price here is the current one; earlier prices are kept
+        by the catalog, per menu version.
+        """
+        self.item_id = item_id
+        self.name = name
+        self.price = price
+        self.category = category
+        self.available = available
+
+    def to_dict(self) -> dict:
+        return {"item_id": self.item_id, "name": self.name, "price": self.price,
+                "category": self.category, "available": self.available}
+
+class MenuVersion(collections.abc.Mapping):
+    def __init__(self, version: int, prices: dict, created_at: float):
+        """
+        Initialize an immutable view of the menu at one version: item name -> price of every
+        available item. A new version is built on each change and swapped in whole, so
+        validating and pricing a basket is a dict lookup per item, without locks, however
+        many items the menu has or how often prices change.
+        """
+        self.version = version
+        self.created_at = created_at
+        self._prices = prices
+
+    def __getitem__(self, name: str) -> float:
+        return self._prices[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self._prices
+
+    def __iter__(self):
+        return iter(self._prices)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def __repr__(self) -> str:
+        return f"MenuVersion({self.version}, {self._prices!r})"
+
+class MenuCatalog:
+    def __init__(self):
+        """
+        Initialize an empty catalog of menu items with versioned prices.
+        Every change (new item, price or availability) creates a new version; orders record
+        the version they were priced against, and price_at looks old prices up.
+        """
+        self.items = {}             # item_id -> MenuItem
+        self.ids_by_name = {}       # item name -> item_id
+        self.version = 0
+        self.price_history = {}     # item_id -> [(version, price)], in version order
+        self._next_id = 1
+        self._init_runtime()
+
+    @classmethod
+    def from_prices(cls, prices: dict, categories: dict = None) -> "MenuCatalog":
+        """Create a catalog (as version 1) from an item name -> price dict."""
+        catalog = cls()
+        with catalog.changes():
+            for name, price in prices.items():
+                catalog.add_item(name, price, (categories or {}).get(name, ""))
+        return catalog
+
+    def _init_runtime(self) -> None:
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._pending = False
+        self.current = self._build_version(self.version)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for name in ["_lock", "_batch_depth", "_pending", "current"]:
+            state.pop(name, None)
+        state["current_created_at"] = self.current.created_at
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        created_at = state.pop("current_created_at", None)
+        self.__dict__.update(state)
+        self._init_runtime()
+        if created_at is not None:
+            self.current.created_at = created_at
+
+    def _build_version(self, version: int) -> MenuVersion:
+        prices = {item.name: item.price for item in self.items.values() if item.available}
+        return MenuVersion(version, prices, time.time())
+
+    def _changed(self) -> None:
+        """Publish a new version, or defer it to the end of the enclosing changes() block."""
+        if self._batch_depth:
+            self._pending = True
+            return
+        self.version += 1
+        for item in self.items.values():
+            history = self.price_history.setdefault(item.item_id, [])
+            if not history or history[-1][1] != item.price:
+                history.append((self.version, item.price))
+        self.current = self._build_version(self.version)
+
+    @contextlib.contextmanager
+    def changes(self):
+        """Group several changes into a single new version: `with catalog.changes(): ...`."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._pending:
+                    self._pending = False
+                    self._changed()
+
+    def find(self, name_or_id: str) -> MenuItem:
+        """Look an item up by id or name, raising ValueError if there is no such item."""
+        item = self.items.get(name_or_id)
+        if item is None and name_or_id in self.ids_by_name:
+            item = self.items[self.ids_by_name[name_or_id]]
+        if item is None:
+            raise ValueError(f"Menu item {name_or_id} not found.")
+        return item
+
+    def add_item(self, name: str, price: float, category: str = "", available: bool = True) -> MenuItem:
+        """Add an item to the menu."""
+        if not name:
+            raise ValueError("Menu item name is required.")
+        if price is None or price < 0:
+            raise ValueError("Menu item price must not be negative.")
+        with self._lock:
+            if name in self.ids_by_name:
+                raise ValueError(f"Menu item {name} already exists.")
+            item_id = f"I{self._next_id:04d}"
+            self._next_id += 1
+            item = MenuItem(item_id, name, price, category, available)
+            self.items[item_id] = item
+            self.ids_by_name[name] = item_id
+            self._changed()
+            return item
+
+    def set_price(self, name_or_id: str, price: float) -> None:
+        """Change an item's price."""
+        if price is None or price < 0:
+            raise ValueError("Menu item price must not be negative.")
+        with self._lock:
+            item = self.find(name_or_id)
+            if item.price != price:
+                item.price = price
+                self._changed()
+
+    def set_available(self, name_or_id: str, available: bool) -> None:
+        """Take an item off the menu (or put it back) without forgetting it."""
+        with self._lock:
+            item = self.find(name_or_id)
+            if item.available != available:
+                item.available = available
+                self._changed()
+
+    def price_at(self, name_or_id: str, version: int) -> float:
+        """The price an item had at a menu version."""
+        item = self.find(name_or_id)
+        history = self.price_history.get(item.item_id, [])
+        position = bisect.bisect_right(history, (version, float("inf"))) - 1
+        if position < 0:
+            raise ValueError(f"Menu item {item.name} did not exist at menu version {version}.")
+        return history[position][1]
+
+    def by_category(self, available_only: bool = True) -> dict:
+        """Items grouped by category, each group sorted by name."""
+        groups = {}
+        for item in sorted(self.items.values(), key=lambda i: (i.category, i.name)):
+            if item.available or not available_only:
+                groups.setdefault(item.category, []).append(item)
+        return groups
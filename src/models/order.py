@@ -1,35 +1,101 @@
 import datetime
+import time
 from utils.constants import MENU, ORDER_TYPES
+from utils.ids import new_order_id
+
+def validate_order(order_type: str, items: dict, discount: float, menu: dict) -> None:
+    """Check an order's type, items and discount, raising ValueError for the first problem."""
+    if order_type not in ORDER_TYPES:
+        raise ValueError(f"Order type must be one of {ORDER_TYPES}.")
+    if not items or not isinstance(items, dict):
+        raise ValueError("Order must contain at least one item.")
+    for item, qty in items.items():
+        if qty <= 0:
+            raise ValueError(f"Quantity for {item} must be positive.")
+        if item not in menu:
+            raise ValueError(f"Item '{item}' is not available in the menu.")
+    if discount < 0 or discount > 100:
+        raise ValueError("Discount must be between 0 and 100 percent.")
 
 class Order:
-    def __init__(self, customer_username: str, order_type: str, items: dict, special_instructions: str = "", discount: float = 0):
+    def __init__(self, customer_username: str, order_type: str, items: dict, special_instructions: str = "", discount: float = 0,
+                 menu: dict = None, validate: bool = True, order_time: datetime.datetime = None,
+                 order_id: str = None):
         """
-        Initialize a new order.
+        Initialize a new order, pricing it against `menu` (the global MENU by default).
+        When `menu` is a catalog MenuVersion, the order records which version priced it.
+        Pass validate=False only for input that has already been checked with validate_order.
+        order_time and order_id default to now and a new id; generated or imported history sets them.
         """
-        if order_type not in ORDER_TYPES:
-            raise ValueError(f"Order type must be one of {ORDER_TYPES}.")
-        if not items or not isinstance(items, dict):
-            raise ValueError("Order must contain at least one item.")
-        for item, qty in items.items():
-            if qty <= 0:
-                raise ValueError(f"Quantity for {item} must be positive.")
-            if item not in MENU:
-                raise ValueError(f"Item '{item}' is not available in the menu.")
-        if discount < 0 or discount > 100:
-            raise ValueError("Discount must be between 0 and 100 percent.")
+        menu = MENU if menu is None else menu
+        if validate:
+            validate_order(order_type, items, discount, menu)
 
-        self.order_id = f"O-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}-{customer_username}"
+        self.order_time = order_time or datetime.datetime.now()
+        self.order_id = order_id or new_order_id(self.order_time.timestamp())
         self.customer = customer_username
         self.order_type = order_type
         self.items = items
-        self.order_time = datetime.datetime.now()
         self.estimated_time = self.calculate_estimated_time()
-        self.status = "Placed"
+        self._status = "Placed"
+        self.status_history = [("Placed", self.order_time.timestamp())]  # (status, epoch seconds) per transition
         self.special_instructions = special_instructions
         self.discount = discount
+        self.promo_code = None     # Promotion that gave the discount, if any
+        self.menu_version = getattr(menu, "version", None)
         self.rating = None
         self.feedback = None
 
+        # Price snapshot taken at placement, so later menu changes do not rewrite history
+        self.unit_prices = tuple(menu[item] for item in items)  # Same order as self.items
+        self.subtotal = sum(price * qty for price, qty in zip(self.unit_prices, items.values()))
+        self.discount_amount = self.subtotal * discount / 100
+        self.total = self.subtotal - self.discount_amount
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled order, upgrading orders saved before status history was recorded."""
+        if "status" in state:
+            state["_status"] = state.pop("status")
+        state.setdefault("promo_code", None)
+        state.setdefault("menu_version", None)
+        if "status_history" not in state:
+            # Only the placement time is known for legacy orders
+            state["status_history"] = [("Placed", state["order_time"].timestamp())]
+        if "total" not in state:
+            # Orders saved before price snapshots are priced by the system loading them (see price_legacy)
+            state["unit_prices"] = None
+        self.__dict__.update(state)
+
+    def price_legacy(self, menu) -> None:
+        """
+        Snapshot the prices of an order saved before orders kept their own, from `menu` (item -> price:
+        the menu of the store it was loaded from). Items no longer on that menu are priced at 0.
+        """
+        self.unit_prices = tuple(menu.get(item, 0) for item in self.items)
+        self.subtotal = sum(price * qty for price, qty in zip(self.unit_prices, self.items.values()))
+        self.discount_amount = self.subtotal * self.discount / 100
+        self.total = self.subtotal - self.discount_amount
+        self.menu_version = getattr(menu, "version", None)
+
+    @property
+    def status(self) -> str:
+        """Current status of the order."""
+        return self._status
+
+    @status.setter
+    def status(self, value: str) -> None:
+        """Change the status, recording the transition time."""
+        if value != self._status:
+            self._status = value
+            self.status_history.append((value, time.time()))
+
+    def status_time(self, *statuses: str) -> datetime.datetime:
+        """Return when the order first entered any of the given statuses, or None."""
+        for status, timestamp in self.status_history:
+            if status in statuses:
+                return datetime.datetime.fromtimestamp(timestamp)
+        return None
+
     def calculate_estimated_time(self) -> datetime.datetime:
         """Calculate the estimated delivery/pickup time based on order type."""
         delta = datetime.timedelta(minutes=2) if self.order_type == "Home Delivery" else datetime.timedelta(minutes=10)
@@ -65,11 +131,12 @@ class Order:
         return datetime.datetime.now() >= self.estimated_time
     
     def calculate_total(self) -> float:
-        """Calculate the total price of the order."""
-        subtotal = sum(MENU.get(item, 0) * qty for item, qty in self.items.items())
-        if self.discount > 0:
-            subtotal *= (1 - self.discount / 100)
-        return subtotal
+        """Return the total price of the order, as priced when it was placed."""
+        return self.total
+
+    def price_snapshot(self) -> dict:
+        """Return the unit price of each item as priced when the order was placed."""
+        return dict(zip(self.items, self.unit_prices))
 
     def __repr__(self) -> str:
         """String representation of the order."""
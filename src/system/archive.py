@@ -0,0 +1,302 @@
+import base64
+import contextlib
+import datetime
+import heapq
+import itertools
+import json
+import os
+import pickle
+import sqlite3
+import zlib
+from system.order_index import encode_cursor
+from utils.constants import ARCHIVE_AFTER_DAYS, ARCHIVE_SUFFIX
+
+# Statuses an order never leaves; only orders in one of them are archived
+TERMINAL_STATUSES = ("Completed", "Delivered", "Picked Up", "Cancelled")
+# Rows read from the archive at a time while iterating
+FETCH_SIZE = 1000
+# Tiers of a page key: at the same instant, archived orders sort before in-memory ones
+COLD, HOT = 0, 1
+_MAX_ROWID = 2 ** 63 - 1
+# Orders are compressed one by one with raw deflate and a small window, primed with a dictionary of
+# order pickles stored in the archive: a single order is too small to compress well on its own
+WBITS = -12
+MEM_LEVEL = 4
+DICTIONARY_SIZE = 2 ** -WBITS
+DICTIONARY_SAMPLE = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    legacy_order_id TEXT,
+    customer TEXT NOT NULL,
+    order_time REAL NOT NULL,
+    status TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_by_time ON orders (order_time);
+CREATE INDEX IF NOT EXISTS orders_by_customer ON orders (customer, order_time);
+CREATE INDEX IF NOT EXISTS orders_by_legacy_id ON orders (legacy_order_id) WHERE legacy_order_id IS NOT NULL;
+"""
+
+def archive_after_days() -> float:
+    """Days after which finished orders are archived: FDS_ARCHIVE_AFTER_DAYS, or ARCHIVE_AFTER_DAYS (0: never)."""
+    value = os.environ.get("FDS_ARCHIVE_AFTER_DAYS", ARCHIVE_AFTER_DAYS)
+    try:
+        days = float(value)
+    except ValueError:
+        days = -1
+    if days < 0:
+        raise ValueError(f"Archive age must be a number of days (0 to never archive), not {value!r}.")
+    return days
+
+def archive_version(order) -> tuple:
+    """What can still change on a finished order (its status, rating and feedback), to tell if an archived copy is stale."""
+    return len(order.status_history), order.rating, order.feedback
+
+def archive_path(persistence_file: str) -> str:
+    """The archive kept next to a store."""
+    return persistence_file + ARCHIVE_SUFFIX
+
+class OrderArchive:
+    def __init__(self, path: str):
+        """
+        Open (creating it if needed) an SQLite archive of finished orders. Each order is one row
+        keyed by its id, with its customer, placement time and status as indexed columns and the
+        order itself as a compressed pickle. A connection is opened per operation, so the archive
+        can be used from any thread.
+        """
+        self.path = path
+        self._dictionary = None     # Compression dictionary, set once the first orders are archived
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            self._load_dictionary(db)
+
+    def _load_dictionary(self, db) -> bytes:
+        row = db.execute("SELECT value FROM meta WHERE key = 'dictionary'").fetchone()
+        if row is not None:
+            self._dictionary = row[0]
+        return self._dictionary
+
+    def _encode(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, WBITS, MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, self._dictionary)
+        return compressor.compress(data) + compressor.flush()
+
+    def _decode(self, data: bytes):
+        decompressor = zlib.decompressobj(WBITS, self._dictionary)
+        order = pickle.loads(decompressor.decompress(data) + decompressor.flush())
+        order.archived = True   # Read-only copy: changes to it are never saved
+        return order
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:    # Commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def add(self, orders: list) -> int:
+        """Write orders to the archive in one transaction, replacing earlier copies. Returns how many were written."""
+        pickles = [pickle.dumps(order, protocol=pickle.HIGHEST_PROTOCOL) for order in orders]
+        with self._connect() as db:
+            if self._dictionary is None and self._load_dictionary(db) is None and pickles:
+                # Another process may have written one meanwhile: the stored dictionary wins
+                db.execute("INSERT OR IGNORE INTO meta VALUES ('dictionary', ?)",
+                           (b"".join(pickles[:DICTIONARY_SAMPLE])[-DICTIONARY_SIZE:],))
+                self._load_dictionary(db)
+            rows = [(order.order_id, getattr(order, "legacy_order_id", None), order.customer,
+                     order.order_time.timestamp(), order.status, self._encode(data))
+                    for order, data in zip(orders, pickles)]
+            db.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def get(self, order_id: str, customer: str = None):
+        """Look an order up by id (or legacy id), optionally only among one customer's. Returns None if absent."""
+        sql = "SELECT data FROM orders WHERE (order_id = ? OR legacy_order_id = ?)"
+        params = [order_id, order_id]
+        if customer is not None:
+            sql += " AND customer = ?"
+            params.append(customer)
+        with self._connect() as db:
+            row = db.execute(sql + " LIMIT 1", params).fetchone()
+        return self._decode(row[0]) if row else None
+
+    @staticmethod
+    def _where(customer: str = None, start_date: datetime.datetime = None, end_date: datetime.datetime = None,
+               statuses: list = None, before: tuple = None) -> tuple:
+        """Build the WHERE clause and parameters of a query."""
+        conditions, params = [], []
+        if customer is not None:
+            conditions.append("customer = ?")
+            params.append(customer)
+        if start_date is not None:
+            conditions.append("order_time >= ?")
+            params.append(start_date.timestamp())
+        if end_date is not None:
+            conditions.append("order_time <= ?")
+            params.append(end_date.timestamp())
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if before is not None:
+            # Written so the time index still bounds the scan
+            conditions.append("order_time <= ? AND (order_time < ? OR rowid < ?)")
+            params.extend([before[0], before[0], before[1]])
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def count(self, customer: str = None, start_date: datetime.datetime = None,
+              end_date: datetime.datetime = None, statuses: list = None) -> int:
+        """Count the archived orders matching the filters."""
+        where, params = self._where(customer, start_date, end_date, statuses)
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM orders" + where, params).fetchone()[0]
+
+    def time_bounds(self, start_date: datetime.datetime = None, end_date: datetime.datetime = None,
+                    statuses: list = None) -> tuple:
+        """(first, last, count) of the matching archived orders' placement times (epoch seconds; None if none)."""
+        where, params = self._where(None, start_date, end_date, statuses)
+        with self._connect() as db:
+            return db.execute("SELECT MIN(order_time), MAX(order_time), COUNT(*) FROM orders" + where,
+                              params).fetchone()
+
+    def archived_ids(self, order_ids) -> set:
+        """The ids among `order_ids` that have an archived copy."""
+        order_ids = list(order_ids)
+        found = set()
+        with self._connect() as db:
+            for start in range(0, len(order_ids), FETCH_SIZE):
+                chunk = order_ids[start:start + FETCH_SIZE]
+                found.update(row[0] for row in db.execute(
+                    f"SELECT order_id FROM orders WHERE order_id IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def iter_range(self, start: float, stop: float, statuses: list = None):
+        """Yield the archived orders placed from `start` up to, not including, `stop` (epoch seconds), in no set order."""
+        sql = "SELECT data FROM orders WHERE order_time >= ? AND order_time < ?"
+        params = [start, stop]
+        if statuses:
+            sql += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        with self._connect() as db:
+            cursor = db.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    return
+                for (data,) in rows:
+                    yield self._decode(data)
+
+    def counts_by_customer(self) -> dict:
+        """Number of archived orders per customer username."""
+        with self._connect() as db:
+            return dict(db.execute("SELECT customer, COUNT(*) FROM orders GROUP BY customer"))
+
+    def iter_entries(self, customer: str = None, start_date: datetime.datetime = None,
+                     end_date: datetime.datetime = None, statuses: list = None, before: tuple = None,
+                     newest_first: bool = False):
+        """
+        Yield ((order_time, rowid), order) for the archived orders matching the filters, in time
+        order (or newest first), reading FETCH_SIZE rows at a time. With `before`, only orders
+        whose key is lower are yielded.
+        """
+        where, params = self._where(customer, start_date, end_date, statuses, before)
+        direction = "DESC" if newest_first else "ASC"
+        sql = f"SELECT order_time, rowid, data FROM orders{where} ORDER BY order_time {direction}, rowid {direction}"
+        with self._connect() as db:
+            cursor = db.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    return
+                for timestamp, rowid, data in rows:
+                    yield (timestamp, rowid), self._decode(data)
+
+def decode_tiered_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor of a page spanning memory and the archive into (timestamp, tier, tiebreak).
+    Cursors of the in-memory index alone are accepted too.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(key) == 2:
+            return (float(key[0]), HOT, int(key[1]))
+        timestamp, tier, tiebreak = key
+        return (float(timestamp), int(tier), int(tiebreak))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor.")
+
+def tier_bounds(before: tuple) -> tuple:
+    """Split a tiered cursor key into the bounds of the in-memory index and of the archive."""
+    if before is None:
+        return None, None
+    timestamp, tier, tiebreak = before
+    if tier == HOT:
+        return (timestamp, tiebreak), (timestamp, _MAX_ROWID)
+    return (timestamp, -1), (timestamp, tiebreak)
+
+def page_tiers(hot_entries, cold_entries, page_size: int) -> tuple:
+    """
+    Merge newest-first ((timestamp, tiebreak), order) streams from memory and from the archive
+    into one page. Returns (orders, next_cursor), like OrderTimeIndex.page.
+    """
+    hot = (((timestamp, HOT, tiebreak), order) for (timestamp, tiebreak), order in hot_entries)
+    cold = (((timestamp, COLD, tiebreak), order) for (timestamp, tiebreak), order in cold_entries)
+    merged = list(itertools.islice(heapq.merge(hot, cold, key=lambda entry: entry[0], reverse=True),
+                                   page_size + 1))
+    orders = [order for _, order in merged[:page_size]]
+    if len(merged) > page_size:
+        return orders, encode_cursor(merged[page_size - 1][0])
+    return orders, None
+
+class OrderHistory:
+    def __init__(self, orders: list, archive: OrderArchive = None, in_memory_ids=(),
+                 start_date: datetime.datetime = None, end_date: datetime.datetime = None, statuses: list = None):
+        """
+        Every order of a system, archived and in memory, as a sequence reports can iterate
+        (more than once) and take the length of. Archived orders are streamed from disk on each
+        pass, before the in-memory ones; an order in memory hides its archived copy.
+        """
+        self.orders = orders
+        self.archive = archive
+        self.in_memory_ids = in_memory_ids
+        self.start_date = start_date
+        self.end_date = end_date
+        self.statuses = list(statuses) if statuses else None
+
+    def _matches(self, order) -> bool:
+        return ((self.start_date is None or order.order_time >= self.start_date)
+                and (self.end_date is None or order.order_time <= self.end_date)
+                and (self.statuses is None or order.status in self.statuses))
+
+    def __iter__(self):
+        if self.archive is not None:
+            for _, order in self.archive.iter_entries(start_date=self.start_date, end_date=self.end_date,
+                                                      statuses=self.statuses):
+                if order.order_id not in self.in_memory_ids:
+                    yield order
+        filtered = self.start_date is not None or self.end_date is not None or self.statuses is not None
+        for order in self.orders:
+            if not filtered or self._matches(order):
+                yield order
+
+    def __len__(self) -> int:
+        if self.start_date is None and self.end_date is None and self.statuses is None:
+            orders = self.orders
+        else:
+            orders = [order for order in self.orders if self._matches(order)]
+        count = len(orders)
+        if self.archive is not None:
+            first, last, archived = self.archive.time_bounds(self.start_date, self.end_date, self.statuses)
+            if archived:
+                # Finished orders still in memory (e.g. while being archived) hide their archived copy
+                both = [order.order_id for order in orders
+                        if order.status in TERMINAL_STATUSES and order.order_id in self.in_memory_ids
+                        and first <= order.order_time.timestamp() <= last]
+                count += archived - len(self.archive.archived_ids(both))
+        return count
@@ -0,0 +1,185 @@
+import bisect
+import datetime
+import itertools
+import random
+from models.order import Order
+from utils.ids import OrderIdGenerator
+from utils.security import hash_password, SALT_BYTES
+
+# Fixed default end of the generated history, so the same seed always gives the same store
+DEFAULT_END = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+DEFAULT_DAYS = 90
+DEFAULT_AGENTS = 50
+DEFAULT_CANCEL_RATE = 0.05
+DEFAULT_RATING_RATE = 0.3
+DEFAULT_CHUNK_SIZE = 100000
+# Every generated customer logs in with this password
+GENERATED_PASSWORD = "password123"
+
+# Share of orders placed in each hour of the day: lunch and dinner peaks, quiet nights
+HOURLY_WEIGHTS = [1, 0.5, 0.3, 0.2, 0.2, 0.3, 0.8, 1.5, 2.5, 3, 4, 7,
+                  10, 8, 5, 4, 5, 8, 11, 12, 9, 6, 3.5, 2]
+# Relative order volume from Monday to Sunday
+WEEKDAY_WEIGHTS = [0.85, 0.85, 0.9, 0.95, 1.2, 1.35, 1.1]
+BASKET_SIZE_WEIGHTS = [45, 30, 15, 7, 3]    # Distinct items per order: 1 to 5
+QUANTITY_WEIGHTS = [75, 20, 5]              # Quantity per item: 1 to 3
+RATING_WEIGHTS = [5, 7, 15, 33, 40]         # Ratings 1 to 5
+HOME_DELIVERY_SHARE = 0.6
+SPECIAL_INSTRUCTIONS_SHARE = 0.06
+# Orders placed less than this long before the end are still open
+OPEN_ORDER_MINUTES = 60
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn",
+               "Priya", "Wei", "Amara", "Mateo", "Yuki", "Omar", "Lena", "Ivan", "Nia", "Kofi"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Patel", "Okafor", "Kim", "Novak", "Silva", "Khan", "Muller",
+              "Rossi", "Sato", "Cohen", "Nguyen", "Haddad", "Larsen", "Dubois", "Moreno", "Ali", "Brown"]
+STREETS = ["Main St", "Oak Ave", "Park Rd", "High St", "Lake Dr", "Hill Rd", "Elm St", "River Rd"]
+SPECIAL_INSTRUCTIONS = ["Extra spicy", "No onions", "Leave at the door", "Ring the bell twice",
+                        "Cutlery please", "Gluten free if possible"]
+FEEDBACK = {1: "Cold and late.", 2: "Not great.", 3: "It was okay.", 4: "Tasty, arrived on time.",
+            5: "Excellent, will order again!"}
+
+def _weighted_sampler(rng: random.Random, values: list, weights: list):
+    """Return a function drawing one value by weight; cumulative weights are computed once."""
+    cum_weights = list(itertools.accumulate(weights))
+    total = cum_weights[-1]
+    return lambda: values[bisect.bisect(cum_weights, rng.random() * total)]
+
+def _order_times(rng: random.Random, count: int, days: int, end: datetime.datetime) -> list:
+    """
+    Draw `count` placement times (seconds since the epoch) in the `days` before `end`, an aware
+    UTC datetime, sorted and following the weekly and daily arrival curves. Days and hours are
+    UTC ones, so the draw does not depend on the local timezone.
+    """
+    first_day = datetime.datetime.combine((end - datetime.timedelta(days=days)).date(), datetime.time(),
+                                          tzinfo=datetime.timezone.utc)
+    day_starts = []
+    weekday_weights = []
+    day = first_day
+    while day < end:
+        day_starts.append(day.timestamp())
+        weekday_weights.append(WEEKDAY_WEIGHTS[day.weekday()])
+        day += datetime.timedelta(days=1)
+    pick_day = _weighted_sampler(rng, day_starts, weekday_weights)
+    pick_hour = _weighted_sampler(rng, range(24), HOURLY_WEIGHTS)
+    start, stop = (end - datetime.timedelta(days=days)).timestamp(), end.timestamp()
+    times = []
+    while len(times) < count:
+        timestamp = pick_day() + pick_hour() * 3600 + rng.random() * 3600
+        if start <= timestamp < stop:   # The first and last days may be partial
+            times.append(timestamp)
+    times.sort()
+    return times
+
+def _finish_order(rng: random.Random, order: Order, end_ts: float, cancel_rate: float, rating_rate: float,
+                  pick_rating) -> None:
+    """Give a generated order the status history it would have reached by `end_ts`."""
+    placed = order.order_time.timestamp()
+    if end_ts - placed < OPEN_ORDER_MINUTES * 60:
+        return      # Still open: left as placed, for the dispatch sweep to pick up
+    # From the prep time rather than the local estimated_time, which a DST change would shift
+    ready = placed + (order.estimated_time - order.order_time).total_seconds()
+    if rng.random() < cancel_rate:
+        history = [("Cancelled", placed + rng.uniform(60, 600))]
+    elif order.order_type == "Home Delivery":
+        picked_up = ready + rng.uniform(0, 600)
+        history = [("Delivering", picked_up), ("Delivered", picked_up + rng.uniform(600, 2400))]
+    else:
+        history = [("Picked Up", ready + rng.uniform(0, 1800))]
+    order.status_history.extend(history)
+    order._status = history[-1][0]
+    if order._status == "Delivered" and rng.random() < rating_rate:
+        order.rating = pick_rating()
+        if rng.random() < 0.3:
+            order.feedback = FEEDBACK[order.rating]
+
+def generate_dataset(system, orders: int, customers: int = None, agents: int = DEFAULT_AGENTS,
+                     days: int = DEFAULT_DAYS, end: datetime.datetime = None, seed: int = 0,
+                     cancel_rate: float = DEFAULT_CANCEL_RATE, rating_rate: float = DEFAULT_RATING_RATE,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None) -> dict:
+    """
+    Fill a new system with a synthetic history: customers, delivery agents and `orders` orders
+    placed over the `days` before `end` (DEFAULT_END by default; a naive `end` is local time).
+    Orders are built directly at the model level, with their own placement times, and added with
+    the system's bulk calls, so a million orders take seconds. Each bulk call saves once: turn
+    autosave off around the call to save only at the end. The same arguments and seed always
+    give the same orders, ids included, whatever the local timezone. Customers default to one
+    per ten orders; all log in with GENERATED_PASSWORD.
+    `progress`, if given, is called with the number of orders built after every chunk.
+    Returns a summary of what was generated.
+    """
+    if orders < 0 or days < 1:
+        raise ValueError("Order count must not be negative and the history must span at least one day.")
+    if not 0 <= cancel_rate <= 1 or not 0 <= rating_rate <= 1:
+        raise ValueError("Cancellation and rating rates must be between 0 and 1.")
+    if system.customers or system.all_orders:
+        raise ValueError("Synthetic data can only be generated into an empty system.")
+    customers = customers if customers is not None else max(1, orders // 10)
+    if customers < 1:
+        raise ValueError("At least one customer is required.")
+    end = (end or DEFAULT_END).astimezone(datetime.timezone.utc)
+    rng = random.Random(seed)
+    menu = system.catalog.current
+    if not menu:
+        raise ValueError("The menu has no available items to order.")
+
+    # One hash shared by every customer: hashing a million passwords would dominate the run
+    password_hash = hash_password(GENERATED_PASSWORD, salt=rng.randbytes(SALT_BYTES))
+    records = []
+    weights = []
+    for i in range(customers):
+        records.append({"username": f"user{i:07d}", "password_hash": password_hash,
+                        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                        "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}",
+                        "notifications_enabled": rng.random() < 0.9})
+        weights.append(rng.lognormvariate(0, 1))    # A few customers order much more than most
+    system.register_customers_bulk(records)
+
+    next_number = itertools.count(1)
+    agent_records = []
+    while len(system.delivery_agents) + len(agent_records) < agents:
+        agent_id = f"DA{next(next_number)}"
+        if agent_id not in system.delivery_agents:
+            agent_records.append({"agent_id": agent_id, "name": f"Agent {agent_id[2:]}"})
+    system.add_delivery_agents(agent_records)
+
+    items = list(menu)
+    pick_customer = _weighted_sampler(rng, [record["username"] for record in records], weights)
+    pick_item = _weighted_sampler(rng, items, [rng.lognormvariate(0, 0.75) for _ in items])
+    pick_basket_size = _weighted_sampler(rng, range(1, len(BASKET_SIZE_WEIGHTS) + 1), BASKET_SIZE_WEIGHTS)
+    pick_quantity = _weighted_sampler(rng, range(1, len(QUANTITY_WEIGHTS) + 1), QUANTITY_WEIGHTS)
+    pick_rating = _weighted_sampler(rng, range(1, 6), RATING_WEIGHTS)
+    id_generator = OrderIdGenerator(randbytes=rng.randbytes)
+    end_ts = end.timestamp()
+
+    summary = {"customers": customers, "agents": len(system.delivery_agents), "orders": 0,
+               "cancelled": 0, "rated": 0, "open": 0}
+    created = []
+    times = _order_times(rng, orders, days, end)
+    for start in range(0, orders, chunk_size):
+        for timestamp in times[start:start + chunk_size]:
+            basket = {}
+            for _ in range(min(pick_basket_size(), len(items))):
+                item = pick_item()
+                basket[item] = basket.get(item, 0) + pick_quantity()
+            # Stored as local time, like the orders the system places itself
+            order_time = datetime.datetime.fromtimestamp(timestamp)
+            order = Order(pick_customer(),
+                          "Home Delivery" if rng.random() < HOME_DELIVERY_SHARE else "Takeaway", basket,
+                          special_instructions=rng.choice(SPECIAL_INSTRUCTIONS)
+                          if rng.random() < SPECIAL_INSTRUCTIONS_SHARE else "",
+                          menu=menu, validate=False, order_time=order_time,
+                          order_id=id_generator.new_id(timestamp))
+            _finish_order(rng, order, end_ts, cancel_rate, rating_rate, pick_rating)
+            if order.status == "Cancelled":
+                summary["cancelled"] += 1
+            elif order.rating is not None:
+                summary["rated"] += 1
+            elif order.status == "Placed":
+                summary["open"] += 1
+            created.append(order)
+        summary["orders"] = len(created)
+        if progress:
+            progress(summary["orders"])
+    system.add_order_history(created)
+    return summary
@@ -0,0 +1,61 @@
+import collections
+import threading
+import time
+
+# Order event types
+ORDER_PLACED = "order_placed"
+ORDER_READY = "order_ready"
+ORDER_ASSIGNED = "order_assigned"
+ORDER_DELIVERED = "order_delivered"
+ORDER_CANCELLED = "order_cancelled"
+EVENT_TYPES = [ORDER_PLACED, ORDER_READY, ORDER_ASSIGNED, ORDER_DELIVERED, ORDER_CANCELLED]
+
+# Order statuses that end an order successfully, by order type
+DELIVERED_STATUSES = ["Delivered", "Completed", "Picked Up"]
+
+OrderEvent = collections.namedtuple("OrderEvent", ["type", "order_id", "username", "status", "timestamp"])
+
+def order_event(event_type: str, order) -> OrderEvent:
+    """Build an event describing an order as it is now."""
+    return OrderEvent(event_type, order.order_id, order.customer, order.status, time.time())
+
+class EventBus:
+    def __init__(self):
+        """
+        Initialize an in-process publish/subscribe bus for order events.
+        Handlers run synchronously in the publishing thread, so they must be quick
+        (e.g. put the event on a queue); an error in one handler does not affect the others.
+        """
+        self._handlers = {}     # event type (None for all events) -> [handler]
+        self._lock = threading.Lock()
+        self.handler_errors = 0
+
+    def subscribe(self, handler, event_types: list = None) -> None:
+        """Call `handler(event)` for every event of the given types (all events if None)."""
+        if event_types is not None:
+            unknown = [t for t in event_types if t not in EVENT_TYPES]
+            if unknown:
+                raise ValueError(f"Unknown event types: {unknown}")
+        with self._lock:
+            for event_type in event_types or [None]:
+                # Copy on write, so publishing never needs the lock
+                self._handlers[event_type] = self._handlers.get(event_type, []) + [handler]
+
+    def unsubscribe(self, handler) -> None:
+        """Stop calling a handler."""
+        with self._lock:
+            self._handlers = {t: [h for h in handlers if h != handler]
+                              for t, handlers in self._handlers.items()}
+
+    def has_subscribers(self) -> bool:
+        """Check if publishing would reach any handler."""
+        return any(self._handlers.values())
+
+    def publish(self, event: OrderEvent) -> None:
+        """Deliver an event to its subscribers."""
+        handlers = self._handlers
+        for handler in handlers.get(event.type, []) + handlers.get(None, []):
+            try:
+                handler(event)
+            except Exception:
+                self.handler_errors += 1
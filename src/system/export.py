@@ -0,0 +1,143 @@
+import csv
+import datetime
+import gzip
+import json
+import sys
+
+# Supported export formats and record kinds
+EXPORT_FORMATS = ["csv", "jsonl"]
+EXPORT_KINDS = ["orders", "customers", "ratings"]
+DEFAULT_CHUNK_SIZE = 1000
+
+# Column order for each record kind (used as the CSV header)
+ORDER_FIELDS = ["order_id", "customer_username", "order_type", "items", "status",
+                "order_time", "estimated_time", "special_instructions", "discount", "total", "menu_version"]
+CUSTOMER_FIELDS = ["username", "name", "address", "notifications_enabled", "order_count"]
+RATING_FIELDS = ["order_id", "customer_username", "rating", "feedback", "order_time"]
+
+def iter_orders(system, start_date: datetime.datetime = None, end_date: datetime.datetime = None,
+                statuses: list = None):
+    """Yield the system's orders (archived ones included) inside the date range and with one of the statuses."""
+    yield from system.order_history(start_date, end_date, statuses)
+
+def order_record(order) -> dict:
+    """Flatten an order into an export record."""
+    return {
+        "order_id": order.order_id,
+        "customer_username": order.customer,
+        "order_type": order.order_type,
+        "items": dict(order.items),
+        "status": order.status,
+        "order_time": order.order_time.isoformat(),
+        "estimated_time": order.estimated_time.isoformat(),
+        "special_instructions": order.special_instructions,
+        "discount": order.discount,
+        "total": round(order.calculate_total(), 2),
+        "menu_version": order.menu_version
+    }
+
+def customer_record(customer) -> dict:
+    """Flatten a customer into an export record (credentials are never exported)."""
+    return {
+        "username": customer.username,
+        "name": customer.name,
+        "address": customer.address,
+        "notifications_enabled": customer.notifications_enabled,
+        "order_count": len(customer.orders)
+    }
+
+def rating_record(order) -> dict:
+    """Flatten the rating of an order into an export record."""
+    return {
+        "order_id": order.order_id,
+        "customer_username": order.customer,
+        "rating": order.rating,
+        "feedback": order.feedback or "",
+        "order_time": order.order_time.isoformat()
+    }
+
+def iter_records(system, kind: str, start_date: datetime.datetime = None,
+                 end_date: datetime.datetime = None, statuses: list = None):
+    """
+    Yield export records of the given kind.
+    Date range and status filters apply to orders and ratings; customers are always exported in full.
+    """
+    if kind == "orders":
+        for order in iter_orders(system, start_date, end_date, statuses):
+            yield order_record(order)
+    elif kind == "ratings":
+        for order in iter_orders(system, start_date, end_date, statuses):
+            if order.rating is not None:
+                yield rating_record(order)
+    elif kind == "customers":
+        archived = system.archived_order_counts()
+        for customer in system.customers.values():
+            record = customer_record(customer)
+            record["order_count"] += archived.get(customer.username, 0)
+            yield record
+    else:
+        raise ValueError(f"Export kind must be one of {EXPORT_KINDS}.")
+
+def iter_chunks(records, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Group a record stream into lists of at most chunk_size records."""
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be positive.")
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _csv_value(value):
+    """Render a record value as a single CSV cell."""
+    if isinstance(value, dict):
+        return ";".join(f"{key}:{qty}" for key, qty in value.items())
+    return value
+
+def write_records(stream, kind: str, records, fmt: str = "csv", chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write a record stream to an open text stream, one chunk at a time.
+    Returns the number of records written.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Export format must be one of {EXPORT_FORMATS}.")
+    fields = {"orders": ORDER_FIELDS, "customers": CUSTOMER_FIELDS, "ratings": RATING_FIELDS}[kind]
+
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        for chunk in iter_chunks(records, chunk_size):
+            writer.writerows([_csv_value(record[field]) for field in fields] for record in chunk)
+            count += len(chunk)
+    else:
+        for chunk in iter_chunks(records, chunk_size):
+            stream.write("".join(json.dumps(record) + "\n" for record in chunk))
+            count += len(chunk)
+    return count
+
+def export_records(system, kind: str, path: str, fmt: str = "csv", start_date: datetime.datetime = None,
+                   end_date: datetime.datetime = None, statuses: list = None, compress: bool = False,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Stream records of the given kind to a file ("-" for stdout), optionally gzip-compressed.
+    Returns the number of records written.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Export kind must be one of {EXPORT_KINDS}.")
+    records = iter_records(system, kind, start_date, end_date, statuses)
+
+    if path == "-":
+        if compress:
+            with gzip.open(sys.stdout.buffer, "wt", newline="") as stream:
+                return write_records(stream, kind, records, fmt, chunk_size)
+        return write_records(sys.stdout, kind, records, fmt, chunk_size)
+
+    if compress:
+        with gzip.open(path, "wt", newline="", encoding="utf-8") as stream:
+            return write_records(stream, kind, records, fmt, chunk_size)
+    with open(path, "w", newline="", encoding="utf-8") as stream:
+        return write_records(stream, kind, records, fmt, chunk_size)
@@ -1,19 +1,55 @@
 from models.customer import Customer
-from models.order import Order
+from models.order import Order, validate_order
 from models.delivery_agent import DeliveryAgent
 from models.manager import Manager
-from system.persistence import save_system, load_system
+from models.customer_stats import CustomerStats
+from models.menu_catalog import MenuCatalog, MenuItem, MenuVersion
+from system.persistence import load_system, dump_system, write_snapshot
+from system.metrics import REGISTRY, instrumented
+from system.journal import journaled
+from system.order_index import OrderTimeIndex
+from system.archive import OrderArchive, OrderHistory, TERMINAL_STATUSES, archive_after_days, \
+    archive_path, archive_version, decode_tiered_cursor, page_tiers, tier_bounds
+from system.promotions import Promotion, PromotionEngine, PromoCodeMap
+from system.events import EventBus, order_event, DELIVERED_STATUSES, \
+    ORDER_PLACED, ORDER_READY, ORDER_ASSIGNED, ORDER_DELIVERED, ORDER_CANCELLED
+from utils.constants import MENU, MENU_CATEGORIES, MANAGER_USERNAME, MANAGER_PASSWORD, PERSISTENCE_FILE, DISPATCH_MIN_INTERVAL
+from utils.locks import SharedExclusiveLock
+from utils.security import hash_passwords
+from utils.ids import OrderIdGenerator, is_order_id
+import collections
+import contextlib
 import datetime
+import heapq
+import itertools
+import os
+import threading
+import time
 
+@instrumented
+@journaled
 class FoodDeliverySystem:
     _instance = None
+    # Runtime-only attributes, recreated on load instead of being pickled
+    _RUNTIME_ATTRS = ["_autosave", "_dirty", "_local", "_state_lock", "_customer_locks",
+                      "_customer_locks_guard", "_dispatch_lock", "_agents_lock", "_orders_lock",
+                      "_persistence_lock", "persistence_file", "event_bus", "_events_since", "_ready_announced",
+                      "_journal", "_archive", "_last_dispatch"]
 
-    def __init__(self):
-        """Initialize the food delivery system with default data."""
+    def __init__(self, menu: dict = None, agents: dict = None):
+        """
+        Initialize the food delivery system with default data.
+        A restaurant can pass its own menu (item -> price) and agents (agent_id -> name).
+        """
+        self.catalog = MenuCatalog.from_prices(MENU if menu is None else menu, MENU_CATEGORIES)
         self.customers = {}         # username -> Customer
         self.all_orders = []        # List of Order objects
         self.delivery_agents = {}   # agent_id -> DeliveryAgent
-        self.promo_codes = {}       # promo_code -> discount percentage
+        self.promotions = PromotionEngine()     # Promotions and their usage
+        self.customer_stats = {}    # username -> CustomerStats
+        self.order_index = OrderTimeIndex()     # All orders by placement time
+        self.orders_by_id = {}                  # order_id -> Order
+        self.customer_order_indexes = {}        # username -> OrderTimeIndex of their orders
         
         # Add some default promo codes
         self.promo_codes["WELCOME50"] = 50
@@ -21,11 +57,314 @@ class FoodDeliverySystem:
         self.promo_codes["FREESHIP"] = 15
         
         # Pre-populate delivery agents
-        self.delivery_agents["DA1"] = DeliveryAgent("DA1", "Agent A")
-        self.delivery_agents["DA2"] = DeliveryAgent("DA2", "Agent B")
+        if agents is None:
+            agents = {"DA1": "Agent A", "DA2": "Agent B"}
+        for agent_id, name in agents.items():
+            self.delivery_agents[agent_id] = DeliveryAgent(agent_id, name)
         
-        # Manager with fixed credentials
-        self.manager = Manager("manager", "manager123")
+        # Manager credentials, fixed unless overridden through the environment
+        self.manager = Manager(os.environ.get("FDS_MANAGER_USERNAME", MANAGER_USERNAME),
+                               os.environ.get("FDS_MANAGER_PASSWORD", MANAGER_PASSWORD))
+        self._init_runtime()
+
+    def _init_runtime(self) -> None:
+        """Initialize runtime-only state, which is never persisted."""
+        self._autosave = True      # Save on every change; off when a server flushes in the background
+        self._dirty = False        # Changes not saved yet
+        self._local = threading.local()                 # Per-thread nesting depth of changes
+        # Changes hold this shared; taking a snapshot holds it exclusively
+        self._state_lock = SharedExclusiveLock()
+        self._customer_locks = {}                       # username -> RLock
+        self._customer_locks_guard = threading.Lock()
+        self._dispatch_lock = threading.Lock()          # One dispatch sweep at a time
+        self._agents_lock = threading.RLock()           # Agents' current_order (the assignment table)
+        self._orders_lock = threading.Lock()            # all_orders
+        self._persistence_lock = threading.Lock()       # Writes of the persistence file
+        self.persistence_file = PERSISTENCE_FILE        # Set by load_system
+        self.event_bus = EventBus()                     # Order events for notifications
+        self._events_since = time.time()                # Orders ready before this were never announced
+        self._ready_announced = set()                   # Ids of orders announced as ready
+        self._journal = None                            # JournalRecorder of public calls, if recording
+        self._archive = None                            # OrderArchive next to the persistence file, once opened
+        self._last_dispatch = 0.0                       # time.monotonic() of the last dispatch sweep
+
+    def __getstate__(self) -> dict:
+        """Return the state to pickle, leaving out runtime-only attributes."""
+        state = self.__dict__.copy()
+        for name in self._RUNTIME_ATTRS:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled system, rebuilding indexes that older stores did not save."""
+        legacy_promo_codes = state.pop("promo_codes", None)
+        legacy_menu = state.pop("menu", None)
+        self.__dict__.update(state)
+        self._init_runtime()
+        if "catalog" not in state:
+            self.catalog = MenuCatalog.from_prices(MENU if legacy_menu is None else legacy_menu, MENU_CATEGORIES)
+            # Orders from before price snapshots take the prices of the menu this store had
+            for order in self.all_orders:
+                if order.unit_prices is None:
+                    order.price_legacy(self.catalog.current)
+        if "orders_by_id" not in state:
+            self.migrate_order_ids()
+        if "promotions" not in state:
+            self.promotions = PromotionEngine()
+            self.promo_codes = legacy_promo_codes or {}
+        if "customer_stats" not in state:
+            self._rebuild_customer_stats()
+        if "order_index" not in state:
+            self._rebuild_order_indexes()
+
+    def _rebuild_customer_stats(self) -> None:
+        """Recompute every customer's lifetime statistics from their order history."""
+        self.customer_stats = {}
+        for username, customer in self.customers.items():
+            stats = CustomerStats(username)
+            for order in customer.get_order_history():
+                stats.record_order(order)
+                if order.status == "Cancelled":
+                    stats.record_cancellation(order)
+                if order.rating is not None:
+                    stats.record_rating(order.rating)
+            self.customer_stats[username] = stats
+
+    @property
+    def menu(self) -> MenuVersion:
+        """The current menu: item name -> price of every available item."""
+        return self.catalog.current
+
+    def add_menu_item(self, name: str, price: float, category: str = "") -> MenuItem:
+        """
+        Add an item to the menu.
+        """
+        with self._mutation():
+            item = self.catalog.add_item(name, price, category)
+            self.save_state()
+            return item
+
+    def update_menu_prices(self, prices: dict) -> int:
+        """
+        Change the prices of several items (name or item id -> price) as one new menu version.
+        Orders already placed keep the prices they were placed with. Returns the new version.
+        """
+        for name, price in prices.items():
+            self.catalog.find(name)     # Check every item first, so a bad entry changes nothing
+            if price is None or price < 0:
+                raise ValueError("Menu item price must not be negative.")
+        with self._mutation():
+            with self.catalog.changes():
+                for name, price in prices.items():
+                    self.catalog.set_price(name, price)
+            self.save_state()
+            return self.catalog.version
+
+    def set_menu_item_available(self, name: str, available: bool) -> None:
+        """
+        Take an item off the menu, or put it back.
+        """
+        with self._mutation():
+            self.catalog.set_available(name, available)
+            self.save_state()
+
+    @property
+    def promo_codes(self) -> PromoCodeMap:
+        """The promotions as a flat code -> percent mapping."""
+        return PromoCodeMap(self.promotions)
+
+    @promo_codes.setter
+    def promo_codes(self, codes: dict) -> None:
+        """Replace every promotion with plain code -> percent promotions."""
+        for code in list(self.promotions.promotions):
+            self.promotions.remove(code)
+        for code, percent in codes.items():
+            self.promotions.add(Promotion(code, percent))
+
+    def add_promotion(self, promotion: Promotion) -> None:
+        """
+        Add or replace a promotion.
+        """
+        with self._mutation():
+            self.promotions.add(promotion)
+            self.save_state()
+
+    def remove_promotion(self, code: str) -> None:
+        """
+        Remove a promotion.
+        """
+        with self._mutation():
+            self.promotions.remove(code)
+            self.save_state()
+
+    def _apply_promotion(self, username: str, items: dict, discount: float, promo_code: str,
+                         menu: MenuVersion) -> tuple:
+        """
+        Find the best promotion for a validated order and count its use.
+        Returns (promotion or None, discount percent); an explicit discount is kept if larger.
+        """
+        promotion, percent = self.promotions.apply(promo_code, username, items, menu)
+        if promotion is not None and percent <= discount:
+            self.promotions.release(promotion.code, username)
+            return None, discount
+        return promotion, max(percent, discount)
+
+    def _create_order(self, username: str, order_type: str, items: dict, special_instructions: str,
+                      discount: float, promo_code: str) -> Order:
+        """Validate an order, apply the best promotion and create the Order."""
+        menu = self.catalog.current     # One version for validating and pricing, even if prices change meanwhile
+        validate_order(order_type, items, discount, menu)
+        promotion, discount = self._apply_promotion(username, items, discount, promo_code, menu)
+        try:
+            order = Order(username, order_type, items, special_instructions=special_instructions,
+                          discount=discount, menu=menu, validate=False)
+        except Exception:
+            if promotion is not None:
+                self.promotions.release(promotion.code, username)
+            raise
+        order.promo_code = promotion.code if promotion is not None else None
+        return order
+
+    def migrate_order_ids(self) -> int:
+        """
+        Give every order with a legacy "O-<timestamp>-<username>" id a time-sortable id,
+        generated from its placement time, and rebuild the order indexes.
+        The old id is kept as legacy_order_id, so lookups by it keep working.
+        Returns how many orders were migrated.
+        """
+        generator = OrderIdGenerator()
+        migrated = 0
+        for order in sorted(self.all_orders, key=lambda o: o.order_time):
+            if not is_order_id(order.order_id):
+                order.legacy_order_id = order.order_id
+                order.order_id = generator.new_id(order.order_time.timestamp())
+                migrated += 1
+        self._rebuild_order_indexes()
+        return migrated
+
+    def _rebuild_order_indexes(self) -> None:
+        """Rebuild the order indexes from the order lists."""
+        self.orders_by_id = {order.order_id: order for order in self.all_orders}
+        self.order_index = OrderTimeIndex()
+        for order in sorted(self.all_orders, key=lambda o: o.order_time):
+            self.order_index.add(order)
+        self.customer_order_indexes = {}
+        for username, customer in self.customers.items():
+            index = self.customer_order_indexes[username] = OrderTimeIndex()
+            for order in sorted(customer.get_order_history(), key=lambda o: o.order_time):
+                index.add(order)
+
+    def _customer_order_index(self, username: str) -> OrderTimeIndex:
+        """Get the time-ordered index of a customer's orders, creating it if needed."""
+        index = self.customer_order_indexes.get(username)
+        if index is None:
+            index = self.customer_order_indexes[username] = OrderTimeIndex()
+        return index
+
+    def _order_archive(self, create: bool = False) -> OrderArchive:
+        """The archive of finished orders next to the persistence file, or None if there is none yet."""
+        path = archive_path(self.persistence_file)
+        if self._archive is None or self._archive.path != path:
+            if not create and not os.path.exists(path):
+                return None
+            self._archive = OrderArchive(path)
+        return self._archive
+
+    def archive_orders(self, older_than_days: float = None) -> int:
+        """
+        Move finished orders (completed, delivered, picked up or cancelled more than
+        `older_than_days` ago, by default archive_after_days()) out of memory and the snapshot
+        into the archive next to the store. Lookups, history and reports still include them,
+        but they can no longer be changed. Returns how many orders were moved.
+        """
+        days = archive_after_days() if older_than_days is None else older_than_days
+        if days <= 0:
+            return 0
+        cutoff = time.time() - days * 86400
+        with self._orders_lock:
+            orders = list(self.all_orders)
+        with self._agents_lock:
+            busy = {agent.current_order for agent in self.delivery_agents.values()}
+        old = [(order, archive_version(order)) for order in orders
+               if order.status in TERMINAL_STATUSES and order.status_history[-1][1] < cutoff and order not in busy]
+        if not old:
+            return 0
+        # Compressed and written while changes go on. Archived first: if saving the smaller
+        # snapshot fails, the copy in memory wins until the next run
+        archive = self._order_archive(create=True)
+        archive.add([order for order, _ in old])
+        with self._state_lock.exclusive():
+            # Skip orders another archival run already moved; rewrite the few rated or
+            # received since they were written
+            old = [(order, version) for order, version in old if self.orders_by_id.get(order.order_id) is order]
+            changed = [order for order, version in old if archive_version(order) != version]
+            if changed:
+                archive.add(changed)
+            old = [order for order, _ in old]
+            if not old:
+                return 0
+            moved = set(old)
+            by_customer = collections.defaultdict(set)
+            with self._orders_lock:
+                self.all_orders = [order for order in self.all_orders if order not in moved]
+                self.order_index.discard(moved)
+                for order in old:
+                    self.orders_by_id.pop(order.order_id, None)
+                    self._ready_announced.discard(order.order_id)
+                    by_customer[order.customer].add(order)
+            for username, orders in by_customer.items():
+                customer = self.customers.get(username)
+                if customer is not None:
+                    customer.orders = [order for order in customer.orders if order not in orders]
+                self._customer_order_index(username).discard(orders)
+            self._dirty = True
+        self.save_state()
+        return len(old)
+
+    def _tiered_page(self, index: OrderTimeIndex, lock, page_size: int, cursor: str,
+                     start_date: datetime.datetime, end_date: datetime.datetime, status: str = None,
+                     username: str = None) -> tuple:
+        """Page through an in-memory index merged with the matching archived orders, newest first."""
+        predicate = (lambda order: order.status == status) if status else None
+        archive = self._order_archive()
+        if archive is None:
+            with lock:
+                return index.page(page_size, cursor, start_date=start_date, end_date=end_date, predicate=predicate)
+        if page_size <= 0:
+            raise ValueError("Page size must be positive.")
+        hot_before, cold_before = tier_bounds(decode_tiered_cursor(cursor) if cursor else None)
+        with lock:
+            hot = list(itertools.islice(
+                ((key, order) for key, order in index.iter_newest(hot_before, start_date, end_date)
+                 if predicate is None or predicate(order)), page_size + 1))
+        cold = ((key, order) for key, order in archive.iter_entries(
+                    username, start_date, end_date, [status] if status else None, cold_before, newest_first=True)
+                if order.order_id not in self.orders_by_id)
+        return page_tiers(hot, cold, page_size)
+
+    def _publish(self, event_type: str, order: Order) -> None:
+        """Publish an order event, if anyone is listening."""
+        if event_type in [ORDER_DELIVERED, ORDER_CANCELLED]:
+            self._ready_announced.discard(order.order_id)
+        if self.event_bus.has_subscribers():
+            self.event_bus.publish(order_event(event_type, order))
+
+    def _assign_agent(self, agent: DeliveryAgent, order: Order) -> bool:
+        """Offer an order to an agent, publishing the assignment if the agent took it."""
+        agent.assign_order(order)
+        if agent.current_order is not order:
+            return False
+        self._publish(ORDER_ASSIGNED, order)
+        return True
+
+    def _announce_ready(self, orders: list) -> None:
+        """Publish a ready event, once, for each order whose preparation has just finished."""
+        now = datetime.datetime.now()
+        for order in orders:
+            if order.order_id not in self._ready_announced and order.status in ["Placed", "Awaiting Delivery Agent"] \
+                    and order.estimated_time <= now and order.estimated_time.timestamp() >= self._events_since:
+                self._ready_announced.add(order.order_id)
+                self._publish(ORDER_READY, order)
 
     @classmethod
     def get_instance(cls):
@@ -34,32 +373,176 @@ class FoodDeliverySystem:
             cls._instance = load_system(cls)
         return cls._instance
 
+    def _customer_lock(self, username: str) -> threading.RLock:
+        """Get the lock serializing changes for one customer."""
+        with self._customer_locks_guard:
+            lock = self._customer_locks.get(username)
+            if lock is None:
+                lock = self._customer_locks[username] = threading.RLock()
+            return lock
+
+    @contextlib.contextmanager
+    def _mutation(self, username: str = None):
+        """
+        Run a change to the system. Changes for different customers run in parallel;
+        changes for the same customer are serialized by that customer's lock.
+        A save requested during the change happens once the outermost change has finished.
+        """
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            self._state_lock.acquire_shared()
+        self._local.depth = depth + 1
+        try:
+            if username is None:
+                yield
+            else:
+                with self._customer_lock(username):
+                    yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                self._state_lock.release_shared()
+        if depth == 0 and self._autosave and self._dirty:
+            self.flush()
+
     def save_state(self) -> None:
-        """Save the current state of the system."""
-        save_system(self)
+        """Save the current state of the system, or mark it dirty while autosave is off."""
+        self._dirty = True
+        if self._autosave and not getattr(self._local, "depth", 0):
+            self.flush()
+
+    def set_autosave(self, enabled: bool) -> None:
+        """Turn saving on every change on or off. Turning it back on flushes pending changes."""
+        self._autosave = enabled
+        if enabled:
+            self.flush()
+
+    def has_unsaved_changes(self) -> bool:
+        """Check if there are changes that have not been saved yet."""
+        return self._dirty
+
+    def snapshot(self) -> bytes:
+        """
+        Serialize a consistent copy of the current state and clear the dirty flag,
+        so it can be written elsewhere. Waits for in-progress changes to finish.
+        """
+        with self._state_lock.exclusive():
+            data = dump_system(self)
+            self._dirty = False
+        return data
+
+    def flush(self) -> bool:
+        """Save pending changes, if any. Returns True if something was saved."""
+        with self._persistence_lock:
+            if not self._dirty:
+                return False
+            write_snapshot(self.snapshot(), self.persistence_file)
+        return True
 
-    def register_customer(self, username: str, password: str, name: str) -> Customer:
+    def register_customer(self, username: str, password: str, name: str, password_hash: str = None) -> Customer:
         """
         Register a new customer.
+        Pass password_hash when the password was already hashed off the request path.
         """
-        if username in self.customers:
-            raise ValueError("Username already exists.")
-        customer = Customer(username, password, name)
-        self.customers[username] = customer
-        self.save_state()
-        return customer
+        with self._mutation(username):
+            if username in self.customers:
+                raise ValueError("Username already exists.")
+            customer = Customer(username, password, name, password_hash=password_hash)
+            self.customers[username] = customer
+            self.customer_stats[username] = CustomerStats(username)
+            self.save_state()
+            return customer
+
+    def register_customers_bulk(self, records: list) -> tuple:
+        """
+        Register many customers and save once.
+        Each record is a dict with "username", "password" (or an already hashed "password_hash")
+        and "name", and optionally "address" and "notifications_enabled".
+        Usernames that already exist are skipped. Plaintext passwords are hashed in parallel.
+        Returns (registered count, duplicate usernames, errors as (record index, message)).
+        """
+        registered = 0
+        duplicates = []
+        errors = []
+        # Hash plaintext passwords up front, in the worker pool
+        to_hash = [i for i, r in enumerate(records)
+                   if not r.get("password_hash") and r.get("password") and r.get("username") not in self.customers]
+        hashes = dict(zip(to_hash, hash_passwords([records[i]["password"] for i in to_hash])))
+        with self._mutation():
+            for index, record in enumerate(records):
+                username = record.get("username")
+                with self._customer_lock(username):
+                    if username in self.customers:
+                        duplicates.append(username)
+                        continue
+                    try:
+                        customer = Customer(username, record.get("password"), record.get("name"),
+                                            password_hash=record.get("password_hash") or hashes.get(index))
+                    except ValueError as ve:
+                        errors.append((index, str(ve)))
+                        continue
+                    customer.address = record.get("address") or ""
+                    if "notifications_enabled" in record:
+                        customer.notifications_enabled = record["notifications_enabled"]
+                    self.customers[username] = customer
+                    self.customer_stats[username] = CustomerStats(username)
+                    registered += 1
+            if registered:
+                self.save_state()
+        return registered, duplicates, errors
+
+    def add_delivery_agents(self, records: list) -> tuple:
+        """
+        Add many delivery agents and save once.
+        Each record is a dict with "agent_id" and "name". Agent ids that already exist are skipped.
+        Returns (added count, duplicate agent ids, errors as (record index, message)).
+        """
+        added = 0
+        duplicates = []
+        errors = []
+        with self._mutation():
+            with self._agents_lock:
+                for index, record in enumerate(records):
+                    agent_id = record.get("agent_id")
+                    if not agent_id or not record.get("name"):
+                        errors.append((index, "Agent id and name are required."))
+                        continue
+                    if agent_id in self.delivery_agents:
+                        duplicates.append(agent_id)
+                        continue
+                    self.delivery_agents[agent_id] = DeliveryAgent(agent_id, record["name"])
+                    added += 1
+            if added:
+                self.save_state()
+        return added, duplicates, errors
 
     def login_customer(self, username: str, password: str) -> Customer:
         """
         Authenticate a customer.
         """
-        if username not in self.customers:
-            raise ValueError("Username not found. Please register first.")
-        customer = self.customers[username]
-        if customer.password != password:
+        customer = self.find_customer(username)
+        if not customer.check_password(password):
             raise ValueError("Incorrect password.")
+        if customer.needs_rehash():
+            self.update_password(username, password)
         return customer
 
+    def find_customer(self, username: str) -> Customer:
+        """
+        Get a registered customer by username, without authenticating.
+        """
+        if username not in self.customers:
+            raise ValueError("Username not found. Please register first.")
+        return self.customers[username]
+
+    def update_password(self, username: str, password: str = None, password_hash: str = None) -> None:
+        """
+        Replace a customer's password (or store an already computed hash).
+        """
+        with self._mutation(username):
+            self.find_customer(username).set_password(password, password_hash)
+            self.save_state()
+
     # Update the place_order method to better handle delivery agent assignment
     def place_order(self, customer: Customer, order_type: str, items: dict, 
                     special_instructions: str = "", discount: float = 0, 
@@ -67,102 +550,344 @@ class FoodDeliverySystem:
         """
         Place a new order.
         """
-        # Apply promo code if provided
-        if promo_code:
-            if promo_code not in self.promo_codes:
-                raise ValueError(f"Invalid promo code: {promo_code}")
-            discount = self.promo_codes[promo_code]
-            
-        order = Order(customer.username, order_type, items, 
-                      special_instructions=special_instructions, 
-                      discount=discount)
-        customer.place_order(order)
-        self.all_orders.append(order)
+        with self._mutation(customer.username):
+            # Apply the promo code if provided, or the best automatic promotion
+            order = self._create_order(customer.username, order_type, items, special_instructions,
+                                       discount, promo_code)
+            customer.place_order(order)
+            self._customer_order_index(customer.username).add(order)
+            with self._orders_lock:
+                self.all_orders.append(order)
+                self.order_index.add(order)
+                self.orders_by_id[order.order_id] = order
+            self._stats_for(customer.username).record_order(order)
+            self._publish(ORDER_PLACED, order)
         
-        # Assign delivery agent for home delivery orders
-        if order_type == "Home Delivery":
-            assigned = False
-            for agent in self.delivery_agents.values():
-                if agent.is_available():
-                    agent.assign_order(order)
-                    assigned = True
-                    break
+            # Assign delivery agent for home delivery orders
+            if order_type == "Home Delivery":
+                assigned = False
+                with self._agents_lock:
+                    for agent in self.delivery_agents.values():
+                        if agent.is_available():
+                            self._assign_agent(agent, order)
+                            assigned = True
+                            break
                     
-            if not assigned:
-                # Mark the order as awaiting assignment
-                order.status = "Awaiting Delivery Agent"
+                if not assigned:
+                    # Mark the order as awaiting assignment
+                    order.status = "Awaiting Delivery Agent"
         
-        self.save_state()
-        return order
+            self.save_state()
+            return order
+
+    def place_orders_batch(self, entries: list) -> tuple:
+        """
+        Place many orders at once, e.g. when importing from partner channels.
+        Each entry is a dict with "username", "order_type" and "items", and optionally
+        "special_instructions", "discount" and "promo_code".
+        Every entry is validated once; invalid entries are skipped and reported.
+        Agents are assigned for the whole batch together and the state is saved once.
+        Returns (orders, errors) where errors is a list of (entry index, message).
+        """
+        orders = []
+        errors = []
+        by_customer = collections.defaultdict(list)   # username -> [(index, entry)]
+        for index, entry in enumerate(entries):
+            username = entry.get("username") if isinstance(entry, dict) else None
+            if username not in self.customers:
+                errors.append((index, f"Customer {username} not found."))
+                continue
+            by_customer[username].append((index, entry))
+
+        with self._mutation():
+            placed = []   # (index, order)
+            for username, customer_entries in by_customer.items():
+                customer = self.customers[username]
+                stats = self._stats_for(username)
+                customer_index = self._customer_order_index(username)
+                with self._customer_lock(username):
+                    for index, entry in customer_entries:
+                        try:
+                            order = self._create_order(username, entry.get("order_type"), entry.get("items"),
+                                                       entry.get("special_instructions", ""),
+                                                       entry.get("discount", 0), entry.get("promo_code"))
+                        except (ValueError, TypeError) as e:
+                            errors.append((index, str(e)))
+                            continue
+                        customer.place_order(order)
+                        customer_index.add(order)
+                        stats.record_order(order)
+                        placed.append((index, order))
+
+            placed.sort(key=lambda x: x[0])   # Keep the batch order
+            orders = [order for _, order in placed]
+            with self._orders_lock:
+                self.all_orders.extend(orders)
+                for order in orders:
+                    self.order_index.add(order)
+                    self.orders_by_id[order.order_id] = order
+            for order in orders:
+                self._publish(ORDER_PLACED, order)
+
+            # Assign delivery agents for the batch's home delivery orders in one pass
+            with self._agents_lock:
+                available = collections.deque(a for a in self.delivery_agents.values() if a.is_available())
+                for order in orders:
+                    if order.order_type != "Home Delivery":
+                        continue
+                    while available and not available[0].is_available():
+                        available.popleft()
+                    if available:
+                        self._assign_agent(available[0], order)
+                    else:
+                        # Mark the order as awaiting assignment
+                        order.status = "Awaiting Delivery Agent"
+
+            if orders:
+                self.save_state()
+        errors.sort(key=lambda x: x[0])
+        return orders, errors
+
+    def add_order_history(self, orders: list) -> int:
+        """
+        Add orders that were placed elsewhere (e.g. a migrated or generated history) with their
+        own ids, times, statuses and ratings, and save once. Orders should come in placement order.
+        Nothing is validated, announced or dispatched: open orders are left to the dispatch sweep.
+        Returns how many orders were added.
+        """
+        unknown = {order.customer for order in orders} - self.customers.keys()
+        if unknown:
+            raise ValueError(f"Customer {min(unknown)} not found.")
+        by_customer = collections.defaultdict(list)   # username -> [Order]
+        for order in orders:
+            by_customer[order.customer].append(order)
+
+        with self._mutation():
+            for username, customer_orders in by_customer.items():
+                customer = self.customers[username]
+                stats = self._stats_for(username)
+                customer_index = self._customer_order_index(username)
+                with self._customer_lock(username):
+                    for order in customer_orders:
+                        customer.place_order(order)
+                        customer_index.add(order)
+                        stats.record_order(order)
+                        if order.status == "Cancelled":
+                            stats.record_cancellation(order)
+                        if order.rating is not None:
+                            stats.record_rating(order.rating)
+            with self._orders_lock:
+                self.all_orders.extend(orders)
+                for order in orders:
+                    self.order_index.add(order)
+                    self.orders_by_id[order.order_id] = order
+            if orders:
+                self.save_state()
+        return len(orders)
 
     # Add a method to check for unassigned orders and try to assign them
     def check_unassigned_orders(self) -> int:
         """
         Check for unassigned home delivery orders and try to assign them to available agents.
+        If another thread is already sweeping, this call returns 0 without waiting.
         """
-        assigned_count = 0
-        
-        for agent in self.delivery_agents.values():
-            agent.complete_order()
-            assigned_count += 1
-                    
-        # Find all home delivery orders awaiting assignment
-        unassigned_orders = [o for o in self.all_orders 
-                            if o.order_type == "Home Delivery" 
-                            and ((o.time_left() == "Order ready for pickup/delivery." and o.status == "Placed"))]
-        
-        # Try to assign them to available agents
-        for order in unassigned_orders:
-            for agent in self.delivery_agents.values():
-                if agent.is_available() and order.status != "Delivering":
-                    agent.assign_order(order)
-                    assigned_count += 1
-                    break
+        if not self._dispatch_lock.acquire(blocking=False):
+            REGISTRY.inc("fds_dispatch_sweeps_skipped_total")
+            return 0
+        try:
+            self._last_dispatch = time.monotonic()
+            with self._mutation():
+                assigned_count = 0
+                
+                with self._agents_lock:
+                    for agent in self.delivery_agents.values():
+                        order = agent.current_order
+                        agent.complete_order()
+                        if order is not None and agent.current_order is None and order.status in DELIVERED_STATUSES:
+                            self._publish(ORDER_DELIVERED, order)
+                        assigned_count += 1
+                            
+                # Find all home delivery orders awaiting assignment
+                with self._orders_lock:
+                    orders = list(self.all_orders)
+                unassigned_orders = [o for o in orders 
+                                    if o.order_type == "Home Delivery" 
+                                    and ((o.time_left() == "Order ready for pickup/delivery." and o.status == "Placed"))]
+                if self.event_bus.has_subscribers():
+                    self._announce_ready(orders)
+                
+                # Try to assign them to available agents (re-checking the status, which may have changed)
+                with self._agents_lock:
+                    for order in unassigned_orders:
+                        for agent in self.delivery_agents.values():
+                            if agent.is_available() and order.status == "Placed":
+                                self._assign_agent(agent, order)
+                                assigned_count += 1
+                                break
+                    REGISTRY.set_gauge("fds_orders_awaiting_agent",
+                                       sum(1 for order in unassigned_orders if order.status == "Placed"))
+                    REGISTRY.set_gauge("fds_idle_agents",
+                                       sum(1 for agent in self.delivery_agents.values() if agent.is_available()))
+                            
+                if assigned_count > 0:
+                    self.save_state()
                     
-        if assigned_count > 0:
-            self.save_state()
-            
-        return assigned_count
+                return assigned_count
+        finally:
+            self._dispatch_lock.release()
+
+    def dispatch_if_due(self, min_interval: float = DISPATCH_MIN_INTERVAL) -> int:
+        """
+        Run check_unassigned_orders unless a sweep started less than min_interval seconds ago,
+        so that many sessions asking for one share a sweep. Returns the number of orders assigned.
+        """
+        if time.monotonic() - self._last_dispatch < min_interval:
+            return 0
+        return self.check_unassigned_orders()
+
+    def _stats_for(self, username: str) -> CustomerStats:
+        """Get the statistics record of a customer, creating it if needed."""
+        if username not in self.customer_stats:
+            self.customer_stats[username] = CustomerStats(username)
+        return self.customer_stats[username]
+
+    def get_customer_stats(self, username: str) -> CustomerStats:
+        """
+        Get the lifetime statistics of a customer.
+        """
+        if username not in self.customers:
+            raise ValueError(f"Customer {username} not found.")
+        return self._stats_for(username)
+
+    def get_top_customers(self, n: int = 10, by: str = "total_spend") -> list:
+        """
+        Get the top n customers' statistics ranked by total_spend, order_count,
+        average_basket, order_frequency or average_rating.
+        """
+        if by not in ["total_spend", "order_count", "average_basket", "order_frequency", "average_rating"]:
+            raise ValueError(f"Cannot rank customers by {by}.")
+        if n <= 0:
+            return []
+        return heapq.nlargest(n, self.customer_stats.values(),
+                              key=lambda stats: getattr(stats, by) or 0)
 
     def get_customer_orders(self, customer: Customer) -> list:
-        """Get all orders for a specific customer."""
-        return customer.get_order_history()
+        """Get all orders for a specific customer, archived ones first."""
+        archive = self._order_archive()
+        if archive is None:
+            return customer.get_order_history()
+        archived = [order for _, order in archive.iter_entries(customer.username)
+                    if order.order_id not in self.orders_by_id]
+        return archived + customer.get_order_history()
+
+    def order_history(self, start_date: datetime.datetime = None, end_date: datetime.datetime = None,
+                      statuses: list = None) -> OrderHistory:
+        """
+        Get every order, archived and in memory, optionally filtered by placement date and status,
+        as a sequence for reports. Archived orders are read from disk each time it is iterated.
+        """
+        with self._orders_lock:
+            orders = list(self.all_orders)
+        return OrderHistory(orders, self._order_archive(), self.orders_by_id, start_date, end_date, statuses)
+
+    def archived_order_counts(self) -> dict:
+        """Get the number of archived orders of each customer, by username."""
+        archive = self._order_archive()
+        return archive.counts_by_customer() if archive is not None else {}
     
+    def find_order(self, order_id: str, customer: Customer = None) -> Order:
+        """
+        Look an order up by id (or by its id from before the migration), optionally only
+        among one customer's orders. Returns None if there is no such order.
+        """
+        order = self.orders_by_id.get(order_id)
+        if order is not None and (customer is None or order.customer == customer.username):
+            return order
+        # Legacy ids are not indexed: fall back to a scan
+        candidates = customer.get_order_history() if customer is not None else self.all_orders
+        for order in candidates:
+            if order.order_id == order_id or getattr(order, "legacy_order_id", None) == order_id:
+                return order
+        archive = self._order_archive()
+        if archive is not None:
+            return archive.get(order_id, customer.username if customer is not None else None)
+        return None
+
+    def _find_order_to_change(self, order_id: str, customer: Customer) -> Order:
+        """Look up one of a customer's orders in memory, raising ValueError if it is unknown or archived."""
+        order = self.find_order(order_id, customer)
+        if order is None:
+            raise ValueError(f"Order {order_id} not found.")
+        if getattr(order, "archived", False):
+            raise ValueError(f"Order {order_id} is archived and can no longer be changed.")
+        return order
+
     # Update the cancel_order method to check driver status
-    def cancel_order(self, customer: Customer, order_id: str) -> bool:
+    def cancel_order(self, customer: Customer, order_id: str, dispatch: bool = True) -> bool:
         """
         Cancel an order if it hasn't been delivered yet.
+        A freed agent is offered the waiting orders right away, unless `dispatch` is False
+        (e.g. when a background sweep runs anyway).
         """
-        for order in customer.get_order_history():
-            if order.order_id == order_id:
-                if order.status in ["Delivered", "Completed"]:
-                    raise ValueError("Cannot cancel an order that has already been delivered.")
-                    
-                # Check if the order has a delivery agent and the status indicates they're on the way
+        with self._mutation(customer.username):
+            order = self._find_order_to_change(order_id, customer)
+            if order.status in ["Delivered", "Completed"]:
+                raise ValueError("Cannot cancel an order that has already been delivered.")
+            
+            # Check if the order has a delivery agent and the status indicates they're on the way
+            with self._agents_lock:
                 for agent in self.delivery_agents.values():
-                    if agent.current_order and agent.current_order.order_id == order_id:
+                    if agent.current_order is order:
                         if order.status in ["Out for Delivery", "On the Way"]:
                             raise ValueError("Cannot cancel order as delivery agent is already on the way.")
                         # Free up the delivery agent
                         agent.current_order = None
                         break
-                        
-                order.status = "Cancelled"
-                self.save_state()
                 
-                # After cancelling an order, check if we can assign agents to other orders
+                if order.status != "Cancelled":
+                    self._stats_for(customer.username).record_cancellation(order)
+                    if order.promo_code:
+                        # A cancelled order does not use up the promotion
+                        self.promotions.release(order.promo_code, customer.username)
+                    order.status = "Cancelled"
+                    self._publish(ORDER_CANCELLED, order)
+            self.save_state()
+        
+            # After cancelling an order, check if we can assign agents to other orders
+            if dispatch:
                 self.check_unassigned_orders()
-                
-                return True
         
-        raise ValueError(f"Order {order_id} not found.")
+            return True
     
+    def get_customer_orders_page(self, customer: Customer, page_size: int = 10, cursor: str = None,
+                                 start_date: datetime.datetime = None, end_date: datetime.datetime = None) -> tuple:
+        """
+        Get one page of a customer's orders, newest first, optionally within a date range.
+        Returns (orders, next_cursor); pass next_cursor back for the following page (None on the last page).
+        """
+        return self._tiered_page(self._customer_order_index(customer.username),
+                                 self._customer_lock(customer.username), page_size, cursor,
+                                 start_date, end_date, username=customer.username)
+
+    def list_orders_page(self, page_size: int = 20, cursor: str = None, status: str = None,
+                         start_date: datetime.datetime = None, end_date: datetime.datetime = None) -> tuple:
+        """
+        Get one page of all orders, newest first, optionally filtered by status and date range.
+        Returns (orders, next_cursor); pass next_cursor back for the following page (None on the last page).
+        """
+        return self._tiered_page(self.order_index, self._orders_lock, page_size, cursor,
+                                 start_date, end_date, status=status)
+
     def get_orders_by_date_range(self, customer: Customer, start_date: datetime.datetime, 
                                 end_date: datetime.datetime) -> list:
         """
         Get orders within a date range.
         """
         filtered_orders = []
+        archive = self._order_archive()
+        if archive is not None:
+            filtered_orders = [order for _, order in archive.iter_entries(customer.username, start_date, end_date)
+                               if order.order_id not in self.orders_by_id]
         for order in customer.get_order_history():
             if start_date <= order.order_time <= end_date:
                 filtered_orders.append(order)
@@ -172,129 +897,127 @@ class FoodDeliverySystem:
         """
         Update customer profile information.
         """
-        if username not in self.customers:
-            raise ValueError(f"Customer {username} not found.")
+        with self._mutation(username):
+            if username not in self.customers:
+                raise ValueError(f"Customer {username} not found.")
             
-        customer = self.customers[username]
-        if name:
-            customer.name = name
-        if address:
-            customer.address = address
+            customer = self.customers[username]
+            if name:
+                customer.name = name
+            if address:
+                customer.address = address
         
-        self.save_state()
+            self.save_state()
     
     def get_order_details(self, order_id: str) -> dict:
         """
         Get detailed information about an order.
         """
-        for order in self.all_orders:
-            if order.order_id == order_id:
-                customer = self.customers.get(order.customer)
-                details = {
-                    "order_id": order.order_id,
-                    "customer_username": order.customer,
-                    "customer_name": customer.name if customer else "Unknown",
-                    "order_type": order.order_type,
-                    "items": order.items,
-                    "status": order.status,
-                    "order_time": order.order_time,
-                    "estimated_time": order.estimated_time,
-                    "special_instructions": order.special_instructions,
-                    "discount": order.discount,
-                    "total": order.calculate_total()
-                }
-                return details
-        
-        raise ValueError(f"Order {order_id} not found.")
+        order = self.find_order(order_id)
+        if order is None:
+            raise ValueError(f"Order {order_id} not found.")
+        customer = self.customers.get(order.customer)
+        details = {
+            "order_id": order.order_id,
+            "customer_username": order.customer,
+            "customer_name": customer.name if customer else "Unknown",
+            "order_type": order.order_type,
+            "items": order.items,
+            "status": order.status,
+            "order_time": order.order_time,
+            "estimated_time": order.estimated_time,
+            "special_instructions": order.special_instructions,
+            "discount": order.discount,
+            "unit_prices": order.price_snapshot(),
+            "subtotal": order.subtotal,
+            "discount_amount": order.discount_amount,
+            "total": order.calculate_total()
+        }
+        return details
     
     def rate_order(self, customer: Customer, order_id: str, rating: int, feedback: str = "") -> None:
         """
         Add rating and feedback to a delivered order.
         """
-        if rating < 1 or rating > 5:
-            raise ValueError("Rating must be between 1 and 5.")
+        with self._mutation(customer.username):
+            if rating < 1 or rating > 5:
+                raise ValueError("Rating must be between 1 and 5.")
             
-        for order in customer.get_order_history():
-            if order.order_id == order_id:
-                if order.status != "Delivered":
-                    raise ValueError("Can only rate orders that have been delivered.")
-                order.rating = rating
-                order.feedback = feedback
-                self.save_state()
-                return
-                
-        raise ValueError(f"Order {order_id} not found.")
+            order = self._find_order_to_change(order_id, customer)
+            if order.status != "Delivered":
+                raise ValueError("Can only rate orders that have been delivered.")
+            self._stats_for(customer.username).record_rating(rating, order.rating)
+            order.rating = rating
+            order.feedback = feedback
+            self.save_state()
     
     def update_notification_preferences(self, username: str, enabled: bool) -> None:
         """
         Update notification preferences for a customer.
         """
-        if username not in self.customers:
-            raise ValueError(f"Customer {username} not found.")
+        with self._mutation(username):
+            if username not in self.customers:
+                raise ValueError(f"Customer {username} not found.")
         
-        self.customers[username].notifications_enabled = enabled
-        self.save_state()
+            self.customers[username].notifications_enabled = enabled
+            self.save_state()
     
     def reorder_previous(self, customer: Customer, order_id: str) -> Order:
         """
         Create a new order with the same items as a previous order.
         """
-        original_order = None
-        for order in customer.get_order_history():
-            if order.order_id == order_id:
-                original_order = order
-                break
-                
-        if not original_order:
-            raise ValueError(f"Order {order_id} not found.")
+        with self._mutation(customer.username):
+            original_order = self.find_order(order_id, customer)
+            if not original_order:
+                raise ValueError(f"Order {order_id} not found.")
         
-        self.save_state()
+            self.save_state()
             
-        return self.place_order(
-            customer,
-            original_order.order_type,
-            original_order.items.copy(),
-            special_instructions=original_order.special_instructions
-        )
+            return self.place_order(
+                customer,
+                original_order.order_type,
+                original_order.items.copy(),
+                special_instructions=original_order.special_instructions
+            )
         
     def mark_order_received(self, customer: Customer, order_id: str) -> bool:
         """
         Mark an order as received/picked up by the customer.
         """
-        for order in customer.get_order_history():
-            if order.order_id == order_id:
-                # Check if the order is ready for pickup/delivery
-                if order.estimated_time > datetime.datetime.now():
-                    raise ValueError("This order is not ready for pickup/delivery yet.")
-                    
-                # For takeaway orders, we can mark it as completed directly
-                if order.order_type == "Takeaway":
-                    if order.status == "Completed" or order.status == "Picked Up":
-                        raise ValueError("This order has already been picked up.")
-                    order.status = "Picked Up"
-                    self.save_state()
-                    return True
-                    
-                # For home delivery orders, we need to check if it's out for delivery
-                elif order.order_type == "Home Delivery":
-                    if order.status not in ["Out for Delivery", "On the Way", "Delivered"]:
-                        raise ValueError("This order is not out for delivery yet.")
-                    if order.status == "Delivered":
-                        raise ValueError("This order has already been marked as delivered.")
-                        
-                    # Find the delivery agent and update the status
+        with self._mutation(customer.username):
+            order = self._find_order_to_change(order_id, customer)
+            # Check if the order is ready for pickup/delivery
+            if order.estimated_time > datetime.datetime.now():
+                raise ValueError("This order is not ready for pickup/delivery yet.")
+            
+            # For takeaway orders, we can mark it as completed directly
+            if order.order_type == "Takeaway":
+                if order.status == "Completed" or order.status == "Picked Up":
+                    raise ValueError("This order has already been picked up.")
+                order.status = "Picked Up"
+                self._publish(ORDER_DELIVERED, order)
+                self.save_state()
+                return True
+            
+            # For home delivery orders, we need to check if it's out for delivery
+            elif order.order_type == "Home Delivery":
+                if order.status not in ["Out for Delivery", "On the Way", "Delivered"]:
+                    raise ValueError("This order is not out for delivery yet.")
+                if order.status == "Delivered":
+                    raise ValueError("This order has already been marked as delivered.")
+                
+                # Find the delivery agent and update the status
+                freed_agent = False
+                with self._agents_lock:
                     for agent in self.delivery_agents.values():
-                        if agent.current_order and agent.current_order.order_id == order_id:
-                            order.status = "Delivered"
+                        if agent.current_order is order:
                             agent.current_order = None
-                            self.save_state()
-                            # Check for other unassigned orders
-                            self.check_unassigned_orders()
-                            return True
-                    
-                    # If we couldn't find the delivery agent, still mark it as delivered
+                            freed_agent = True
+                            break
                     order.status = "Delivered"
-                    self.save_state()
-                    return True
-        
-        raise ValueError(f"Order {order_id} not found.")
\ No newline at end of file
+                self._publish(ORDER_DELIVERED, order)
+                self.save_state()
+                if freed_agent:
+                    # Check for other unassigned orders
+                    self.check_unassigned_orders()
+                return True
@@ -0,0 +1,77 @@
+import csv
+import gzip
+import json
+from system.export import iter_chunks
+
+# Supported import formats and record kinds
+IMPORT_FORMATS = ["csv", "jsonl"]
+IMPORT_KINDS = ["customers", "agents"]
+DEFAULT_IMPORT_CHUNK_SIZE = 10000
+
+def detect_format(path: str) -> str:
+    """Guess the format of an import file from its extension (a trailing .gz is ignored)."""
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".jsonl") or name.endswith(".ndjson"):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path}; use one of {IMPORT_FORMATS}.")
+
+def _parse_bool(value) -> bool:
+    """Read a boolean from a CSV cell or JSON value."""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ["1", "true", "yes", "y"]
+
+def iter_file_records(path: str, fmt: str = None):
+    """
+    Yield one dict per record of a CSV (with a header row) or JSONL file, reading lazily.
+    Files ending in .gz are decompressed on the fly.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Import format must be one of {IMPORT_FORMATS}.")
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                if "notifications_enabled" in row:
+                    if row["notifications_enabled"] in (None, ""):
+                        del row["notifications_enabled"]
+                    else:
+                        row["notifications_enabled"] = _parse_bool(row["notifications_enabled"])
+                yield row
+        else:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    raise ValueError(f"Line {line_number} of {path} is not valid JSON.")
+
+def import_records(system, kind: str, path: str, fmt: str = None,
+                   chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE, progress=None) -> dict:
+    """
+    Stream customers or delivery agents from a file into the system, one chunk at a time.
+    Each chunk is committed once. `progress`, if given, is called with the running summary
+    after every chunk. Returns the summary: imported, duplicates and errors counts.
+    """
+    if kind == "customers":
+        add = system.register_customers_bulk
+    elif kind == "agents":
+        add = system.add_delivery_agents
+    else:
+        raise ValueError(f"Import kind must be one of {IMPORT_KINDS}.")
+
+    summary = {"read": 0, "imported": 0, "duplicates": 0, "errors": 0}
+    for chunk in iter_chunks(iter_file_records(path, fmt), chunk_size):
+        added, duplicates, errors = add(chunk)
+        summary["read"] += len(chunk)
+        summary["imported"] += added
+        summary["duplicates"] += len(duplicates)
+        summary["errors"] += len(errors)
+        if progress:
+            progress(summary)
+    return summary
@@ -0,0 +1,287 @@
+import datetime
+import functools
+import gzip
+import hashlib
+import hmac
+import inspect
+import json
+import secrets
+import threading
+import time
+from models.customer import Customer
+from models.order import Order
+from system.promotions import Promotion
+from utils.histogram import LatencyHistogram
+
+JOURNAL_VERSION = 1
+# Persistence plumbing, archival and history loads, which say nothing about what users did
+UNRECORDED_METHODS = {"save_state", "set_autosave", "has_unsaved_changes", "snapshot", "flush", "archive_orders",
+                      "add_order_history"}
+# Argument and field names whose values are replaced by a keyed digest before they are written
+SECRET_FIELDS = {"password"}
+# Errors a replayed call may raise without stopping the replay
+REPLAY_ERRORS = (ValueError, TypeError, LookupError)
+
+class ReplayError(ValueError):
+    """A trace that cannot be read, or a recorded call that cannot be re-issued."""
+
+def _digest(value, key: bytes) -> str:
+    """
+    Stand-in for a secret: an HMAC under the trace's own random key, the same for equal values
+    within a trace (so a replay logs in with what it registered) but not across traces.
+    """
+    return "hmac-sha256:" + hmac.new(key, str(value).encode("utf-8"), hashlib.sha256).hexdigest()
+
+def encode_value(value, key: bytes):
+    """
+    Encode a call argument as JSON. Customers, orders and promotions are written by reference
+    or as plain data, datetimes as ISO strings; anything else is marked unsupported.
+    Secret fields of dicts are digested with `key`.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item, key) for item in value]
+    if isinstance(value, dict):
+        return {str(name): _digest(item, key) if name in SECRET_FIELDS and item else encode_value(item, key)
+                for name, item in value.items()}
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, Customer):
+        return {"$customer": value.username}
+    if isinstance(value, Order):
+        return {"$order": value.order_id}
+    if isinstance(value, Promotion):
+        return {"$promotion": encode_value(value.to_dict(), key)}
+    return {"$unsupported": type(value).__name__}
+
+def decode_value(value, system, order_ids: dict):
+    """
+    Decode an argument written by encode_value against the replaying system. Recorded order ids
+    are swapped for the ids the replay gave the same orders. Raises ReplayError for values
+    that cannot be rebuilt.
+    """
+    if isinstance(value, str):
+        return order_ids.get(value, value)
+    if isinstance(value, list):
+        return [decode_value(item, system, order_ids) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "$datetime" in value:
+        return datetime.datetime.fromisoformat(value["$datetime"])
+    if "$customer" in value:
+        customer = system.customers.get(value["$customer"])
+        if customer is None:
+            raise ReplayError(f"Customer {value['$customer']} not found.")
+        return customer
+    if "$order" in value:
+        order = system.orders_by_id.get(order_ids.get(value["$order"], value["$order"]))
+        if order is None:
+            raise ReplayError(f"Order {value['$order']} not found.")
+        return order
+    if "$promotion" in value:
+        return Promotion(**decode_value(value["$promotion"], system, order_ids))
+    if "$unsupported" in value:
+        raise ReplayError(f"A {value['$unsupported']} argument was not recorded.")
+    return {key: decode_value(item, system, order_ids) for key, item in value.items()}
+
+def result_order_ids(result) -> list:
+    """Ids of the orders a call returned, directly or in a list or tuple (e.g. place_orders_batch)."""
+    if isinstance(result, Order):
+        return [result.order_id]
+    if isinstance(result, (list, tuple)):
+        ids = []
+        for item in result:
+            if isinstance(item, Order):
+                ids.append(item.order_id)
+            elif isinstance(item, (list, tuple)):
+                ids.extend(order.order_id for order in item if isinstance(order, Order))
+        return ids
+    return []
+
+class JournalRecorder:
+    def __init__(self, path: str):
+        """
+        Initialize a recorder writing the public calls made on a system to a trace file
+        (JSON lines, gzip-compressed when the path ends in .gz). Each line holds the call's
+        start time in seconds since recording began, the method, its named arguments, its
+        duration and its error, if any. Passwords are written as HMACs under a random key
+        kept in the trace header, so equal passwords match within the trace only.
+        """
+        self.path = path
+        self.count = 0
+        self._system = None
+        self._lock = threading.Lock()       # One line written at a time
+        self._local = threading.local()     # Per-thread flag: inside a recorded call
+        opener = gzip.open if path.endswith(".gz") else open
+        self._file = opener(path, "wt", encoding="utf-8")
+        self._start = time.perf_counter()
+        self._digest_key = secrets.token_bytes(32)
+        self._write({"journal": JOURNAL_VERSION,
+                     "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                     "digest_key": self._digest_key.hex()})
+
+    def _write(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+
+    def attach(self, system) -> "JournalRecorder":
+        """Start recording the calls made on a system."""
+        self._system = system
+        system._journal = self
+        return self
+
+    def close(self) -> None:
+        """Stop recording and close the trace file."""
+        if self._system is not None and self._system._journal is self:
+            self._system._journal = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def call(self, method: str, signature: inspect.Signature, func, system, args: tuple, kwargs: dict):
+        """Run a call and record it. Calls made from inside a recorded call are not recorded again."""
+        local = self._local
+        if getattr(local, "active", False):
+            return func(system, *args, **kwargs)
+        try:
+            bound = signature.bind(system, *args, **kwargs)
+        except TypeError:
+            return func(system, *args, **kwargs)    # Raises; a call that cannot bind is not replayable
+        arguments = list(bound.arguments.items())[1:]   # Without self
+        record = {"t": None, "m": method,
+                  "a": {name: _digest(value, self._digest_key) if name in SECRET_FIELDS and value
+                        else encode_value(value, self._digest_key) for name, value in arguments}}
+        local.active = True
+        start = time.perf_counter()
+        try:
+            result = func(system, *args, **kwargs)
+        except BaseException as e:
+            record["e"] = str(e) or type(e).__name__
+            raise
+        else:
+            order_ids = result_order_ids(result)
+            if order_ids:
+                record["r"] = order_ids
+            return result
+        finally:
+            local.active = False
+            record["t"] = round(start - self._start, 6)
+            record["d"] = round(time.perf_counter() - start, 6)
+            self._write(record)
+            self.count += 1
+
+def journaled(cls):
+    """
+    Class decorator letting a JournalRecorder attached to an instance (as its _journal)
+    record calls of every public method defined on the class, except persistence plumbing.
+    """
+    for name, attribute in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(attribute) and name not in UNRECORDED_METHODS:
+            setattr(cls, name, _journaled(name, attribute))
+    return cls
+
+def _journaled(method: str, func):
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        journal = self._journal
+        if journal is None:
+            return func(self, *args, **kwargs)
+        return journal.call(method, signature, func, self, args, kwargs)
+    return wrapper
+
+def read_trace(path: str):
+    """Yield the call records of a trace file, after checking its header."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            header = json.loads(f.readline() or "null")
+        except json.JSONDecodeError:
+            header = None
+        if not isinstance(header, dict) or header.get("journal") != JOURNAL_VERSION:
+            raise ReplayError(f"{path} is not a version {JOURNAL_VERSION} trace.")
+        for number, line in enumerate(f, 2):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ReplayError(f"Line {number} of {path} is not valid JSON: {e}")
+            yield record
+
+def _latency_summary(histogram: LatencyHistogram, prefix: str = "") -> dict:
+    summary = {f"{prefix}p{p}_ms": round(histogram.percentile(p) * 1000, 4) for p in (50, 90, 99)}
+    summary[f"{prefix}max_ms"] = round(histogram.max * 1000, 4) if histogram.count else None
+    return summary
+
+def replay_trace(system, path: str, speed: float = None, progress=None) -> dict:
+    """
+    Re-issue the calls of a trace against a system (normally a fresh one), one after another.
+    Without a speed they run as fast as possible; with one, calls are started at the recorded
+    times divided by `speed` (2 replays twice as fast), and how late they started is reported.
+    Autosave is turned off and not turned back on, so the replayed system is never saved.
+    Returns the latency distribution per method next to the recorded one.
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError("Replay speed must be positive.")
+    system.set_autosave(False)
+    order_ids = {}      # recorded order_id -> order_id given by the replay
+    replayed, recorded = {}, {}     # method -> LatencyHistogram
+    errors, mismatched = {}, {}     # method -> count
+    summary = {"calls": 0, "errors": 0, "skipped": 0, "mismatched": 0}
+    max_lag = 0.0
+    start = time.perf_counter()
+    for record in read_trace(path):
+        method = record.get("m", "")
+        func = getattr(system, method, None) if not method.startswith("_") else None
+        if func is None or method in UNRECORDED_METHODS:
+            summary["skipped"] += 1
+            continue
+        try:
+            kwargs = decode_value(record.get("a", {}), system, order_ids)
+        except (ReplayError, TypeError):
+            summary["skipped"] += 1
+            continue
+        if speed is not None:
+            wait = record.get("t", 0) / speed - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                max_lag = max(max_lag, -wait)
+        call_start = time.perf_counter()
+        failed = False
+        try:
+            result = func(**kwargs)
+        except REPLAY_ERRORS:
+            failed = True
+        elapsed = time.perf_counter() - call_start
+        replayed.setdefault(method, LatencyHistogram()).record(elapsed)
+        recorded.setdefault(method, LatencyHistogram()).record(record.get("d", 0))
+        summary["calls"] += 1
+        if failed:
+            summary["errors"] += 1
+            errors[method] = errors.get(method, 0) + 1
+        else:
+            order_ids.update(zip(record.get("r", []), result_order_ids(result)))
+        if failed != ("e" in record):
+            summary["mismatched"] += 1
+            mismatched[method] = mismatched.get(method, 0) + 1
+        if progress and summary["calls"] % 10000 == 0:
+            progress(summary["calls"])
+    elapsed = time.perf_counter() - start
+    summary["elapsed_s"] = round(elapsed, 6)
+    summary["calls_per_second"] = round(summary["calls"] / elapsed, 2) if summary["calls"] else None
+    summary["speed"] = speed
+    if speed is not None:
+        summary["max_lag_ms"] = round(max_lag * 1000, 3)
+    summary["methods"] = {
+        method: {"count": histogram.count, "errors": errors.get(method, 0),
+                 "mismatched": mismatched.get(method, 0),
+                 **_latency_summary(histogram), **_latency_summary(recorded[method], "recorded_")}
+        for method, histogram in sorted(replayed.items())}
+    return summary
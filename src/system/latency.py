@@ -0,0 +1,72 @@
+import datetime
+from utils.histogram import LatencyHistogram
+
+# Latency stages reported for the fleet, with their display names
+LATENCY_STAGES = {
+    "prep": "Prep time (placed -> food ready)",
+    "agent_wait": "Waiting for agent (ready -> picked up by agent)",
+    "delivery": "Delivery time (picked up by agent -> delivered)",
+    "eta_error": "ETA error (|finished - estimated|)",
+}
+
+# Statuses meaning the order has left the restaurant / reached the customer
+HANDOFF_STATUSES = ("Delivering", "Out for Delivery", "On the Way", "Picked Up")
+AGENT_STATUSES = ("Delivering", "Out for Delivery", "On the Way")
+FINISHED_STATUSES = ("Completed", "Delivered", "Picked Up")
+
+def order_latencies(order) -> dict:
+    """
+    Compute the latency of each stage of an order from its status history, in seconds.
+    Stages the order has not gone through are left out. The stages do not overlap: prep ends
+    when the food is ready (its estimated time, or the handoff if that came first) and the
+    wait for an agent starts there.
+    """
+    latencies = {}
+    placed = order.order_time
+    ready = order.estimated_time
+    handoff = order.status_time(*HANDOFF_STATUSES)
+    finished = order.status_time(*FINISHED_STATUSES)
+
+    if handoff:
+        latencies["prep"] = (min(handoff, ready) - placed).total_seconds()
+    if order.order_type == "Home Delivery":
+        picked_up = order.status_time(*AGENT_STATUSES)
+        if picked_up:
+            latencies["agent_wait"] = max((picked_up - ready).total_seconds(), 0)
+            delivered = order.status_time("Completed", "Delivered")
+            if delivered:
+                latencies["delivery"] = (delivered - picked_up).total_seconds()
+    if finished:
+        latencies["eta_error"] = abs((finished - ready).total_seconds())
+    return latencies
+
+def collect_latency_metrics(orders, precision: float = 0.01) -> dict:
+    """Build one histogram per latency stage over the given orders."""
+    histograms = {stage: LatencyHistogram(precision) for stage in LATENCY_STAGES}
+    for order in orders:
+        if order.status == "Cancelled":
+            continue
+        for stage, seconds in order_latencies(order).items():
+            histograms[stage].record(seconds)
+    return histograms
+
+def _format_seconds(seconds: float) -> str:
+    """Format a latency for display."""
+    if seconds is None:
+        return "N/A"
+    return str(datetime.timedelta(seconds=int(round(seconds))))
+
+def format_latency_report(histograms: dict) -> str:
+    """Render p50/p95/p99 for every latency stage."""
+    report = "Delivery Latency Report:\n"
+    report += "-" * 30 + "\n"
+    for stage, label in LATENCY_STAGES.items():
+        histogram = histograms.get(stage)
+        if histogram is None or not histogram.count:
+            report += f"{label}: no data\n"
+            continue
+        report += (f"{label} [{histogram.count} orders]: "
+                   f"p50 {_format_seconds(histogram.percentile(50))}, "
+                   f"p95 {_format_seconds(histogram.percentile(95))}, "
+                   f"p99 {_format_seconds(histogram.percentile(99))}\n")
+    return report
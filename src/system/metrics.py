@@ -0,0 +1,174 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from utils.histogram import LatencyHistogram
+
+# Quantiles exported for every latency summary
+EXPORT_QUANTILES = [0.5, 0.9, 0.99]
+
+def _escape(value) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize a registry of counters, gauges and latency summaries, exported in the
+        Prometheus text format. Recording is a dict update under one lock; when the
+        registry is disabled, instrumented code records nothing.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()     # Per-thread flag: inside a timed call
+        self._help = {}         # metric name -> (type, help text)
+        self._counters = {}     # (name, labels) -> value
+        self._gauges = {}       # (name, labels) -> value
+        self._summaries = {}    # (name, labels) -> LatencyHistogram
+
+    @staticmethod
+    def key(name: str, **labels) -> tuple:
+        """The key of one labelled series; hot paths compute it once and pass it to the *_key methods."""
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """Set the type (counter, gauge or summary) and help text exported for a metric."""
+        self._help[name] = (kind, help_text)
+
+    def inc_key(self, key: tuple, value: float = 1) -> None:
+        if self.enabled:
+            with self._lock:
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge_key(self, key: tuple, value: float) -> None:
+        if self.enabled:
+            with self._lock:
+                self._gauges[key] = value
+
+    def observe_key(self, key: tuple, value: float) -> None:
+        if self.enabled:
+            with self._lock:
+                summary = self._summaries.get(key)
+                if summary is None:
+                    summary = self._summaries[key] = LatencyHistogram()
+                summary.record(value)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add to a counter."""
+        self.inc_key(self.key(name, **labels), value)
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a gauge."""
+        self.set_gauge_key(self.key(name, **labels), value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record a value (e.g. a duration in seconds) in a summary."""
+        self.observe_key(self.key(name, **labels), value)
+
+    def value(self, name: str, **labels):
+        """Current value of a counter or gauge, or the count of a summary (None if never recorded)."""
+        key = self.key(name, **labels)
+        with self._lock:
+            if key in self._summaries:
+                return self._summaries[key].count
+            return self._counters.get(key, self._gauges.get(key))
+
+    def reset(self) -> None:
+        """Forget every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+    def render(self) -> str:
+        """Export every metric in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            series = {}     # name -> [(kind, labels, value or summary)]
+            for kind, values in [("counter", self._counters), ("gauge", self._gauges),
+                                 ("summary", self._summaries)]:
+                for (name, labels), value in values.items():
+                    series.setdefault(name, []).append((kind, labels, value))
+            for name in sorted(series):
+                kind, help_text = self._help.get(name, (series[name][0][0], ""))
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for _, labels, value in sorted(series[name], key=lambda s: s[1]):
+                    if isinstance(value, LatencyHistogram):
+                        for quantile in EXPORT_QUANTILES:
+                            quantile_label = f'quantile="{quantile}"'
+                            lines.append(f"{name}{_labels(labels, quantile_label)} "
+                                         f"{value.percentile(quantile * 100)!r}")
+                        lines.append(f"{name}_sum{_labels(labels)} {value.total!r}")
+                        lines.append(f"{name}_count{_labels(labels)} {value.count}")
+                    else:
+                        lines.append(f"{name}{_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write the metrics to a file (e.g. for a node exporter's textfile collector), replacing it atomically."""
+        tmp_file = path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_file, path)
+
+# Process-wide registry. FDS_METRICS=0 turns instrumentation off entirely: methods are not even wrapped.
+REGISTRY = MetricsRegistry(enabled=os.environ.get("FDS_METRICS", "1") != "0")
+
+REGISTRY.describe("fds_method_duration_seconds", "summary", "Time spent in instrumented calls, in seconds.")
+REGISTRY.describe("fds_method_errors_total", "counter", "Instrumented calls that raised an exception.")
+REGISTRY.describe("fds_persistence_bytes_written_total", "counter", "Bytes of snapshots written to the store.")
+REGISTRY.describe("fds_persistence_save_seconds", "summary", "Time spent serializing (stage=serialize) "
+                                                             "and writing (stage=write) snapshots, in seconds.")
+REGISTRY.describe("fds_orders_awaiting_agent", "gauge", "Ready home delivery orders left without an agent "
+                                                        "by the last dispatch sweep.")
+REGISTRY.describe("fds_idle_agents", "gauge", "Delivery agents without an order after the last dispatch sweep.")
+REGISTRY.describe("fds_dispatch_sweeps_skipped_total", "counter",
+                  "Dispatch sweeps skipped because another sweep was running.")
+
+def timed(method: str, registry: MetricsRegistry = REGISTRY):
+    """
+    Decorator recording the duration of every call (and whether it raised) under
+    fds_method_duration_seconds{method=...}. Calls made from inside another timed call are
+    part of that call's time and are not recorded again. Returns the function unchanged
+    if the registry was disabled when the decorator was applied.
+    """
+    def decorate(func):
+        if not registry.enabled:
+            return func
+        duration_key = registry.key("fds_method_duration_seconds", method=method)
+        errors_key = registry.key("fds_method_errors_total", method=method)
+
+        local = registry._local
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled or getattr(local, "active", False):
+                return func(*args, **kwargs)
+            local.active = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                registry.inc_key(errors_key)
+                raise
+            finally:
+                registry.observe_key(duration_key, time.perf_counter() - start)
+                local.active = False
+        return wrapper
+    return decorate
+
+def instrumented(cls):
+    """Class decorator timing every public method defined on the class (not properties or classmethods)."""
+    for name, attribute in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(attribute):
+            setattr(cls, name, timed(name)(attribute))
+    return cls
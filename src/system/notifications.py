@@ -0,0 +1,173 @@
+import json
+import queue
+import socket
+import threading
+import time
+from system.events import ORDER_PLACED, ORDER_READY, ORDER_ASSIGNED, ORDER_DELIVERED, ORDER_CANCELLED
+
+# Most notifications handed to a sink at once, and seconds to wait to fill a batch
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_FLUSH_INTERVAL = 0.5
+
+EVENT_MESSAGES = {
+    ORDER_PLACED: "Your order {order_id} has been placed.",
+    ORDER_READY: "Your order {order_id} is ready.",
+    ORDER_ASSIGNED: "Your order {order_id} is on its way.",
+    ORDER_DELIVERED: "Your order {order_id} has been delivered.",
+    ORDER_CANCELLED: "Your order {order_id} has been cancelled.",
+}
+
+class FileSink:
+    def __init__(self, path: str):
+        """
+        Initialize a sink appending one JSON line per notification to a file.
+        """
+        self.path = path
+
+    def send(self, notifications: list) -> None:
+        """Append a batch of notifications."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(n) + "\n" for n in notifications)
+
+    def close(self) -> None:
+        pass
+
+class SocketSink:
+    def __init__(self, host: str = "127.0.0.1", port: int = 9099):
+        """
+        Initialize a sink writing JSON lines to a local TCP socket, standing in for a push
+        service. The connection is opened on first use and reopened after errors.
+        """
+        self.host = host
+        self.port = port
+        self._socket = None
+
+    def send(self, notifications: list) -> None:
+        """Send a batch of notifications in one write."""
+        data = "".join(json.dumps(n) + "\n" for n in notifications).encode()
+        if self._socket is None:
+            self._socket = socket.create_connection((self.host, self.port), timeout=5)
+        try:
+            self._socket.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+class MemorySink:
+    def __init__(self):
+        """
+        Initialize a sink keeping delivered batches in memory, for tests and debugging.
+        """
+        self.batches = []
+
+    def send(self, notifications: list) -> None:
+        self.batches.append(list(notifications))
+
+    def close(self) -> None:
+        pass
+
+class NotificationWorker:
+    def __init__(self, system, sink, batch_size: int = NOTIFICATION_BATCH_SIZE,
+                 flush_interval: float = NOTIFICATION_FLUSH_INTERVAL):
+        """
+        Initialize a background worker turning order events into customer notifications.
+        Events are only queued by the publishing thread. The worker collects them for up to
+        `flush_interval` seconds, coalesces them into one notification per customer (keeping
+        the latest event of each order), drops customers who turned notifications off, and
+        hands the batch to `sink.send`.
+        """
+        self.system = system
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sent = 0           # Notifications delivered to the sink
+        self.suppressed = 0     # Events of customers who turned notifications off
+        self.failed = 0         # Notifications lost to sink errors
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def enqueue(self, event) -> None:
+        """Queue an event; subscribe this to the system's event bus."""
+        self._queue.put(event)
+
+    def start(self) -> None:
+        """Subscribe to the system's events and start delivering in the background."""
+        self.system.event_bus.subscribe(self.enqueue)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Unsubscribe, deliver every queued event and close the sink."""
+        self.system.event_bus.unsubscribe(self.enqueue)
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.sink.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            events = self._collect(self.flush_interval)
+            if events:
+                self._deliver(events)
+
+    def _collect(self, timeout: float) -> list:
+        """Take queued events, waiting up to `timeout` seconds for the first one."""
+        events = []
+        deadline = time.monotonic() + timeout
+        try:
+            events.append(self._queue.get(timeout=timeout))
+            while time.monotonic() < deadline:
+                events.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+        except queue.Empty:
+            pass
+        return events
+
+    def flush(self) -> int:
+        """Deliver everything queued so far in the calling thread. Returns notifications sent."""
+        events = []
+        try:
+            while True:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return self._deliver(events) if events else 0
+
+    def build_notifications(self, events: list) -> list:
+        """Coalesce events into one notification per customer who wants notifications."""
+        latest = {}     # username -> {order_id: event}, in order of first event
+        for event in events:
+            latest.setdefault(event.username, {})[event.order_id] = event
+        notifications = []
+        for username, by_order in latest.items():
+            customer = self.system.customers.get(username)
+            if customer is None or not customer.notifications_enabled:
+                self.suppressed += len(by_order)
+                continue
+            notifications.append({
+                "username": username,
+                "sent_at": time.time(),
+                "updates": [{"type": e.type, "order_id": e.order_id, "status": e.status,
+                             "time": e.timestamp, "message": EVENT_MESSAGES[e.type].format(order_id=e.order_id)}
+                            for e in by_order.values()],
+            })
+        return notifications
+
+    def _deliver(self, events: list) -> int:
+        notifications = self.build_notifications(events)
+        for start in range(0, len(notifications), self.batch_size):
+            batch = notifications[start:start + self.batch_size]
+            try:
+                self.sink.send(batch)
+                self.sent += len(batch)
+            except OSError:
+                self.failed += len(batch)
+        return len(notifications)
@@ -0,0 +1,93 @@
+import base64
+import bisect
+import datetime
+import json
+
+class OrderTimeIndex:
+    def __init__(self):
+        """
+        Initialize an index of orders sorted by placement time.
+        Keys are (timestamp, sequence) pairs; the sequence breaks ties between orders
+        placed at the same instant, so every key is unique and can be used as a cursor.
+        """
+        self._keys = []         # Sorted (timestamp, sequence) keys
+        self._orders = []       # Orders, aligned with _keys
+        self._next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def add(self, order) -> None:
+        """Insert an order at its position in time (appending in the common case)."""
+        key = (order.order_time.timestamp(), self._next_seq)
+        self._next_seq += 1
+        if not self._keys or key >= self._keys[-1]:
+            self._keys.append(key)
+            self._orders.append(order)
+            return
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._orders.insert(position, order)
+
+    def discard(self, orders) -> int:
+        """Remove many orders in one pass. Returns how many of them were indexed."""
+        orders = set(orders)
+        keep = [position for position, order in enumerate(self._orders) if order not in orders]
+        removed = len(self._orders) - len(keep)
+        if removed:
+            self._keys = [self._keys[position] for position in keep]
+            self._orders = [self._orders[position] for position in keep]
+        return removed
+
+    def iter_newest(self, before: tuple = None, start_date: datetime.datetime = None,
+                    end_date: datetime.datetime = None):
+        """
+        Yield (key, order) pairs newest first, within [start_date, end_date] and, with `before`,
+        only those whose key is lower.
+        """
+        position = len(self._keys)
+        if end_date is not None:
+            position = bisect.bisect_right(self._keys, (end_date.timestamp(), float("inf")))
+        if before is not None:
+            position = min(position, bisect.bisect_left(self._keys, before))
+        start = start_date.timestamp() if start_date is not None else None
+        position -= 1
+        while position >= 0:
+            key = self._keys[position]
+            if start is not None and key[0] < start:
+                return
+            yield key, self._orders[position]
+            position -= 1
+
+    def page(self, page_size: int = 10, cursor: str = None, start_date: datetime.datetime = None,
+             end_date: datetime.datetime = None, predicate=None) -> tuple:
+        """
+        Return (orders, next_cursor) for one page, newest first.
+        Pass the returned cursor back to get the next page; it is None on the last page.
+        Only orders within [start_date, end_date] and accepted by `predicate` are returned.
+        """
+        if page_size <= 0:
+            raise ValueError("Page size must be positive.")
+        before = decode_cursor(cursor) if cursor else None
+        orders = []
+        last_key = None
+        for key, order in self.iter_newest(before, start_date, end_date):
+            if predicate is None or predicate(order):
+                if len(orders) == page_size:
+                    # There is at least one more match: continue after the last returned order
+                    return orders, encode_cursor(last_key)
+                orders.append(order)
+                last_key = key
+        return orders, None
+
+def encode_cursor(key: tuple) -> str:
+    """Encode an index key as an opaque, URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed."""
+    try:
+        timestamp, sequence = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (float(timestamp), int(sequence))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor.")
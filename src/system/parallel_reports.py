@@ -0,0 +1,127 @@
+import datetime
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from system.archive import OrderArchive, TERMINAL_STATUSES
+
+# Below this many archived orders the process start-up cost outweighs the parallel speed-up
+MIN_PARALLEL_ORDERS = 20000
+# Number of time ranges handed to each worker, so uneven ranges still balance out
+PARTITIONS_PER_WORKER = 4
+
+def compact_order(order) -> tuple:
+    """Reduce an order to the primitive fields the reports need."""
+    return (order.order_time.timestamp(),
+            order.order_type == "Home Delivery",
+            order.status,
+            order.subtotal,
+            order.total,
+            (order.estimated_time - order.order_time).total_seconds(),
+            tuple(order.items.items()))
+
+def time_ranges(first: float, last: float, partitions: int) -> list:
+    """Split [first, last] (epoch seconds) into at most `partitions` half-open ranges of equal length."""
+    stop = math.nextafter(last, math.inf)   # So the last order falls in the last range
+    step = (stop - first) / max(1, partitions)
+    bounds = [first + step * i for i in range(max(1, partitions))] + [stop]
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def empty_aggregate() -> dict:
+    """Return the aggregate of no orders."""
+    return {"orders": 0, "home_delivery": 0, "revenue": 0.0, "net_revenue": 0.0,
+            "estimated_seconds": 0.0, "item_counts": {}, "first": None, "last": None}
+
+def aggregate_rows(rows) -> dict:
+    """Compute the aggregate of compact order tuples."""
+    result = empty_aggregate()
+    item_counts = result["item_counts"]
+    for placed, home_delivery, status, subtotal, total, estimated, items in rows:
+        result["orders"] += 1
+        result["home_delivery"] += home_delivery
+        result["revenue"] += subtotal
+        result["net_revenue"] += total
+        result["estimated_seconds"] += estimated
+        for item, qty in items:
+            item_counts[item] = item_counts.get(item, 0) + qty
+        if result["first"] is None or placed < result["first"]:
+            result["first"] = placed
+        if result["last"] is None or placed > result["last"]:
+            result["last"] = placed
+    return result
+
+def aggregate_archive_range(task: tuple) -> dict:
+    """
+    Compute the partial aggregate of the archived orders in one time range (runs in a worker
+    process, which reads and decodes the rows itself). `task` is (archive path, start, stop,
+    statuses, ids of orders to skip because their copy in memory is counted instead).
+    """
+    path, start, stop, statuses, skip_ids = task
+    return aggregate_rows(compact_order(order) for order in OrderArchive(path).iter_range(start, stop, statuses)
+                          if order.order_id not in skip_ids)
+
+def merge_aggregates(partials) -> dict:
+    """Merge partial aggregates into one."""
+    merged = empty_aggregate()
+    for partial in partials:
+        for key in ("orders", "home_delivery", "revenue", "net_revenue", "estimated_seconds"):
+            merged[key] += partial[key]
+        for item, qty in partial["item_counts"].items():
+            merged["item_counts"][item] = merged["item_counts"].get(item, 0) + qty
+        if partial["first"] is not None:
+            merged["first"] = partial["first"] if merged["first"] is None else min(merged["first"], partial["first"])
+            merged["last"] = partial["last"] if merged["last"] is None else max(merged["last"], partial["last"])
+    return merged
+
+def run_parallel_report(orders, workers: int = None, statuses: list = None,
+                        start_date: datetime.datetime = None, end_date: datetime.datetime = None,
+                        min_parallel_orders: int = MIN_PARALLEL_ORDERS) -> dict:
+    """
+    Aggregate the order history, optionally filtered by status and date range, in one pass.
+    When `orders` is an OrderHistory (see FoodDeliverySystem.order_history) with at least
+    `min_parallel_orders` matching archived orders, the archive is split into time ranges that
+    worker processes read, decode and aggregate on their own; this process only aggregates the
+    orders in memory and merges. Anything else (or workers=1) is aggregated in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    def matches(order) -> bool:
+        return ((not statuses or order.status in statuses)
+                and (start_date is None or order.order_time >= start_date)
+                and (end_date is None or order.order_time <= end_date))
+
+    archive = getattr(orders, "archive", None)
+    if archive is not None and workers > 1:
+        statuses = statuses or orders.statuses
+        start_date = start_date if start_date is not None else orders.start_date
+        end_date = end_date if end_date is not None else orders.end_date
+        first, last, count = archive.time_bounds(start_date, end_date, statuses)
+        if count >= max(1, min_parallel_orders):
+            in_memory = [order for order in orders.orders if matches(order)]
+            # Archived copies of orders still in memory (e.g. after a failed save) are not counted twice
+            skip_ids = archive.archived_ids(order.order_id for order in orders.orders
+                                            if order.status in TERMINAL_STATUSES)
+            tasks = [(archive.path, start, stop, statuses, skip_ids)
+                     for start, stop in time_ranges(first, last, workers * PARTITIONS_PER_WORKER)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                partials = list(pool.map(aggregate_archive_range, tasks))
+            return merge_aggregates([aggregate_rows(compact_order(order) for order in in_memory)] + partials)
+    return aggregate_rows(compact_order(order) for order in orders if matches(order))
+
+def format_history_report(aggregate: dict) -> str:
+    """Render a full-history aggregate as a report."""
+    if not aggregate["orders"]:
+        return "No orders to analyze."
+    first = datetime.datetime.fromtimestamp(aggregate["first"]).strftime("%Y-%m-%d")
+    last = datetime.datetime.fromtimestamp(aggregate["last"]).strftime("%Y-%m-%d")
+    avg_seconds = aggregate["estimated_seconds"] / aggregate["orders"]
+    report = (f"Period: {first} to {last}\n"
+              f"Total Orders: {aggregate['orders']}\n"
+              f"Home Delivery Orders: {aggregate['home_delivery']}\n"
+              f"Takeaway Orders: {aggregate['orders'] - aggregate['home_delivery']}\n"
+              f"Revenue: ${aggregate['revenue']:.2f}\n"
+              f"Net Revenue (after discounts): ${aggregate['net_revenue']:.2f}\n"
+              f"Average Estimated Time: {datetime.timedelta(seconds=int(avg_seconds))}\n")
+    if aggregate["item_counts"]:
+        item, count = max(aggregate["item_counts"].items(), key=lambda x: x[1])
+        report += f"Most Popular Item: {item} with {count} orders\n"
+    return report
@@ -1,24 +1,83 @@
+import gc
 import os
 import pickle
+import time
+from system.metrics import REGISTRY, timed
 from utils.constants import PERSISTENCE_FILE
 
-def save_system(system_instance) -> None:
+# Every save is timed here rather than through @timed: saves usually run inside another timed
+# call (an autosave from place_order, a flush), whose outermost-call rule would hide them
+SERIALIZE_KEY = REGISTRY.key("fds_persistence_save_seconds", stage="serialize")
+WRITE_KEY = REGISTRY.key("fds_persistence_save_seconds", stage="write")
+
+def dump_system(system_instance) -> bytes:
+    """
+    Serialize the system state without writing it.
+    """
+    start = time.perf_counter()
+    try:
+        return pickle.dumps(system_instance, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        REGISTRY.observe_key(SERIALIZE_KEY, time.perf_counter() - start)
+
+def write_snapshot(data: bytes, path: str = None) -> None:
+    """
+    Write serialized system state to the persistence file (or `path`), replacing it atomically.
+    """
+    path = path or PERSISTENCE_FILE
+    tmp_file = path + ".tmp"
+    start = time.perf_counter()
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+    REGISTRY.observe_key(WRITE_KEY, time.perf_counter() - start)
+    REGISTRY.inc("fds_persistence_bytes_written_total", len(data))
+
+@timed("save_system")
+def save_system(system_instance, path: str = None) -> None:
     """
     Save the system state to a file.
     """
-    with open(PERSISTENCE_FILE, "wb") as f:
-        pickle.dump(system_instance, f)
+    write_snapshot(dump_system(system_instance), path)
+
+def read_system(path: str):
+    """
+    Read a system from a snapshot file.
+    The cyclic garbage collector is paused meanwhile: loading allocates millions of objects
+    that all stay alive, and collections triggered along the way would only rescan them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    finally:
+        if enabled:
+            gc.enable()
+
+def freeze_loaded_state() -> None:
+    """
+    Exclude everything allocated so far from later garbage collections. Called once, after the
+    store is loaded at startup, so collections during the session do not rescan the whole history
+    (frozen objects are still freed as usual when no longer referenced; stores hold no reference
+    cycles). Not for other loads: the freeze is process-wide.
+    """
+    gc.freeze()
 
-def load_system(system_class):
+@timed("load_system")
+def load_system(system_class, path: str = None):
     """
     Load the system state from a file if it exists.
     """
-    if os.path.exists(PERSISTENCE_FILE):
+    path = path or PERSISTENCE_FILE
+    if os.path.exists(path):
         try:
-            with open(PERSISTENCE_FILE, "rb") as f:
-                return pickle.load(f)
+            system = read_system(path)
         except (pickle.PickleError, EOFError, AttributeError):
             # If there's an error loading the file, create a new instance
             print("Error loading system state. Creating new system.")
-            return system_class()
-    return system_class()
\ No newline at end of file
+            system = system_class()
+    else:
+        system = system_class()
+    system.persistence_file = path
+    return system
@@ -0,0 +1,258 @@
+import collections
+import collections.abc
+import datetime
+import threading
+
+class Promotion:
+    def __init__(self, code: str, percent: float, starts_at: datetime.datetime = None,
+                 expires_at: datetime.datetime = None, max_uses: int = None,
+                 max_uses_per_customer: int = None, min_basket: float = 0, items: list = None,
+                 automatic: bool = False):
+        """
+        Initialize a promotion: `percent` off the order, or off the `items` it is scoped to.
+        It is valid between starts_at and expires_at (open-ended if None), for at most
+        max_uses orders overall and max_uses_per_customer per customer, on baskets worth at
+        least min_basket. Automatic promotions apply without the customer entering the code.
+        """
+        if not code:
+            raise ValueError("Promotion code is required.")
+        if percent <= 0 or percent > 100:
+            raise ValueError("Promotion discount must be between 0 and 100 percent.")
+        for limit in [max_uses, max_uses_per_customer]:
+            if limit is not None and limit < 1:
+                raise ValueError("Usage limits must be at least 1.")
+        if starts_at and expires_at and expires_at <= starts_at:
+            raise ValueError("Promotion must expire after it starts.")
+        self.code = code
+        self.percent = percent
+        self.starts_at = starts_at
+        self.expires_at = expires_at
+        self.max_uses = max_uses
+        self.max_uses_per_customer = max_uses_per_customer
+        self.min_basket = min_basket or 0
+        self.items = frozenset(items) if items else None
+        self.automatic = automatic
+        self._checks = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_checks"] = None     # Compiled again on first use
+        return state
+
+    def _compile(self) -> list:
+        """
+        Turn the rules into a list of (predicate, message) pairs, leaving out rules that are
+        not set, so evaluating a promotion only costs the rules it actually has.
+        Predicates take (uses, customer_uses, subtotal, now).
+        """
+        code = self.code
+        checks = []
+        if self.starts_at is not None:
+            starts_at = self.starts_at
+            checks.append((lambda uses, customer_uses, subtotal, now: now >= starts_at,
+                           f"Promo code {code} is not active yet."))
+        if self.expires_at is not None:
+            expires_at = self.expires_at
+            checks.append((lambda uses, customer_uses, subtotal, now: now < expires_at,
+                           f"Promo code {code} has expired."))
+        if self.min_basket:
+            min_basket = self.min_basket
+            checks.append((lambda uses, customer_uses, subtotal, now: subtotal >= min_basket,
+                           f"Promo code {code} requires a minimum order of ${min_basket:.2f}."))
+        if self.max_uses is not None:
+            max_uses = self.max_uses
+            checks.append((lambda uses, customer_uses, subtotal, now: uses < max_uses,
+                           f"Promo code {code} has reached its usage limit."))
+        if self.max_uses_per_customer is not None:
+            max_per_customer = self.max_uses_per_customer
+            checks.append((lambda uses, customer_uses, subtotal, now: customer_uses < max_per_customer,
+                           f"You have already used promo code {code} the maximum number of times."))
+        return checks
+
+    def rejection(self, uses: int, customer_uses: int, subtotal: float, now: datetime.datetime) -> str:
+        """Return why the promotion does not apply, or None if it does."""
+        if self._checks is None:
+            self._checks = self._compile()
+        for predicate, message in self._checks:
+            if not predicate(uses, customer_uses, subtotal, now):
+                return message
+        return None
+
+    def discount_percent(self, items: dict, menu: dict, subtotal: float) -> float:
+        """The discount as a percentage of the whole order (scoped promotions only cover their items)."""
+        if self.items is None:
+            return self.percent
+        scoped = sum(menu[item] * qty for item, qty in items.items() if item in self.items)
+        return self.percent * scoped / subtotal if subtotal else 0
+
+    def to_dict(self) -> dict:
+        return {
+            "code": self.code,
+            "percent": self.percent,
+            "starts_at": self.starts_at,
+            "expires_at": self.expires_at,
+            "max_uses": self.max_uses,
+            "max_uses_per_customer": self.max_uses_per_customer,
+            "min_basket": self.min_basket,
+            "items": sorted(self.items) if self.items else None,
+            "automatic": self.automatic,
+        }
+
+class PromotionEngine:
+    def __init__(self):
+        """
+        Initialize the set of promotions and their usage counters.
+        Codes are looked up directly and automatic promotions are indexed by the items they
+        are scoped to, so evaluating an order only looks at the promotions that can match it.
+        """
+        self.promotions = {}                        # code -> Promotion
+        self.uses = collections.Counter()           # code -> orders that used it
+        self.customer_uses = collections.Counter()  # (code, username) -> orders that used it
+        self._init_runtime()
+
+    def _init_runtime(self) -> None:
+        self._lock = threading.Lock()               # Checking and counting a use is one step
+        self._automatic_by_item = {}                # item -> [automatic Promotion scoped to it]
+        self._automatic_unscoped = []               # Automatic promotions for any item
+        for promotion in self.promotions.values():
+            self._index(promotion)
+
+    def __getstate__(self) -> dict:
+        return {"promotions": self.promotions, "uses": self.uses, "customer_uses": self.customer_uses}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._init_runtime()
+
+    def __len__(self) -> int:
+        return len(self.promotions)
+
+    def _index(self, promotion: Promotion) -> None:
+        if not promotion.automatic:
+            return
+        if promotion.items is None:
+            self._automatic_unscoped.append(promotion)
+        else:
+            for item in promotion.items:
+                self._automatic_by_item.setdefault(item, []).append(promotion)
+
+    def _unindex(self, promotion: Promotion) -> None:
+        if promotion in self._automatic_unscoped:
+            self._automatic_unscoped.remove(promotion)
+        for item in promotion.items or []:
+            scoped = self._automatic_by_item.get(item, [])
+            if promotion in scoped:
+                scoped.remove(promotion)
+
+    def add(self, promotion: Promotion) -> None:
+        """Add a promotion, replacing any other with the same code (usage counts are kept)."""
+        with self._lock:
+            previous = self.promotions.get(promotion.code)
+            if previous is not None:
+                self._unindex(previous)
+            self.promotions[promotion.code] = promotion
+            self._index(promotion)
+
+    def remove(self, code: str) -> None:
+        """Remove a promotion."""
+        with self._lock:
+            promotion = self.promotions.pop(code, None)
+            if promotion is None:
+                raise ValueError(f"Invalid promo code: {code}")
+            self._unindex(promotion)
+
+    def get(self, code: str) -> Promotion:
+        return self.promotions.get(code)
+
+    def _candidates(self, code: str, items: dict) -> list:
+        candidates = []
+        if code:
+            if code not in self.promotions:
+                raise ValueError(f"Invalid promo code: {code}")
+            candidates.append(self.promotions[code])
+        candidates.extend(self._automatic_unscoped)
+        for item in items:
+            candidates.extend(self._automatic_by_item.get(item, ()))
+        return candidates
+
+    def _best(self, code: str, username: str, items: dict, menu: dict, now: datetime.datetime) -> tuple:
+        """Pick the applicable promotion giving the largest discount. Must hold the lock."""
+        subtotal = sum(menu[item] * qty for item, qty in items.items())
+        best, best_percent = None, 0
+        for promotion in self._candidates(code, items):
+            rejection = promotion.rejection(self.uses[promotion.code],
+                                            self.customer_uses[(promotion.code, username)], subtotal, now)
+            if rejection is not None:
+                if promotion.code == code:
+                    raise ValueError(rejection)   # The customer asked for this code
+                continue
+            percent = promotion.discount_percent(items, menu, subtotal)
+            if promotion.code == code and percent == 0:
+                raise ValueError(f"Promo code {code} does not apply to any item in this order.")
+            if percent > best_percent:
+                best, best_percent = promotion, percent
+        return best, best_percent
+
+    def best_discount(self, code: str, username: str, items: dict, menu: dict,
+                      now: datetime.datetime = None) -> tuple:
+        """
+        Return (promotion, percent) for the best discount an order would get, without using it.
+        Raises ValueError if `code` is given but cannot be applied.
+        """
+        with self._lock:
+            return self._best(code, username, items, menu, now or datetime.datetime.now())
+
+    def apply(self, code: str, username: str, items: dict, menu: dict, now: datetime.datetime = None) -> tuple:
+        """
+        Like best_discount, but also count a use of the chosen promotion, in the same step,
+        so concurrent orders cannot exceed a usage limit. Call release if the order fails.
+        """
+        with self._lock:
+            promotion, percent = self._best(code, username, items, menu, now or datetime.datetime.now())
+            if promotion is not None:
+                self.uses[promotion.code] += 1
+                self.customer_uses[(promotion.code, username)] += 1
+            return promotion, percent
+
+    def release(self, code: str, username: str) -> None:
+        """Give back a use counted by apply, e.g. when the order failed or was cancelled."""
+        with self._lock:
+            if self.uses[code] > 0:
+                self.uses[code] -= 1
+            if self.customer_uses[(code, username)] > 0:
+                self.customer_uses[(code, username)] -= 1
+
+class PromoCodeMap(collections.abc.MutableMapping):
+    def __init__(self, engine: PromotionEngine):
+        """
+        A dict-like code -> percent view of an engine's promotions, so code written against
+        the flat promo_codes dict keeps working. Setting a code adds a promotion without rules.
+        """
+        self._engine = engine
+
+    def __getitem__(self, code: str) -> float:
+        promotion = self._engine.get(code)
+        if promotion is None:
+            raise KeyError(code)
+        return promotion.percent
+
+    def __contains__(self, code) -> bool:
+        return code in self._engine.promotions
+
+    def __setitem__(self, code: str, percent: float) -> None:
+        self._engine.add(Promotion(code, percent))
+
+    def __delitem__(self, code: str) -> None:
+        try:
+            self._engine.remove(code)
+        except ValueError:
+            raise KeyError(code)
+
+    def __iter__(self):
+        return iter(list(self._engine.promotions))
+
+    def __len__(self) -> int:
+        return len(self._engine.promotions)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
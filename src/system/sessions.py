@@ -0,0 +1,67 @@
+import collections
+import secrets
+import threading
+import time
+from utils.constants import SESSION_TTL_SECONDS, MAX_SESSIONS
+
+class SessionCache:
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_sessions: int = MAX_SESSIONS):
+        """
+        Initialize a cache of login sessions.
+        A token resolves to its (role, username) until it expires, so authenticated calls
+        never need to hash the password again. When full, the oldest sessions are dropped.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = collections.OrderedDict()   # token -> (role, username, expires_at), oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def issue(self, role: str, username: str) -> str:
+        """Create a session and return its token."""
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._sessions[token] = (role, username, time.monotonic() + self.ttl_seconds)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return token
+
+    def resolve(self, token: str) -> tuple:
+        """Return (role, username) for a valid token, or None if it is unknown or expired."""
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if session[2] <= time.monotonic():
+                del self._sessions[token]
+                return None
+            return session[0], session[1]
+
+    def revoke(self, token: str) -> bool:
+        """End a session. Returns False if the token was not known."""
+        with self._lock:
+            return self._sessions.pop(token, None) is not None
+
+    def revoke_user(self, role: str, username: str) -> int:
+        """End every session of a user, e.g. after a password change. Returns how many were ended."""
+        with self._lock:
+            tokens = [t for t, s in self._sessions.items() if s[0] == role and s[1] == username]
+            for token in tokens:
+                del self._sessions[token]
+        return len(tokens)
+
+    def purge_expired(self) -> int:
+        """Drop expired sessions. Returns how many were dropped."""
+        now = time.monotonic()
+        with self._lock:
+            # Sessions are kept in issue order and share one TTL, so expired ones come first
+            expired = 0
+            while self._sessions:
+                token, session = next(iter(self._sessions.items()))
+                if session[2] > now:
+                    break
+                del self._sessions[token]
+                expired += 1
+        return expired
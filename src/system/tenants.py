@@ -0,0 +1,200 @@
+import collections
+import contextlib
+import os
+import re
+import threading
+import time
+from system.food_delivery_system import FoodDeliverySystem
+from system.persistence import load_system
+from utils.constants import TENANTS_DIR, MAX_ACTIVE_TENANTS
+
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+STORE_SUFFIX = ".pkl"
+
+class TenantRegistry:
+    def __init__(self, base_dir: str = TENANTS_DIR, max_active: int = MAX_ACTIVE_TENANTS):
+        """
+        Initialize a registry of restaurants, each with its own system, store, menu and agents.
+        A restaurant's system is loaded on first access and kept while it is in use; once more
+        than `max_active` are loaded, the least recently used idle ones are saved and unloaded.
+        Stores are loaded and saved under a lock of their own tenant, so a slow load never
+        holds up the other restaurants. The stores' directory is created with the first tenant.
+        """
+        if max_active < 1:
+            raise ValueError("At least one tenant must be allowed to stay loaded.")
+        self.base_dir = base_dir
+        self.max_active = max_active
+        self._active = collections.OrderedDict()    # tenant_id -> system, least recently used first
+        self._last_used = {}                        # tenant_id -> monotonic time of last access
+        self._pins = collections.Counter()          # tenant_id -> callers currently using it
+        self._tenant_locks = {}                     # tenant_id -> Lock held while loading or unloading it
+        self._lock = threading.RLock()              # The tables above; never held while loading or saving
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    @staticmethod
+    def _check_id(tenant_id: str) -> None:
+        if not isinstance(tenant_id, str) or not TENANT_ID_PATTERN.match(tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id!r}. Use letters, digits, '-' and '_'.")
+
+    def store_path(self, tenant_id: str) -> str:
+        """Path of a tenant's persistence file."""
+        self._check_id(tenant_id)
+        return os.path.join(self.base_dir, tenant_id + STORE_SUFFIX)
+
+    def exists(self, tenant_id: str) -> bool:
+        """Check if a tenant has been created."""
+        return tenant_id in self._active or os.path.exists(self.store_path(tenant_id))
+
+    def is_loaded(self, tenant_id: str) -> bool:
+        """Check if a tenant's system is in memory, so getting it does not read its store."""
+        return tenant_id in self._active
+
+    def list_tenants(self) -> list:
+        """Ids of every tenant, loaded or not."""
+        try:
+            names = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            names = []
+        stored = {name[:-len(STORE_SUFFIX)] for name in names if name.endswith(STORE_SUFFIX)}
+        return sorted(stored | set(self._active))
+
+    def active_tenants(self) -> list:
+        """Ids of the loaded tenants, least recently used first."""
+        with self._lock:
+            return list(self._active)
+
+    def loaded_systems(self) -> dict:
+        """The loaded tenants' systems, by tenant id."""
+        with self._lock:
+            return dict(self._active)
+
+    def _tenant_lock(self, tenant_id: str) -> threading.Lock:
+        with self._lock:
+            return self._tenant_locks.setdefault(tenant_id, threading.Lock())
+
+    def create_tenant(self, tenant_id: str, menu: dict = None, agents: dict = None) -> FoodDeliverySystem:
+        """
+        Create a restaurant with its own menu (item -> price) and agents (agent_id -> name),
+        defaulting to the standard menu and fleet, and save its store.
+        """
+        self._check_id(tenant_id)
+        with self._tenant_lock(tenant_id):
+            if self.exists(tenant_id):
+                raise ValueError(f"Tenant {tenant_id} already exists.")
+            os.makedirs(self.base_dir, exist_ok=True)
+            system = FoodDeliverySystem(menu=menu, agents=agents)
+            system.persistence_file = self.store_path(tenant_id)
+            system.save_state()
+            with self._lock:
+                self._activate(tenant_id, system)
+        self._evict_over_limit()
+        return system
+
+    def _touch(self, tenant_id: str):
+        """Mark a loaded tenant as just used and return its system (None if not loaded). Needs _lock."""
+        system = self._active.get(tenant_id)
+        if system is not None:
+            self._active.move_to_end(tenant_id)
+            self._last_used[tenant_id] = time.monotonic()
+        return system
+
+    def _load(self, tenant_id: str, pin: bool) -> FoodDeliverySystem:
+        """Get a tenant's system, loading it under its own lock if needed, and optionally pin it."""
+        with self._lock:
+            system = self._touch(tenant_id)
+            if system is not None:
+                if pin:
+                    self._pins[tenant_id] += 1
+                return system
+        path = self.store_path(tenant_id)
+        if not os.path.exists(path):
+            raise ValueError(f"Tenant {tenant_id} not found.")
+        with self._tenant_lock(tenant_id):
+            with self._lock:
+                system = self._touch(tenant_id)     # Loaded by another caller meanwhile
+                if system is not None:
+                    if pin:
+                        self._pins[tenant_id] += 1
+                    return system
+            system = load_system(FoodDeliverySystem, path)
+            with self._lock:
+                self._activate(tenant_id, system)
+                if pin:
+                    self._pins[tenant_id] += 1
+        self._evict_over_limit()
+        return system
+
+    def get(self, tenant_id: str) -> FoodDeliverySystem:
+        """
+        Get a restaurant's system, loading it if needed.
+        Prefer `use` when holding on to the system, so that it is not unloaded meanwhile.
+        """
+        return self._load(tenant_id, pin=False)
+
+    def pin(self, tenant_id: str) -> FoodDeliverySystem:
+        """Get a restaurant's system, loading it if needed, and keep it loaded until unpin is called."""
+        return self._load(tenant_id, pin=True)
+
+    def unpin(self, tenant_id: str) -> None:
+        """Let a pinned restaurant be unloaded again."""
+        with self._lock:
+            self._pins[tenant_id] -= 1
+            if self._pins[tenant_id] <= 0:
+                del self._pins[tenant_id]
+            self._last_used[tenant_id] = time.monotonic()
+        self._evict_over_limit()
+
+    @contextlib.contextmanager
+    def use(self, tenant_id: str):
+        """Use a restaurant's system, keeping it loaded until the block ends."""
+        system = self.pin(tenant_id)
+        try:
+            yield system
+        finally:
+            self.unpin(tenant_id)
+
+    def _activate(self, tenant_id: str, system: FoodDeliverySystem) -> None:
+        self._active[tenant_id] = system
+        self._last_used[tenant_id] = time.monotonic()
+
+    def _evict_over_limit(self) -> None:
+        """Unload least recently used tenants until at most max_active are loaded (in-use ones stay)."""
+        with self._lock:
+            excess = len(self._active) - self.max_active
+            idle = [tenant_id for tenant_id in self._active if tenant_id not in self._pins]
+        for tenant_id in idle[:max(excess, 0)]:
+            self.evict(tenant_id)
+
+    def evict(self, tenant_id: str) -> bool:
+        """
+        Save and unload a tenant. Returns False if it was not loaded or is in use.
+        Getting the tenant meanwhile waits for the save, then reloads it.
+        """
+        with self._tenant_lock(tenant_id):
+            with self._lock:
+                if tenant_id not in self._active or tenant_id in self._pins:
+                    return False
+                system = self._active.pop(tenant_id)
+                del self._last_used[tenant_id]
+            system.flush()
+        return True
+
+    def evict_idle(self, max_idle_seconds: float) -> list:
+        """Unload every tenant not used for `max_idle_seconds`. Returns the evicted ids."""
+        cutoff = time.monotonic() - max_idle_seconds
+        with self._lock:
+            idle = [t for t in self._active if self._last_used[t] <= cutoff]
+        return [tenant_id for tenant_id in idle if self.evict(tenant_id)]
+
+    def flush_all(self) -> int:
+        """Save pending changes of every loaded tenant. Returns how many were saved."""
+        with self._lock:
+            systems = list(self._active.values())
+        return sum(1 for system in systems if system.flush())
+
+    def close(self) -> None:
+        """Save and unload every tenant."""
+        for tenant_id in self.active_tenants():
+            self.evict(tenant_id)
@@ -0,0 +1,98 @@
+import datetime
+import threading
+from system.archive import TERMINAL_STATUSES
+
+# Longest wait between refreshes. Rows whose text only changes with their status are re-read this
+# often even without an event, since not every status change is announced
+MAX_REFRESH_INTERVAL = 5.0
+# Shortest wait, so a countdown about to tick is not refreshed in a busy loop
+MIN_REFRESH_INTERVAL = 0.05
+
+def countdown(order, now: datetime.datetime) -> tuple:
+    """
+    The time left on an open order, as (text, seconds until the text changes). The seconds are
+    None once the order is ready, as the text then only changes with the order's status.
+    """
+    remaining = (order.estimated_time - now).total_seconds()
+    if remaining <= 0:
+        return "ready", None
+    if remaining >= 3600:
+        hours, minutes = divmod(int(remaining) // 60, 60)
+        return f"{hours}h {minutes:02d}m left", remaining % 60
+    minutes, seconds = divmod(int(remaining), 60)
+    return f"{minutes}m {seconds:02d}s left", remaining % 1
+
+def order_row(order, now: datetime.datetime) -> tuple:
+    """One line describing an order for live tracking, and seconds until it changes (None: on a status change)."""
+    if order.status in TERMINAL_STATUSES:
+        left, change_in = "", None
+    else:
+        left, change_in = countdown(order, now)
+    return f"{order.order_id}  {order.order_type:<13}  {order.status:<23}  {left}".rstrip(), change_in
+
+class OrderTracker:
+    def __init__(self, system, customer):
+        """
+        Initialize a tracker of one customer's open orders, kept up to date by the system's order
+        events rather than by re-reading the customer's history. A finished order is reported once
+        more, with its final status, and then dropped; finished orders are never looked at again.
+        Call start() to subscribe and stop() when done.
+        """
+        self.system = system
+        self.username = customer.username
+        self._orders = {order.order_id: order for order in customer.get_order_history()
+                        if order.status not in TERMINAL_STATUSES}   # order_id -> open Order, oldest first
+        self._rows = {}             # order_id -> text last returned by refresh
+        self._pending = set()       # Ids of the customer's orders with events since the last refresh
+        self._lock = threading.Lock()
+        self.changed = threading.Event()    # Set when an event arrives; a view can wait on it
+        self.next_refresh = 0.0     # Seconds from the last refresh until a row may change without an event
+
+    def start(self) -> "OrderTracker":
+        """Start receiving the customer's order events."""
+        self.system.event_bus.subscribe(self._on_event)
+        return self
+
+    def stop(self) -> None:
+        """Stop receiving events."""
+        self.system.event_bus.unsubscribe(self._on_event)
+
+    def _on_event(self, event) -> None:
+        # Runs in the publishing thread: only note the order
+        if event.username == self.username:
+            with self._lock:
+                self._pending.add(event.order_id)
+            self.changed.set()
+
+    @property
+    def active(self) -> list:
+        """Ids of the orders still being tracked."""
+        return list(self._orders)
+
+    def refresh(self, now: datetime.datetime = None) -> list:
+        """
+        Re-read the tracked orders (and any the customer has placed since) and return
+        [(order_id, text)] for the rows whose text changed since the last refresh. Sets
+        next_refresh to when the soonest countdown changes.
+        """
+        now = now or datetime.datetime.now()
+        self.changed.clear()
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for order_id in pending - self._orders.keys() - self._rows.keys():
+            order = self.system.orders_by_id.get(order_id)
+            if order is not None and order.status not in TERMINAL_STATUSES:
+                self._orders[order_id] = order
+        changes = []
+        wait = MAX_REFRESH_INTERVAL
+        for order_id, order in list(self._orders.items()):
+            text, change_in = order_row(order, now)
+            if self._rows.get(order_id) != text:
+                self._rows[order_id] = text
+                changes.append((order_id, text))
+            if order.status in TERMINAL_STATUSES:
+                del self._orders[order_id]
+            elif change_in is not None:
+                wait = min(wait, change_in)
+        self.next_refresh = max(wait, MIN_REFRESH_INTERVAL)
+        return changes
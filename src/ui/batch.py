@@ -0,0 +1,186 @@
+import json
+import sys
+import time
+from system.export import order_record
+from utils.histogram import LatencyHistogram
+
+# Reports a script can ask for, by name
+REPORTS = {
+    "dashboard": lambda system: system.manager.view_restaurant_pov(system.order_history()),
+    "popular-items": lambda system: system.manager.generate_popular_items_report(system.order_history()),
+    "latency": lambda system: system.manager.generate_latency_report(system.order_history()),
+}
+
+class BatchSession:
+    """
+    Runs script commands against a system without prompts, the way a logged-in CLI user would.
+    Each command is a JSON object with a "cmd" field; orders and cancellations act for the
+    customer of the last login (or registration). An order can be given a "ref" name that later
+    commands use instead of its order_id, since ids are only known once the order is placed.
+    """
+
+    def __init__(self, system):
+        self.system = system
+        self.customer = None        # Customer of the last login
+        self.refs = {}              # ref name -> order_id
+        self._commands = {
+            "register": self.register,
+            "login": self.login,
+            "logout": self.logout,
+            "order": self.order,
+            "cancel": self.cancel,
+            "rate": self.rate,
+            "dispatch": self.dispatch,
+            "report": self.report,
+        }
+
+    @property
+    def commands(self) -> list:
+        """Names of the commands a script can use."""
+        return list(self._commands)
+
+    def _logged_in(self):
+        if self.customer is None:
+            raise ValueError("Please log in first.")
+        return self.customer
+
+    def _order_id(self, command: dict) -> str:
+        ref = command.get("ref")
+        if ref is not None:
+            if ref not in self.refs:
+                raise ValueError(f"Unknown order ref '{ref}'.")
+            return self.refs[ref]
+        order_id = command.get("order_id")
+        if not order_id:
+            raise ValueError("Please give the order_id or ref of the order.")
+        return order_id
+
+    def register(self, command: dict) -> dict:
+        username, password, name = command.get("username", ""), command.get("password", ""), command.get("name", "")
+        if not username or not password or not name:
+            raise ValueError("Username, password, and name are required for registration.")
+        self.customer = self.system.register_customer(username, password, name)
+        return {"username": username}
+
+    def login(self, command: dict) -> dict:
+        self.customer = self.system.login_customer(command.get("username", ""), command.get("password", ""))
+        return {"username": self.customer.username}
+
+    def logout(self, command: dict) -> dict:
+        self.customer = None
+        return {}
+
+    def order(self, command: dict) -> dict:
+        items = command.get("items")
+        if not isinstance(items, dict):
+            raise ValueError("Order must contain an items object.")
+        order = self.system.place_order(self._logged_in(), command.get("order_type", ""), items,
+                                        special_instructions=command.get("special_instructions", ""),
+                                        promo_code=command.get("promo_code") or None)
+        if command.get("ref") is not None:
+            self.refs[command["ref"]] = order.order_id
+        return order_record(order)
+
+    def cancel(self, command: dict) -> dict:
+        order_id = self._order_id(command)
+        self.system.cancel_order(self._logged_in(), order_id)
+        return {"order_id": order_id, "status": "Cancelled"}
+
+    def rate(self, command: dict) -> dict:
+        order_id = self._order_id(command)
+        rating = command.get("rating")
+        if not isinstance(rating, int):
+            raise ValueError("Rating must be an integer between 1 and 5.")
+        self.system.rate_order(self._logged_in(), order_id, rating, command.get("feedback", ""))
+        return {"order_id": order_id, "rating": rating}
+
+    def dispatch(self, command: dict) -> dict:
+        return {"assigned": self.system.check_unassigned_orders()}
+
+    def report(self, command: dict) -> dict:
+        kind = command.get("kind", "dashboard")
+        if kind == "top-customers":
+            top = self.system.get_top_customers(int(command.get("n", 10)), command.get("by", "total_spend"))
+            return {"customers": [stats.to_dict() for stats in top]}
+        if kind not in REPORTS:
+            raise ValueError(f"Unknown report '{kind}'. Choose from: {', '.join(list(REPORTS) + ['top-customers'])}.")
+        return {"report": REPORTS[kind](self.system)}
+
+    def run(self, command: dict) -> dict:
+        """Run one command, returning its result. Raises ValueError for invalid commands or input."""
+        if not isinstance(command, dict):
+            raise ValueError("A command must be a JSON object.")
+        handler = self._commands.get(command.get("cmd"))
+        if handler is None:
+            raise ValueError(f"Unknown command {command.get('cmd')!r}. Choose from: {', '.join(self.commands)}.")
+        return handler(command)
+
+def parse_line(line: str):
+    """Parse one script line; blank lines and lines starting with # hold no command (None)."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+
+def run_script(system, lines, out=None, stop_on_error: bool = False, quiet: bool = False) -> dict:
+    """
+    Run script lines (any iterable of strings, e.g. an open file) against a system.
+    Writes one JSON result line per command to `out` (unless quiet), with its line number,
+    outcome and elapsed milliseconds. Autosave is off while the script runs and the store is
+    saved once at the end. Returns a summary with counts, throughput and latency per command.
+    """
+    session = BatchSession(system)
+    histograms = {}
+    summary = {"commands": 0, "ok": 0, "errors": 0}
+    system.set_autosave(False)
+    start = time.perf_counter()
+    try:
+        for number, line in enumerate(lines, 1):
+            command_start = time.perf_counter()
+            command = None
+            try:
+                command = parse_line(line)
+                if command is None:
+                    continue
+                outcome = {"ok": True, "result": session.run(command)}
+            except (ValueError, TypeError, KeyError) as e:
+                outcome = {"ok": False, "error": str(e)}
+            elapsed = time.perf_counter() - command_start
+            result = {"line": number, "cmd": command.get("cmd") if isinstance(command, dict) else None, **outcome}
+            name = result["cmd"] if result["cmd"] in session.commands else "invalid"
+            histograms.setdefault(name, LatencyHistogram()).record(elapsed)
+            summary["commands"] += 1
+            summary["ok" if result["ok"] else "errors"] += 1
+            if out is not None and not quiet:
+                result["elapsed_ms"] = round(elapsed * 1000, 3)
+                out.write(json.dumps(result, default=str) + "\n")
+            if stop_on_error and not result["ok"]:
+                break
+    finally:
+        elapsed = time.perf_counter() - start
+        system.set_autosave(True)   # Saves the script's changes once
+    summary["elapsed_s"] = round(elapsed, 6)
+    summary["commands_per_second"] = round(summary["commands"] / elapsed, 2) if summary["commands"] else None
+    summary["latency_ms"] = {
+        name: {"count": histogram.count,
+               **{f"p{p}": round(histogram.percentile(p) * 1000, 4) for p in (50, 99)}}
+        for name, histogram in sorted(histograms.items())}
+    return summary
+
+def run_batch(system, args) -> None:
+    """Handle the batch subcommand: run a script file (or stdin) and print a summary to stderr."""
+    try:
+        if args.script == "-":
+            summary = run_script(system, sys.stdin, sys.stdout, args.stop_on_error, args.quiet)
+        else:
+            with open(args.script, encoding="utf-8") as f:
+                summary = run_script(system, f, sys.stdout, args.stop_on_error, args.quiet)
+    except OSError as e:
+        print("Batch error:", e, file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(summary), file=sys.stderr)
+    if summary["errors"]:
+        sys.exit(1)
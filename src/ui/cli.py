@@ -1,9 +1,15 @@
 from utils.input_helpers import input_non_empty, input_int
-from utils.constants import MENU, ORDER_TYPES
+from utils.constants import ORDER_TYPES
 from system.persistence import load_system
+from system.tracking import OrderTracker
+from ui.tracking import LiveOrderView, track_orders
 import datetime
 import sys
 
+# Orders shown per page in order listings
+ORDERS_PAGE_SIZE = 5
+MANAGER_ORDERS_PAGE_SIZE = 20
+
 def main_menu(system):
     """Display and handle the main menu of the application."""
     while True:
@@ -52,7 +58,7 @@ def handle_manager_login(system):
     """Handle the manager login process."""
     username = input_non_empty("Manager Username: ")
     password = input_non_empty("Manager Password: ")
-    if username == system.manager.username and password == system.manager.password:
+    if username == system.manager.username and system.manager.check_password(password):
         manager_menu(system)
     else:
         print("Invalid manager credentials.")
@@ -70,10 +76,11 @@ def customer_menu(system, customer):
         print("7. Reorder Previous")
         print("8. Confirm Order Recieved/Picked Up")
         print("9. Logout")
+        print("10. Track Active Orders")
         
         choice = input_non_empty("Enter your choice: ")
         
-        system.check_unassigned_orders()
+        system.dispatch_if_due()
         if choice == "1":
             handle_place_order(system, customer)
         elif choice == "2":
@@ -93,14 +100,19 @@ def customer_menu(system, customer):
         elif choice == "9":
             print("Logging out...")
             break
+        elif choice == "10":
+            handle_track_orders(system, customer)
         else:
             print("Invalid choice. Please try again.")
 
 def handle_place_order(system, customer):
     """Handle the order placement process."""
     print("\n--- Menu Items ---")
-    for item, price in MENU.items():
-        print(f"{item}: ${price:.2f}")
+    for category, items in system.catalog.by_category().items():
+        if category:
+            print(f"[{category}]")
+        for item in items:
+            print(f"{item.name}: ${item.price:.2f}")
     
     # Collect order items
     order_items = {}
@@ -109,7 +121,7 @@ def handle_place_order(system, customer):
         if item_name.lower() == "done":
             break
             
-        if item_name not in MENU:
+        if item_name not in system.menu:
             print(f"Sorry, {item_name} is not in our menu.")
             continue
             
@@ -148,33 +160,53 @@ def handle_place_order(system, customer):
     except ValueError as ve:
         print("Error placing order:", ve)
 
+def print_order_summary(number, order):
+    """Print one order of the customer's order history."""
+    print(f"{number}. Order ID: {order.order_id}")
+    print(f"   Type: {order.order_type}")
+    print(f"   Items: {order.items}")
+    print(f"   Date: {order.order_time.strftime('%Y-%m-%d %H:%M')}")
+    print(f"   Status: {order.status}")
+    print(f"   Total: ${order.calculate_total():.2f}")
+    if order.special_instructions:
+        print(f"   Special Instructions: {order.special_instructions}")
+        
+    time_left = order.time_left()
+    if time_left == "Order ready for pickup/delivery.":
+        if order.status not in ["Picked Up", "Delivered", "Cancelled"]:
+            if order.order_type == "Takeaway":
+                print(f"   Status: Ready for pickup!")
+    elif order.status not in ["Picked Up", "Delivered", "Cancelled"]:
+        print(f"   Time Left: {time_left}")
+        
+    print()
+
+def page_through(fetch_page, print_item) -> int:
+    """
+    Print pages from fetch_page(cursor) -> (items, next_cursor) until the user stops
+    or there are no more pages. Returns the number of items printed.
+    """
+    items, cursor = fetch_page(None)
+    number = 0
+    while True:
+        for item in items:
+            number += 1
+            print_item(number, item)
+        if not cursor:
+            return number
+        if input("Enter 'n' for the next page (anything else to stop): ").lower() != 'n':
+            return number
+        items, cursor = fetch_page(cursor)
+
 def handle_view_orders(customer, system):
-    """Display the customer's order history."""
-    orders = customer.get_order_history()
-    if not orders:
+    """Display the customer's order history, newest first, one page at a time."""
+    if not system.get_customer_orders_page(customer, 1)[0]:
         print("You have no orders.")
         return
         
     print("\n--- Your Order History ---")
-    for i, order in enumerate(orders, 1):
-        print(f"{i}. Order ID: {order.order_id}")
-        print(f"   Type: {order.order_type}")
-        print(f"   Items: {order.items}")
-        print(f"   Date: {order.order_time.strftime('%Y-%m-%d %H:%M')}")
-        print(f"   Status: {order.status}")
-        print(f"   Total: ${order.calculate_total():.2f}")
-        if order.special_instructions:
-            print(f"   Special Instructions: {order.special_instructions}")
-            
-        time_left = order.time_left()
-        if time_left == "Order ready for pickup/delivery.":
-            if order.status not in ["Picked Up", "Delivered", "Cancelled"]:
-                if order.order_type == "Takeaway":
-                    print(f"   Status: Ready for pickup!")
-        elif order.status not in ["Picked Up", "Delivered", "Cancelled"]:
-            print(f"   Time Left: {time_left}")
-            
-        print()
+    page_through(lambda cursor: system.get_customer_orders_page(customer, ORDERS_PAGE_SIZE, cursor),
+                 print_order_summary)
         
     # Option to filter by date range
     print("\nDo you want to filter orders by date range?")
@@ -183,20 +215,37 @@ def handle_view_orders(customer, system):
             days = input_int("Enter number of days back to search: ", 1)
             start_date = datetime.datetime.now() - datetime.timedelta(days=days)
             end_date = datetime.datetime.now()
-            filtered_orders = system.get_orders_by_date_range(customer, start_date, end_date)
             
+            def print_filtered(number, order):
+                print(f"{number}. Order ID: {order.order_id}")
+                print(f"   Date: {order.order_time.strftime('%Y-%m-%d %H:%M')}")
+                print(f"   Items: {order.items}")
+                print()
+                
             print(f"\n--- Orders from the last {days} days ---")
-            if not filtered_orders:
+            shown = page_through(lambda cursor: system.get_customer_orders_page(
+                customer, ORDERS_PAGE_SIZE, cursor, start_date=start_date, end_date=end_date), print_filtered)
+            if not shown:
                 print("No orders found in this date range.")
-            else:
-                for i, order in enumerate(filtered_orders, 1):
-                    print(f"{i}. Order ID: {order.order_id}")
-                    print(f"   Date: {order.order_time.strftime('%Y-%m-%d %H:%M')}")
-                    print(f"   Items: {order.items}")
-                    print()
         except ValueError as ve:
             print("Error filtering orders:", ve)
 
+def handle_track_orders(system, customer):
+    """Follow the customer's open orders live, redrawing only the rows that change."""
+    tracker = OrderTracker(system, customer).start()
+    try:
+        if not tracker.active:
+            print("You have no active orders.")
+            return
+        print("\n--- Tracking Your Active Orders (press Enter to stop) ---")
+        track_orders(system, tracker, LiveOrderView())
+        if not tracker.active:
+            print("All your orders are finished.")
+    except KeyboardInterrupt:
+        print()
+    finally:
+        tracker.stop()
+
 def handle_cancel_order(system, customer):
     """Handle cancellation of an order."""
     orders = customer.get_order_history()
@@ -309,7 +358,7 @@ def handle_notification_preferences(system, customer):
 
 def handle_reorder(system, customer):
     """Handle reordering a previous order."""
-    orders = customer.get_order_history()
+    orders = system.get_customer_orders(customer)
     if not orders:
         print("You have no previous orders to reorder.")
         return
@@ -397,22 +446,54 @@ def manager_menu(system):
         print("\nManager Menu")
         print("1. View Restaurant POV")
         print("2. Generate Popular Items Report")
-        print("3. Logout")
+        print("3. Delivery Latency Report")
+        print("4. Full History Report")
+        print("5. Top Customers Report")
+        print("6. List Orders")
+        print("7. Logout")
         
         choice = input_non_empty("Enter your choice: ")
         
-        system = load_system(type(system))
+        system = load_system(type(system), system.persistence_file)
         
         if choice == "1":
-            report = system.manager.view_restaurant_pov(system.all_orders)
+            report = system.manager.view_restaurant_pov(system.order_history())
             print("\n--- Restaurant Report ---")
             print(report)
         elif choice == "2":
-            report = system.manager.generate_popular_items_report(system.all_orders)
+            report = system.manager.generate_popular_items_report(system.order_history())
             print("\n--- Popular Items Report ---")
             print(report)
         elif choice == "3":
+            report = system.manager.generate_latency_report(system.order_history())
+            print("\n--- Delivery Latency Report ---")
+            print(report)
+        elif choice == "4":
+            report = system.manager.generate_full_history_report(system.order_history())
+            print("\n--- Full History Report ---")
+            print(report)
+        elif choice == "5":
+            report = system.manager.generate_top_customers_report(system.get_top_customers(10))
+            print("\n--- Top Customers Report ---")
+            print(report)
+        elif choice == "6":
+            handle_list_orders(system)
+        elif choice == "7":
             print("Logging out...")
             break
         else:
-            print("Invalid choice. Please try again.")
\ No newline at end of file
+            print("Invalid choice. Please try again.")
+
+def handle_list_orders(system):
+    """List all orders for the manager, newest first, optionally filtered by status."""
+    status = input("Filter by status (leave empty for all): ").strip() or None
+    
+    def print_order(number, order):
+        print(f"{number}. {order.order_id} | {order.customer} | {order.order_type} | "
+              f"{order.order_time.strftime('%Y-%m-%d %H:%M')} | {order.status} | ${order.calculate_total():.2f}")
+        
+    print("\n--- Orders ---")
+    shown = page_through(lambda cursor: system.list_orders_page(MANAGER_ORDERS_PAGE_SIZE, cursor, status=status),
+                         print_order)
+    if not shown:
+        print("No orders found.")
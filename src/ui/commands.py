@@ -0,0 +1,323 @@
+from system.export import export_records, EXPORT_FORMATS, EXPORT_KINDS
+from system.importers import import_records, IMPORT_FORMATS, IMPORT_KINDS
+from system.notifications import FileSink, SocketSink
+from system.tenants import TenantRegistry
+from system.promotions import Promotion
+from system.datagen import generate_dataset, DEFAULT_AGENTS, DEFAULT_DAYS, DEFAULT_CANCEL_RATE, DEFAULT_RATING_RATE
+from system.food_delivery_system import FoodDeliverySystem
+from system.journal import replay_trace
+from system.persistence import load_system
+from api.server import run_server
+from ui.batch import run_batch
+from utils.constants import NOTIFICATIONS_FILE, PROFILE_FILE
+from utils.profiling import PROFILE_MODES
+import argparse
+import datetime
+import json
+import os
+import sys
+
+def parse_date(value: str, end_of_day: bool = False) -> datetime.datetime:
+    """Parse a YYYY-MM-DD command-line date, optionally as the last instant of that day."""
+    try:
+        date = datetime.datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}'. Please use YYYY-MM-DD.")
+    if end_of_day:
+        date += datetime.timedelta(days=1, microseconds=-1)
+    return date
+
+def parse_datetime(value: str) -> datetime.datetime:
+    """Parse a command-line date and time (ISO 8601, e.g. 2025-01-01T18:30) or "now"."""
+    if value == "now":
+        return datetime.datetime.now()
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date and time '{value}'. Please use YYYY-MM-DDTHH:MM or 'now'.")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser. Without a subcommand the interactive menu is started."""
+    parser = argparse.ArgumentParser(description="Online Food Delivery System")
+    parser.add_argument("--tenant", help="Restaurant to run as (see the tenants subcommand); "
+                                          "without it the single default store is used.")
+    parser.add_argument("--notify-file", help="File customer notifications are appended to (JSON lines; "
+                                              f"default: FDS_NOTIFY_FILE or {NOTIFICATIONS_FILE}).")
+    parser.add_argument("--notify-socket", metavar="HOST:PORT",
+                        help="Send customer notifications to a local socket instead of a file.")
+    parser.add_argument("--metrics-file", help="Write metrics here (Prometheus text format) on exit, "
+                                               "and periodically while serving.")
+    parser.add_argument("--no-metrics", action="store_true", help="Do not record metrics.")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="Profile the session (CPU, memory or both) and write a report on exit "
+                             "(default: the FDS_PROFILE environment variable).")
+    parser.add_argument("--profile-out", help=f"Profile report file (default: FDS_PROFILE_OUT or {PROFILE_FILE}).")
+    parser.add_argument("--record-trace", metavar="PATH",
+                        help="Record every call made on the system to a trace file (JSON lines, .gz to compress) "
+                             "for the replay subcommand (default: the FDS_RECORD_TRACE environment variable).")
+    subparsers = parser.add_subparsers(dest="command")
+
+    export = subparsers.add_parser("export", help="Stream orders, customers or ratings to CSV/JSONL.")
+    export.add_argument("kind", choices=EXPORT_KINDS)
+    export.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default="csv")
+    export.add_argument("--out", default="-", help="Output file ('-' for stdout).")
+    export.add_argument("--start", type=parse_date, help="Only orders placed on or after YYYY-MM-DD.")
+    export.add_argument("--end", type=lambda value: parse_date(value, end_of_day=True),
+                        help="Only orders placed on or before YYYY-MM-DD.")
+    export.add_argument("--status", action="append", help="Only orders with this status (repeatable).")
+    export.add_argument("--gzip", action="store_true", help="Compress the output with gzip.")
+    export.add_argument("--chunk-size", type=int, default=1000)
+
+    report = subparsers.add_parser("report", help="Aggregate the full order history in parallel.")
+    report.add_argument("--workers", type=int, help="Worker processes (default: number of CPUs).")
+    report.add_argument("--start", type=parse_date, help="Only orders placed on or after YYYY-MM-DD.")
+    report.add_argument("--end", type=lambda value: parse_date(value, end_of_day=True),
+                        help="Only orders placed on or before YYYY-MM-DD.")
+    report.add_argument("--status", action="append", help="Only orders with this status (repeatable).")
+
+    importer = subparsers.add_parser("import", help="Stream customers or delivery agents from CSV/JSONL.")
+    importer.add_argument("kind", choices=IMPORT_KINDS)
+    importer.add_argument("path", help="CSV (with header) or JSONL file, optionally .gz.")
+    importer.add_argument("--format", dest="fmt", choices=IMPORT_FORMATS,
+                          help="File format (default: from the file extension).")
+    importer.add_argument("--chunk-size", type=int, default=10000, help="Records committed at a time.")
+
+    serve = subparsers.add_parser("serve", help="Serve the HTTP/JSON API.")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--all-tenants", action="store_true",
+                       help="Serve every restaurant at /tenants/<tenant_id>/..., loading each on demand.")
+
+    menu = subparsers.add_parser("menu", help="List the menu or change items and prices.")
+    menu.add_argument("action", choices=["list", "add", "price", "disable", "enable"])
+    menu.add_argument("item", nargs="?", help="Item name or id.")
+    menu.add_argument("price", nargs="?", type=float, help="Price, for add and price.")
+    menu.add_argument("--category", default="", help="Category of a new item.")
+
+    promo = subparsers.add_parser("promo", help="List, add or remove promotions.")
+    promo.add_argument("action", choices=["list", "add", "remove"])
+    promo.add_argument("code", nargs="?")
+    promo.add_argument("--percent", type=float, help="Discount percentage.")
+    promo.add_argument("--starts", type=parse_date, help="First day of the promotion (YYYY-MM-DD).")
+    promo.add_argument("--expires", type=lambda v: parse_date(v, end_of_day=True),
+                       help="Last day of the promotion (YYYY-MM-DD, inclusive).")
+    promo.add_argument("--max-uses", type=int, help="Most orders that can use it overall.")
+    promo.add_argument("--max-uses-per-customer", type=int, help="Most orders per customer.")
+    promo.add_argument("--min-basket", type=float, default=0, help="Smallest order subtotal it applies to.")
+    promo.add_argument("--items", help="Comma-separated menu items the discount is limited to.")
+    promo.add_argument("--automatic", action="store_true", help="Apply without the customer entering the code.")
+
+    tenants = subparsers.add_parser("tenants", help="List or create restaurants.")
+    tenants.add_argument("action", choices=["list", "create"])
+    tenants.add_argument("tenant_id", nargs="?", help="Restaurant to create.")
+    tenants.add_argument("--menu", help="JSON file with the restaurant's menu (item -> price).")
+    tenants.add_argument("--agents", help="JSON file with the restaurant's agents (agent_id -> name).")
+
+    batch = subparsers.add_parser("batch", help="Run commands from a script without prompts (JSON lines).")
+    batch.add_argument("script", help="Script file ('-' for stdin).")
+    batch.add_argument("--stop-on-error", action="store_true", help="Stop at the first failing command.")
+    batch.add_argument("--quiet", action="store_true", help="Only print the summary, not every result.")
+
+    replay = subparsers.add_parser("replay", help="Re-issue a recorded trace against a fresh system and "
+                                                  "report its latencies.")
+    replay.add_argument("trace", help="Trace file written with --record-trace.")
+    replay.add_argument("--speed", type=float, help="Replay at this multiple of the recorded pace "
+                                                    "(default: as fast as possible).")
+    replay.add_argument("--store", help="Start from a copy of this store instead of an empty system.")
+    replay.add_argument("--out", help="Write the JSON report here instead of to stdout.")
+
+    generate = subparsers.add_parser("generate", help="Write a store filled with reproducible synthetic data.")
+    generate.add_argument("--out", required=True, help="Store file to write.")
+    generate.add_argument("--orders", type=int, default=1000000)
+    generate.add_argument("--customers", type=int, help="Customers (default: one per ten orders).")
+    generate.add_argument("--agents", type=int, default=DEFAULT_AGENTS, help="Delivery agents.")
+    generate.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Days of history.")
+    generate.add_argument("--end", type=parse_datetime,
+                          help="When the history ends (YYYY-MM-DDTHH:MM or 'now'; default: a fixed date).")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--cancel-rate", type=float, default=DEFAULT_CANCEL_RATE)
+    generate.add_argument("--rating-rate", type=float, default=DEFAULT_RATING_RATE,
+                          help="Share of delivered orders that get rated.")
+    generate.add_argument("--force", action="store_true", help="Overwrite the store if it exists.")
+    return parser
+
+def build_notification_sink(args):
+    """Create the notification sink selected on the command line."""
+    if args.notify_socket:
+        host, _, port = args.notify_socket.rpartition(":")
+        try:
+            return SocketSink(host or "127.0.0.1", int(port))
+        except ValueError:
+            raise ValueError(f"Invalid socket address '{args.notify_socket}'. Please use HOST:PORT.")
+    return FileSink(args.notify_file or os.environ.get("FDS_NOTIFY_FILE") or NOTIFICATIONS_FILE)
+
+def run_export(system, args) -> None:
+    """Handle the export subcommand."""
+    try:
+        count = export_records(system, args.kind, args.out, fmt=args.fmt,
+                               start_date=args.start, end_date=args.end, statuses=args.status,
+                               compress=args.gzip, chunk_size=args.chunk_size)
+    except (ValueError, OSError) as e:
+        print("Export error:", e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Exported {count} records ({args.kind}).", file=sys.stderr)
+
+def print_import_progress(summary: dict) -> None:
+    """Report import progress after each committed chunk."""
+    print(f"Read {summary['read']} records: {summary['imported']} imported, "
+          f"{summary['duplicates']} duplicates, {summary['errors']} errors.", file=sys.stderr)
+
+def run_import(system, args) -> None:
+    """Handle the import subcommand."""
+    try:
+        import_records(system, args.kind, args.path, fmt=args.fmt, chunk_size=args.chunk_size,
+                       progress=print_import_progress)
+    except (ValueError, OSError) as e:
+        print("Import error:", e, file=sys.stderr)
+        sys.exit(1)
+
+def run_report(system, args) -> None:
+    """Handle the report subcommand."""
+    # Filtering the history up front keeps archived orders outside the range on disk
+    orders = system.order_history(args.start, args.end, args.status)
+    print(system.manager.generate_full_history_report(orders, workers=args.workers,
+                                                      statuses=args.status, start_date=args.start,
+                                                      end_date=args.end))
+
+def run_menu(system, args) -> None:
+    """Handle the menu subcommand."""
+    if args.action == "list":
+        print(f"Menu version {system.catalog.version}")
+        for category, items in system.catalog.by_category(available_only=False).items():
+            print(f"[{category or 'Uncategorized'}]")
+            for item in items:
+                print(f"  {item.item_id} {item.name}: ${item.price:.2f}{'' if item.available else ' (unavailable)'}")
+        return
+    try:
+        if not args.item:
+            raise ValueError("Please give the menu item.")
+        if args.action in ["add", "price"] and args.price is None:
+            raise ValueError("Please give the price.")
+        if args.action == "add":
+            system.add_menu_item(args.item, args.price, args.category)
+        elif args.action == "price":
+            system.update_menu_prices({args.item: args.price})
+        else:
+            system.set_menu_item_available(args.item, args.action == "enable")
+    except ValueError as e:
+        print("Menu error:", e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Menu is now at version {system.catalog.version}.", file=sys.stderr)
+
+def run_promo(system, args) -> None:
+    """Handle the promo subcommand."""
+    if args.action == "list":
+        for code, promotion in sorted(system.promotions.promotions.items()):
+            rules = ", ".join(f"{name}={value}" for name, value in promotion.to_dict().items()
+                              if value not in (None, 0, False) and name != "code")
+            print(f"{code}: {rules} (used {system.promotions.uses[code]} times)")
+        return
+    try:
+        if not args.code:
+            raise ValueError("Please give the promo code.")
+        if args.action == "remove":
+            system.remove_promotion(args.code)
+            print(f"Removed promotion {args.code}.", file=sys.stderr)
+            return
+        if args.percent is None:
+            raise ValueError("Please give the discount with --percent.")
+        items = [item.strip() for item in args.items.split(",")] if args.items else None
+        unknown = [item for item in items or [] if item not in system.menu]
+        if unknown:
+            raise ValueError(f"Items not in the menu: {unknown}")
+        system.add_promotion(Promotion(args.code, args.percent, starts_at=args.starts, expires_at=args.expires,
+                                       max_uses=args.max_uses, max_uses_per_customer=args.max_uses_per_customer,
+                                       min_basket=args.min_basket, items=items, automatic=args.automatic))
+    except ValueError as e:
+        print("Promotion error:", e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Saved promotion {args.code}.", file=sys.stderr)
+
+def run_tenants(args) -> None:
+    """Handle the tenants subcommand."""
+    registry = TenantRegistry()
+    if args.action == "list":
+        for tenant_id in registry.list_tenants():
+            print(tenant_id)
+        return
+    try:
+        if not args.tenant_id:
+            raise ValueError("Please give the id of the restaurant to create.")
+        menu = agents = None
+        if args.menu:
+            with open(args.menu, encoding="utf-8") as f:
+                menu = json.load(f)
+        if args.agents:
+            with open(args.agents, encoding="utf-8") as f:
+                agents = json.load(f)
+        registry.create_tenant(args.tenant_id, menu=menu, agents=agents)
+    except (ValueError, OSError) as e:
+        print("Tenant error:", e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Created restaurant {args.tenant_id}.", file=sys.stderr)
+
+def run_generate(args) -> None:
+    """Handle the generate subcommand."""
+    if os.path.exists(args.out) and not args.force:
+        print(f"Generate error: {args.out} already exists (use --force to overwrite).", file=sys.stderr)
+        sys.exit(1)
+    system = FoodDeliverySystem()
+    system.persistence_file = args.out
+    system.set_autosave(False)      # Saved once, below
+    try:
+        summary = generate_dataset(system, args.orders, customers=args.customers, agents=args.agents,
+                                   days=args.days, end=args.end, seed=args.seed, cancel_rate=args.cancel_rate,
+                                   rating_rate=args.rating_rate,
+                                   progress=lambda count: print(f"Generated {count} orders.", file=sys.stderr))
+        system.set_autosave(True)
+    except (ValueError, OSError) as e:
+        print("Generate error:", e, file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(summary))
+
+def run_replay(args) -> None:
+    """Handle the replay subcommand. The replayed system is never saved."""
+    if args.store and not os.path.exists(args.store):
+        print(f"Replay error: {args.store} does not exist.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        system = load_system(FoodDeliverySystem, args.store) if args.store else FoodDeliverySystem()
+        summary = replay_trace(system, args.trace, speed=args.speed,
+                               progress=lambda count: print(f"Replayed {count} calls.", file=sys.stderr))
+    except (ValueError, OSError) as e:
+        print("Replay error:", e, file=sys.stderr)
+        sys.exit(1)
+    output = json.dumps(summary, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+def run_command(system, args) -> None:
+    """Dispatch a parsed subcommand."""
+    if args.command == "export":
+        run_export(system, args)
+    elif args.command == "report":
+        run_report(system, args)
+    elif args.command == "import":
+        run_import(system, args)
+    elif args.command == "serve":
+        run_server(system, args.host, args.port, metrics_file=args.metrics_file)
+    elif args.command == "menu":
+        run_menu(system, args)
+    elif args.command == "promo":
+        run_promo(system, args)
+    elif args.command == "tenants":
+        run_tenants(args)
+    elif args.command == "generate":
+        run_generate(args)
+    elif args.command == "batch":
+        run_batch(system, args)
+    elif args.command == "replay":
+        run_replay(args)
@@ -0,0 +1,69 @@
+import datetime
+import select
+import sys
+import time
+from system.tracking import OrderTracker
+
+# Longest wait for a key press at a time, so events are drawn promptly while watching stdin
+INPUT_POLL_INTERVAL = 0.2
+
+class LiveOrderView:
+    def __init__(self, out=None, in_place: bool = None):
+        """
+        Initialize a view drawing tracked order rows. On a terminal, a changed row is redrawn where
+        it is; otherwise (e.g. output piped to a file) each change is written as a new timestamped line.
+        """
+        self.out = out or sys.stdout
+        self.in_place = self.out.isatty() if in_place is None else in_place
+        self._lines = []        # order ids, in the order their rows were first drawn
+
+    def draw(self, changes: list) -> None:
+        """Draw the (order_id, text) rows returned by OrderTracker.refresh."""
+        for order_id, text in changes:
+            if not self.in_place:
+                self.out.write(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {text}\n")
+            elif order_id in self._lines:
+                # Up to the row, rewrite it, and back down below the last row
+                up = len(self._lines) - self._lines.index(order_id)
+                self.out.write(f"\x1b[{up}A\r\x1b[2K{text}\x1b[{up}B\r")
+            else:
+                self._lines.append(order_id)
+                self.out.write(text + "\n")
+        self.out.flush()
+
+def wait_for_enter(timeout: float, changed) -> bool:
+    """
+    Wait up to `timeout` seconds for the user to press Enter (or stdin to end), returning early
+    (False) when `changed` is set. Returns True if Enter was pressed. Where stdin cannot be
+    polled (e.g. on Windows), only waits: tracking then ends with Ctrl+C.
+    """
+    try:
+        stdin = sys.stdin.fileno()
+    except (AttributeError, ValueError, OSError):
+        stdin = None
+    if stdin is None or sys.platform == "win32":
+        changed.wait(timeout)
+        return False
+    deadline = time.monotonic() + timeout
+    while not changed.is_set():
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return False
+        if select.select([stdin], [], [], min(left, INPUT_POLL_INTERVAL))[0]:
+            sys.stdin.readline()
+            return True
+    return False
+
+def track_orders(system, tracker: OrderTracker, view: LiveOrderView, stop_requested=wait_for_enter) -> None:
+    """
+    Draw a started tracker's changes until its orders are all finished or stop_requested(timeout, changed)
+    returns True. Each refresh asks for a dispatch sweep, which runs at most once per
+    DISPATCH_MIN_INTERVAL however many customers are watching.
+    """
+    while True:
+        system.dispatch_if_due()
+        view.draw(tracker.refresh())
+        if not tracker.active:
+            return
+        if stop_requested(tracker.next_refresh, tracker.changed):
+            return
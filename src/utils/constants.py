@@ -7,8 +7,49 @@ MENU = {
     "Pasta": 11.50
 }
 
+# Categories of the pre-defined menu items
+MENU_CATEGORIES = {
+    "Pizza": "Mains",
+    "Burger": "Mains",
+    "Salad": "Sides",
+    "Sushi": "Mains",
+    "Pasta": "Mains"
+}
+
 # Path for persistence
 PERSISTENCE_FILE = "db.pkl"
 
+# Finished orders (completed, delivered, picked up or cancelled) this many days ago move out of memory
+# into an SQLite archive next to the store (override with FDS_ARCHIVE_AFTER_DAYS; 0 keeps them in memory)
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_SUFFIX = ".archive.sqlite"
+
+# Fewest seconds between the dispatch sweeps asked for by customer sessions and live order tracking;
+# asking sooner reuses the last sweep, however many customers are active
+DISPATCH_MIN_INTERVAL = 1.0
+
+# Directory holding one store per restaurant, how many restaurants stay loaded at once, and
+# seconds without requests after which a server for several restaurants unloads one
+TENANTS_DIR = "tenants"
+MAX_ACTIVE_TENANTS = 32
+TENANT_IDLE_SECONDS = 15 * 60
+
+# Path for customer notifications (when no other sink is configured)
+NOTIFICATIONS_FILE = "notifications.jsonl"
+
+# Report written by profiling mode (--profile / FDS_PROFILE)
+PROFILE_FILE = "profile.txt"
+
 # Valid order types
-ORDER_TYPES = ["Home Delivery", "Takeaway"]
\ No newline at end of file
+ORDER_TYPES = ["Home Delivery", "Takeaway"]
+
+# Default manager credentials (override with FDS_MANAGER_USERNAME / FDS_MANAGER_PASSWORD)
+MANAGER_USERNAME = "manager"
+MANAGER_PASSWORD = "manager123"
+
+# PBKDF2-SHA256 iterations for new password hashes
+PASSWORD_HASH_ITERATIONS = 100000
+
+# Seconds a login session stays valid, and the most sessions kept at once
+SESSION_TTL_SECONDS = 30 * 60
+MAX_SESSIONS = 100000
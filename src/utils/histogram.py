@@ -0,0 +1,71 @@
+import math
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram of non-negative values (HDR-style).
+    Every bucket spans a fixed relative width, so percentiles are accurate to about
+    `precision` at any scale, memory depends only on the value range, and two
+    histograms are merged by adding their bucket counts.
+    """
+
+    def __init__(self, precision: float = 0.01):
+        if precision <= 0 or precision >= 1:
+            raise ValueError("Precision must be between 0 and 1.")
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.buckets = {}       # bucket index -> count
+        self.zero_count = 0     # values <= 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value: float, count: int = 1) -> None:
+        """Record a value (negative values are clamped to zero)."""
+        value = max(float(value), 0.0)
+        if value == 0.0:
+            self.zero_count += count
+        else:
+            index = math.floor(math.log(value) / self._log_base)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's counts into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge histograms with different precision.")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, p: float) -> float:
+        """Return the value at the given percentile (0-100), or None if nothing was recorded."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        if rank <= self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Geometric midpoint of the bucket, clamped to the observed range
+                value = math.exp((index + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        """Return the mean of the recorded values, or None if nothing was recorded."""
+        return self.total / self.count if self.count else None
+
+    def __repr__(self) -> str:
+        return f"LatencyHistogram(count={self.count}, p50={self.percentile(50)}, p99={self.percentile(99)})"
@@ -0,0 +1,78 @@
+import datetime
+import os
+import re
+import threading
+import time
+
+# Order ids are "O-" followed by a 26-character ULID: a 48-bit millisecond timestamp and
+# 80 random bits in Crockford base32. They sort by creation time as plain strings.
+ORDER_ID_PREFIX = "O-"
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+ULID_LENGTH = 26
+ORDER_ID_PATTERN = re.compile(r"^O-[0-9A-HJKMNP-TV-Z]{26}$")
+
+def _encode(value: int, length: int) -> str:
+    """Encode a non-negative integer in Crockford base32, zero-padded to `length` characters."""
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+class OrderIdGenerator:
+    def __init__(self, randbytes=None):
+        """
+        Initialize a generator of monotonic, time-sortable order ids.
+        Ids made in the same millisecond (or while the clock steps back) increment the random
+        part of the previous id, so they stay unique and in order within a process. The random
+        part is 80 bits, so ids from different processes collide with negligible probability.
+        `randbytes(n)` supplies the random bytes (os.urandom by default); pass a seeded
+        random.Random().randbytes to make the ids reproducible.
+        """
+        self._randbytes = randbytes or os.urandom
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+        if hasattr(os, "register_at_fork"):
+            # A forked child must not continue the parent's sequence
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new_id(self, timestamp: float = None) -> str:
+        """Return a new order id for `timestamp` (seconds since the epoch; now by default)."""
+        ms = int((time.time() if timestamp is None else timestamp) * 1000)
+        with self._lock:
+            if ms > self._last_ms:
+                self._last_ms = ms
+                self._last_random = int.from_bytes(self._randbytes(RANDOM_BITS // 8), "big")
+            else:
+                self._last_random += 1
+                if self._last_random >> RANDOM_BITS:
+                    # Random part exhausted within one millisecond: borrow the next one
+                    self._last_ms += 1
+                    self._last_random = int.from_bytes(self._randbytes(RANDOM_BITS // 8), "big")
+            return ORDER_ID_PREFIX + _encode((self._last_ms << RANDOM_BITS) | self._last_random, ULID_LENGTH)
+
+_default_generator = OrderIdGenerator()
+
+def new_order_id(timestamp: float = None) -> str:
+    """Return a new order id from the process-wide generator."""
+    return _default_generator.new_id(timestamp)
+
+def is_order_id(value: str) -> bool:
+    """Check if a string is a time-sortable order id (and not a legacy one)."""
+    return isinstance(value, str) and ORDER_ID_PATTERN.match(value) is not None
+
+def order_id_time(order_id: str) -> datetime.datetime:
+    """Return the creation time encoded in an order id, or None for legacy ids."""
+    if not is_order_id(order_id):
+        return None
+    ms = 0
+    for char in order_id[len(ORDER_ID_PREFIX):len(ORDER_ID_PREFIX) + 10]:
+        ms = ms * 32 + CROCKFORD_ALPHABET.index(char)
+    return datetime.datetime.fromtimestamp(ms / 1000)
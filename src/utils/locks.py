@@ -0,0 +1,64 @@
+import contextlib
+import threading
+
+class SharedExclusiveLock:
+    """
+    A lock held either by any number of shared holders or by one exclusive holder.
+    A waiting exclusive holder blocks new shared holders, so it cannot be starved.
+    Not reentrant: callers must track nesting themselves.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._shared = 0
+        self._exclusive = False
+        self._waiting_exclusive = 0
+
+    def acquire_shared(self) -> None:
+        """Block until the lock can be held in shared mode."""
+        with self._cond:
+            while self._exclusive or self._waiting_exclusive:
+                self._cond.wait()
+            self._shared += 1
+
+    def release_shared(self) -> None:
+        """Release a shared hold."""
+        with self._cond:
+            self._shared -= 1
+            if self._shared == 0:
+                self._cond.notify_all()
+
+    def acquire_exclusive(self) -> None:
+        """Block until the lock can be held exclusively."""
+        with self._cond:
+            self._waiting_exclusive += 1
+            try:
+                while self._exclusive or self._shared:
+                    self._cond.wait()
+            finally:
+                self._waiting_exclusive -= 1
+            self._exclusive = True
+
+    def release_exclusive(self) -> None:
+        """Release the exclusive hold."""
+        with self._cond:
+            self._exclusive = False
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def shared(self):
+        """Hold the lock in shared mode for the duration of a with block."""
+        self.acquire_shared()
+        try:
+            yield
+        finally:
+            self.release_shared()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Hold the lock exclusively for the duration of a with block."""
+        self.acquire_exclusive()
+        try:
+            yield
+        finally:
+            self.release_exclusive()
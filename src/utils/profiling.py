@@ -0,0 +1,141 @@
+import builtins
+import cProfile
+import functools
+import io
+import pstats
+import time
+import tracemalloc
+from utils.histogram import LatencyHistogram
+
+# What a profiling session records: CPU time (cProfile), memory allocations (tracemalloc) or both
+PROFILE_MODES = ["cpu", "memory", "all"]
+# Functions, allocation sites and handlers listed in the report
+DEFAULT_TOP = 30
+# Frames kept per allocation traceback
+TRACEMALLOC_FRAMES = 10
+
+class SessionProfiler:
+    def __init__(self, mode: str = "cpu", top: int = DEFAULT_TOP):
+        """
+        Initialize a profiler for a whole app session.
+        Depending on `mode`, it runs cProfile and/or tracemalloc, and it times the UI
+        handlers registered with time_handlers. Handler times leave out the time spent
+        waiting for the user to type, so they show where the app itself is slow.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Profile mode must be one of {PROFILE_MODES}.")
+        self.mode = mode
+        self.top = top
+        self.handler_times = {}     # handler name -> LatencyHistogram of busy seconds per call
+        self.handler_wall = {}      # handler name -> wall-clock seconds, input waits included
+        self.input_wait = 0.0       # Seconds spent waiting in input() so far
+        self._profile = cProfile.Profile() if mode in ["cpu", "all"] else None
+        self._patched = []          # (object, attribute name, original)
+        self._started = None
+        self._elapsed = 0.0
+        self._snapshot = None       # tracemalloc snapshot taken on stop
+        self._peak = 0
+
+    def start(self) -> None:
+        """Start profiling."""
+        self._patch(builtins, "input", self._timed_input(builtins.input))
+        if self.mode in ["memory", "all"]:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        if self._profile is not None:
+            self._profile.enable()
+        self._started = time.perf_counter()
+
+    def stop(self) -> None:
+        """Stop profiling and undo the handler timing; the results stay available for report."""
+        if self._started is None:
+            return
+        self._elapsed = time.perf_counter() - self._started
+        self._started = None
+        if self._profile is not None:
+            self._profile.disable()
+        if tracemalloc.is_tracing():
+            self._snapshot = tracemalloc.take_snapshot()
+            self._peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        for target, name, original in reversed(self._patched):
+            setattr(target, name, original)
+        self._patched = []
+
+    def _patch(self, target, name: str, replacement) -> None:
+        self._patched.append((target, name, getattr(target, name)))
+        setattr(target, name, replacement)
+
+    def _timed_input(self, original_input):
+        @functools.wraps(original_input)
+        def timed_input(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original_input(*args, **kwargs)
+            finally:
+                self.input_wait += time.perf_counter() - start
+        return timed_input
+
+    def time_handlers(self, module, names: list = None) -> int:
+        """
+        Time calls to a module's handler functions (by default every handle_* and *_menu
+        function), replacing them in the module until stop. Returns how many were wrapped.
+        """
+        if names is None:
+            names = [name for name, value in vars(module).items()
+                     if callable(value) and (name.startswith("handle_") or name.endswith("_menu"))]
+        for name in names:
+            self._patch(module, name, self._timed_handler(name, getattr(module, name)))
+        return len(names)
+
+    def _timed_handler(self, name: str, handler):
+        histogram = self.handler_times.setdefault(name, LatencyHistogram())
+
+        @functools.wraps(handler)
+        def timed_handler(*args, **kwargs):
+            start, waited = time.perf_counter(), self.input_wait
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                wall = time.perf_counter() - start
+                histogram.record(wall - (self.input_wait - waited))
+                self.handler_wall[name] = self.handler_wall.get(name, 0.0) + wall
+        return timed_handler
+
+    def report(self) -> str:
+        """The profile as text: handler timings, then the slowest functions and top allocators."""
+        out = io.StringIO()
+        out.write(f"Profile mode: {self.mode}\n")
+        out.write(f"Session time: {self._elapsed:.3f}s, of which waiting for input: {self.input_wait:.3f}s\n")
+
+        out.write("\n=== Handlers (busy time, excluding input waits) ===\n")
+        out.write(f"{'handler':<36}{'calls':>7}{'total s':>11}{'mean ms':>11}{'p50 ms':>10}"
+                  f"{'p99 ms':>10}{'max ms':>10}{'wall s':>11}\n")
+        called = [(name, h) for name, h in self.handler_times.items() if h.count]
+        for name, h in sorted(called, key=lambda x: x[1].total, reverse=True)[:self.top]:
+            out.write(f"{name:<36}{h.count:>7}{h.total:>11.3f}{h.mean() * 1000:>11.2f}"
+                      f"{h.percentile(50) * 1000:>10.2f}{h.percentile(99) * 1000:>10.2f}{h.max * 1000:>10.2f}"
+                      f"{self.handler_wall[name]:>11.3f}\n")
+        if not called:
+            out.write("(no handler was called)\n")
+
+        if self._profile is not None:
+            out.write(f"\n=== CPU: top {self.top} functions by cumulative time ===\n")
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            out.write(f"\n=== CPU: top {self.top} functions by own time ===\n")
+            stats.sort_stats("tottime").print_stats(self.top)
+
+        if self._snapshot is not None:
+            out.write(f"\n=== Memory: peak traced {self._peak / 1024 / 1024:.1f} MiB; "
+                      f"top {self.top} allocation sites still held ===\n")
+            for stat in self._snapshot.statistics("lineno")[:self.top]:
+                frame = stat.traceback[0]
+                out.write(f"{stat.size / 1024:>12.1f} KiB {stat.count:>9} blocks  {frame.filename}:{frame.lineno}\n")
+        return out.getvalue()
+
+    def write(self, path: str) -> None:
+        """Write the text report to `path`, and the raw CPU stats to `path`.pstats (for pstats or snakeviz)."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+        if self._profile is not None:
+            self._profile.dump_stats(path + ".pstats")
@@ -0,0 +1,62 @@
+import base64
+import concurrent.futures
+import hashlib
+import hmac
+import os
+import threading
+from utils.constants import PASSWORD_HASH_ITERATIONS
+
+# Encoded hashes look like "pbkdf2_sha256$<iterations>$<salt>$<hash>"
+HASH_ALGORITHM = "pbkdf2_sha256"
+SALT_BYTES = 16
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+def hash_password(password: str, iterations: int = None, salt: bytes = None) -> str:
+    """
+    Hash a password with a random salt, returning the encoded hash to store.
+    Pass `salt` only to make a hash reproducible, e.g. for generated test data.
+    """
+    if not password:
+        raise ValueError("Password cannot be empty.")
+    iterations = iterations or PASSWORD_HASH_ITERATIONS
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return "$".join([HASH_ALGORITHM, str(iterations),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Check a password against an encoded hash in constant time."""
+    try:
+        algorithm, iterations, salt, expected = encoded.split("$")
+        if algorithm != HASH_ALGORITHM:
+            return False
+        digest = hashlib.pbkdf2_hmac("sha256", (password or "").encode(), base64.b64decode(salt), int(iterations))
+    except (ValueError, AttributeError):
+        return False
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+def needs_rehash(encoded: str) -> bool:
+    """Check if a hash was made with weaker settings than the current ones."""
+    try:
+        algorithm, iterations, _, _ = encoded.split("$")
+        return algorithm != HASH_ALGORITHM or int(iterations) < PASSWORD_HASH_ITERATIONS
+    except (ValueError, AttributeError):
+        return True
+
+def get_hash_executor() -> concurrent.futures.Executor:
+    """
+    Get the shared worker pool for password hashing.
+    hashlib releases the GIL while hashing, so threads hash in parallel on all cores.
+    """
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            _hash_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="password-hash")
+        return _hash_executor
+
+def hash_passwords(passwords: list) -> list:
+    """Hash many passwords in the worker pool, keeping their order."""
+    return list(get_hash_executor().map(hash_password, passwords))
@@ -1,8 +1,23 @@
 import os
+import io
 import sys
 import datetime
 import unittest
 import pickle
+import tempfile
+import gzip
+import json
+import csv
+import asyncio
+import threading
+import time
+import types
+import builtins
+import gc
+import contextlib
+import weakref
+import hmac
+import hashlib
 
 # Adjust path to import from src folder
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
@@ -10,7 +25,32 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
 from system.food_delivery_system import FoodDeliverySystem
 from models.order import Order
 from models.customer import Customer
-from utils.constants import PERSISTENCE_FILE
+from models.delivery_agent import DeliveryAgent
+from utils.constants import PERSISTENCE_FILE, MENU
+from system.export import export_records
+from system.importers import import_records
+from system.latency import collect_latency_metrics
+from system.parallel_reports import run_parallel_report
+from api.server import ApiServer, ApiError, TenantApiServer
+from system.sessions import SessionCache
+from system.notifications import NotificationWorker, MemorySink
+from system.tenants import TenantRegistry
+from system import tenants as tenants_module
+from system.promotions import Promotion
+from api.loadgen import HttpClient
+from utils.histogram import LatencyHistogram
+from utils.ids import OrderIdGenerator, is_order_id, order_id_time
+from benchmarks import suite as benchmark_suite
+from system.datagen import generate_dataset
+from system.metrics import REGISTRY
+from utils.profiling import SessionProfiler
+from system.persistence import load_system, save_system
+from benchmarks import startup as startup_benchmark
+from ui.batch import run_script
+from system.journal import JournalRecorder, read_trace, replay_trace
+from system.tracking import OrderTracker
+from ui.tracking import LiveOrderView, track_orders
+import main as app_main
 
 class TestFoodDeliverySystem(unittest.TestCase):
     def setUp(self):
@@ -150,7 +190,7 @@ class TestFoodDeliverySystem(unittest.TestCase):
     def test_manager_login_credentials(self):
         # Check that manager credentials are fixed
         self.assertEqual(self.system.manager.username, "manager")
-        self.assertEqual(self.system.manager.password, "manager123")
+        self.assertTrue(self.system.manager.check_password("manager123"))
 
     def test_registration_invalid_parameters(self):
         with self.assertRaises(ValueError):
@@ -325,5 +365,1192 @@ class TestFoodDeliverySystem(unittest.TestCase):
         self.assertIn("4", report)  # 4 pizzas ordered in total
         self.assertIn("Most Popular Item", report)
 
+    def test_export_orders_csv_with_status_filter(self):
+        customer = self.system.register_customer("oscar", "pass345", "Oscar Wilde")
+        other = self.system.register_customer("olga", "pass346", "Olga Kurylenko")
+        self.system.place_order(other, "Takeaway", {"Pizza": 2})
+        cancelled = self.system.place_order(customer, "Takeaway", {"Salad": 1})
+        self.system.cancel_order(customer, cancelled.order_id)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "orders.csv")
+            count = export_records(self.system, "orders", path, fmt="csv",
+                                   statuses=["Cancelled"], chunk_size=1)
+            with open(path, newline="") as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(count, 1)
+        self.assertEqual(rows[0]["order_id"], cancelled.order_id)
+        self.assertEqual(rows[0]["items"], "Salad:1")
+
+    def test_export_customers_jsonl_gzip(self):
+        self.system.register_customer("paula", "pass678", "Paula Abdul")
+        self.system.register_customer("quincy", "pass901", "Quincy Jones")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "customers.jsonl.gz")
+            count = export_records(self.system, "customers", path, fmt="jsonl", compress=True)
+            with gzip.open(path, "rt") as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual(count, 2)
+        self.assertEqual({r["username"] for r in records}, {"paula", "quincy"})
+        self.assertNotIn("password", records[0])
+
+    def test_order_status_history(self):
+        customer = self.system.register_customer("rita", "pass112", "Rita Ora")
+        order = self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+        order.status = "Picked Up"
+        order.status = "Picked Up"  # Repeated status is not a transition
+        self.assertEqual([status for status, _ in order.status_history], ["Placed", "Picked Up"])
+        self.assertIsNotNone(order.status_time("Picked Up"))
+        self.assertIsNone(order.status_time("Delivered"))
+
+    def test_latency_histogram_percentiles_and_merge(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 51):
+            first.record(value)
+        for value in range(51, 101):
+            second.record(value)
+        merged = LatencyHistogram().merge(first).merge(second)
+        self.assertEqual(merged.count, 100)
+        self.assertAlmostEqual(merged.percentile(50), 50, delta=1)
+        self.assertAlmostEqual(merged.percentile(99), 99, delta=1)
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+    def test_delivery_latency_metrics(self):
+        customer = self.system.register_customer("steve", "pass113", "Steve Jobs")
+        order = self.system.place_order(customer, "Home Delivery", {"Sushi": 1})
+        placed = order.order_time.timestamp()
+        order.status_history = [("Placed", placed),
+                                ("Delivering", placed + 180),
+                                ("Delivered", placed + 480)]
+        order._status = "Delivered"
+        metrics = collect_latency_metrics([order])
+        self.assertAlmostEqual(metrics["prep"].percentile(50), 120, delta=2)
+        self.assertAlmostEqual(metrics["agent_wait"].percentile(50), 60, delta=1)
+        self.assertAlmostEqual(metrics["delivery"].percentile(50), 300, delta=3)
+        self.assertIn("p95", self.system.manager.generate_latency_report([order]))
+
+
+    def test_price_snapshot_survives_menu_change(self):
+        customer = self.system.register_customer("tina", "pass114", "Tina Turner")
+        order = self.system.place_order(customer, "Takeaway", {"Pizza": 2}, discount=10)
+        self.system.update_menu_prices({"Pizza": 99.0})
+        later = self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+        self.assertAlmostEqual(later.calculate_total(), 99.0, places=2)
+        self.assertAlmostEqual(order.calculate_total(), 2 * 12.99 * 0.9, places=2)
+        self.assertAlmostEqual(order.discount_amount, 2 * 12.99 * 0.1, places=2)
+        self.assertEqual(order.price_snapshot(), {"Pizza": 12.99})
+        report = self.system.manager.view_restaurant_pov([order])
+        self.assertIn("Revenue: $25.98", report)
+        self.assertIn("Net Revenue (after discounts): $23.38", report)
+
+
+    def test_parallel_report_matches_serial(self):
+        customer1 = self.system.register_customer("uma", "pass115", "Uma Thurman")
+        customer2 = self.system.register_customer("vince", "pass116", "Vince Vaughn")
+        self.system.place_order(customer1, "Home Delivery", {"Pizza": 2, "Burger": 1})
+        self.system.place_order(customer2, "Takeaway", {"Pasta": 1}, discount=10)
+        old_order = Order("uma", "Takeaway", {"Sushi": 3})
+        old_order.order_time -= datetime.timedelta(days=30)
+        self.system.all_orders.append(old_order)
+
+        serial = run_parallel_report(self.system.all_orders, workers=1)
+        in_memory = run_parallel_report(self.system.all_orders, workers=2, min_parallel_orders=0)
+        self.assertEqual(in_memory, serial)
+        self.assertEqual(serial["orders"], 3)
+        self.assertEqual(serial["item_counts"]["Sushi"], 3)
+
+        recent = run_parallel_report(self.system.all_orders, workers=1,
+                                     start_date=datetime.datetime.now() - datetime.timedelta(days=7))
+        self.assertEqual(recent["orders"], 2)
+
+        # Archived orders are read and aggregated by the workers themselves
+        with tempfile.TemporaryDirectory() as tmp:
+            system = FoodDeliverySystem()
+            system.persistence_file = os.path.join(tmp, "store.pkl")
+            uma = system.register_customer("uma", "pw", "Uma")
+            orders = [system.place_order(uma, "Takeaway", {"Pizza": 1 + i % 3, "Pasta": i % 2 + 1}) for i in range(12)]
+            for days, order in enumerate(orders[:10], 35):
+                old = time.time() - days * 86400
+                order.order_time = datetime.datetime.fromtimestamp(old)
+                order.status_history = [("Placed", old), ("Cancelled" if days % 4 == 0 else "Picked Up", old)]
+                order._status = order.status_history[-1][0]
+            system._rebuild_order_indexes()
+            expected = run_parallel_report(list(system.all_orders), workers=1)
+            self.assertEqual(system.archive_orders(older_than_days=30), 10)
+            # A copy archived of an order still in memory is counted once
+            orders[11].status = "Picked Up"
+            system._order_archive().add([orders[11]])
+
+            def assert_same(actual, wanted):
+                for key in ("orders", "home_delivery", "item_counts", "first", "last"):
+                    self.assertEqual(actual[key], wanted[key])
+                for key in ("revenue", "net_revenue", "estimated_seconds"):
+                    self.assertAlmostEqual(actual[key], wanted[key], places=6)
+
+            history = system.order_history()
+            parallel = run_parallel_report(history, workers=2, min_parallel_orders=0)
+            self.assertEqual(parallel["orders"], 12)
+            assert_same(parallel, expected)
+            assert_same(run_parallel_report(history, workers=1), expected)
+            picked_up = run_parallel_report(history, workers=2, statuses=["Picked Up"], min_parallel_orders=0)
+            self.assertLess(picked_up["orders"], 12)
+            assert_same(picked_up, run_parallel_report(history, workers=1, statuses=["Picked Up"]))
+
+
+    def test_customer_stats_incremental_updates(self):
+        customer = self.system.register_customer("wendy", "pass117", "Wendy Williams")
+        delivered = self.system.place_order(customer, "Takeaway", {"Pizza": 2})
+        cancelled = self.system.place_order(customer, "Takeaway", {"Salad": 1})
+        self.system.cancel_order(customer, cancelled.order_id)
+        delivered.status = "Delivered"
+        self.system.rate_order(customer, delivered.order_id, 4)
+        self.system.rate_order(customer, delivered.order_id, 2)  # Re-rating replaces the old rating
+
+        stats = self.system.get_customer_stats("wendy")
+        self.assertEqual(stats.order_count, 2)
+        self.assertEqual(stats.cancelled_count, 1)
+        self.assertAlmostEqual(stats.total_spend, 25.98, places=2)
+        self.assertEqual(stats.favourite_item, "Pizza")
+        self.assertEqual(stats.average_rating, 2)
+
+    def test_top_customers(self):
+        big = self.system.register_customer("yara", "pass119", "Yara Shahidi")
+        small = self.system.register_customer("zoe", "pass120", "Zoe Saldana")
+        self.system.register_customer("idle", "pass121", "Idle User")
+        self.system.place_order(big, "Takeaway", {"Sushi": 3})
+        self.system.place_order(small, "Takeaway", {"Salad": 1})
+        top = self.system.get_top_customers(2)
+        self.assertEqual([stats.username for stats in top], ["yara", "zoe"])
+        report = self.system.manager.generate_top_customers_report(top)
+        self.assertIn("1. yara", report)
+        with self.assertRaises(ValueError):
+            self.system.get_top_customers(3, by="password")
+
+    def test_customer_stats_rebuilt_for_legacy_store(self):
+        customer = self.system.register_customer("adam", "pass122", "Adam Driver")
+        self.system.place_order(customer, "Takeaway", {"Burger": 2})
+        del self.system.customer_stats
+        restored = pickle.loads(pickle.dumps(self.system))
+        self.assertEqual(restored.get_customer_stats("adam").favourite_item, "Burger")
+
+
+    def test_api_customer_flow(self):
+        api = ApiServer(self.system)
+        def call(*args, **kwargs):
+            return asyncio.run(api.handle(*args, **kwargs))
+        status, _ = call("POST", "/customers", body=b'{"username": "bella", "password": "p1", "name": "Bella"}')
+        self.assertEqual(status, 201)
+        status, body = call("POST", "/login", body=b'{"username": "bella", "password": "p1"}')
+        self.assertEqual(status, 200)
+        auth = {"authorization": f"Bearer {body['token']}"}
+
+        status, order = call("POST", "/orders", auth, b'{"order_type": "Takeaway", "items": {"Pizza": 2}}')
+        self.assertEqual(status, 201)
+        self.assertAlmostEqual(order["total"], 25.98, places=2)
+        status, body = call("GET", "/orders", auth)
+        self.assertEqual([o["order_id"] for o in body["orders"]], [order["order_id"]])
+        status, _ = call("POST", f"/orders/{order['order_id']}/cancel", auth)
+        self.assertEqual(status, 200)
+
+        self.assertEqual(call("POST", "/orders", auth, b'{"order_type": "Takeaway", "items": {}}')[0], 400)
+        self.assertEqual(call("GET", "/orders")[0], 401)
+        self.assertEqual(call("GET", "/reports/dashboard", auth)[0], 403)
+        self.assertEqual(call("GET", "/nowhere")[0], 404)
+
+        # Unknown usernames and wrong passwords get the same answer
+        wrong = call("POST", "/login", body=b'{"username": "bella", "password": "nope"}')
+        unknown = call("POST", "/login", body=b'{"username": "nobody", "password": "p1"}')
+        self.assertEqual(wrong, unknown)
+        self.assertEqual(wrong[0], 401)
+
+    def test_api_runs_system_calls_off_the_event_loop(self):
+        api = ApiServer(self.system)
+        customer = self.system.register_customer("cleo", "p1", "Cleo")
+        token = api.sessions.issue("customer", "cleo")
+        auth = {"authorization": f"Bearer {token}"}
+        orders = [self.system.place_order(customer, "Home Delivery", {"Pizza": 1}) for _ in range(3)]
+        for order in orders:
+            order.estimated_time -= datetime.timedelta(minutes=5)     # Ready for an agent
+        self.system.check_unassigned_orders()
+        first, waiting = orders[0], orders[2]
+        busy = lambda order: any(agent.current_order is order for agent in self.system.delivery_agents.values())
+        self.assertTrue(busy(first) and not busy(waiting))
+
+        async def scenario():
+            # While a snapshot holds the state lock, an order waits in a worker thread, not on the loop
+            locked, release = threading.Event(), threading.Event()
+            def snapshot():
+                with self.system._state_lock.exclusive():
+                    locked.set()
+                    release.wait(5)
+            holder = threading.Thread(target=snapshot)
+            holder.start()
+            locked.wait(5)
+            request = asyncio.create_task(api.handle("POST", "/orders", auth,
+                                                     b'{"order_type": "Takeaway", "items": {"Pizza": 1}}'))
+            await asyncio.sleep(0.1)
+            self.assertFalse(request.done())
+            release.set()
+            status, _ = await request
+            holder.join()
+            return status, await api.handle("POST", f"/orders/{first.order_id}/cancel", auth)
+
+        status, (cancel_status, _) = asyncio.run(scenario())
+        self.assertEqual((status, cancel_status), (201, 200))
+        # The freed agent is left to the dispatch loop
+        self.assertFalse(busy(waiting))
+        self.system.check_unassigned_orders()
+        self.assertTrue(busy(waiting))
+
+    def test_api_rejects_invalid_content_length(self):
+        api = ApiServer(self.system)
+        async def read(length):
+            reader = asyncio.StreamReader()
+            reader.feed_data(f"POST /login HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+            reader.feed_eof()
+            return await api._read_request(reader)
+        for length in ("abc", "-5"):
+            with self.assertRaises(ApiError) as raised:
+                asyncio.run(read(length))
+            self.assertEqual(raised.exception.status, 400)
+
+    def test_api_server_over_http(self):
+        async def scenario():
+            api = ApiServer(self.system, dispatch_interval=0.05, flush_interval=0.05)
+            server = await api.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            client = HttpClient("127.0.0.1", port)
+            await client.connect()
+            try:
+                status, body = await client.request("POST", "/manager/login",
+                                                    {"username": "manager", "password": "manager123"})
+                client.token = body["token"]
+                status, body = await client.request("GET", "/reports/dashboard")
+                await client.request("POST", "/customers", {"username": "carl", "password": "p", "name": "Carl"})
+                await asyncio.sleep(0.2)  # Let the background flush save the registration
+            finally:
+                await client.close()
+                await api.stop()
+            return status, body
+
+        status, body = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertIn("Total Orders:", body["report"])
+        FoodDeliverySystem._instance = None
+        self.assertIn("carl", FoodDeliverySystem.get_instance().customers)
+
+
+    def test_concurrent_orders_are_not_lost_or_double_assigned(self):
+        self.system.set_autosave(False)
+        for i in range(3, 11):
+            self.system.delivery_agents[f"DA{i}"] = DeliveryAgent(f"DA{i}", f"Agent {i}")
+        customers = [self.system.register_customer(f"stress{i}", "pw", f"Stress {i}") for i in range(8)]
+        orders_per_customer = 50
+        errors = []
+
+        def place_orders(customer):
+            try:
+                for n in range(orders_per_customer):
+                    order = self.system.place_order(customer, "Home Delivery", {"Pizza": 1})
+                    # Make the order ready so that concurrent sweeps compete for it
+                    order.estimated_time = order.order_time - datetime.timedelta(seconds=1)
+                    self.system.check_unassigned_orders()
+            except Exception as e:
+                errors.append(e)
+
+        def flush_repeatedly():
+            for _ in range(20):
+                self.system.snapshot()
+
+        threads = [threading.Thread(target=place_orders, args=(c,)) for c in customers]
+        threads.append(threading.Thread(target=flush_repeatedly))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.system.all_orders), len(customers) * orders_per_customer)
+        self.assertEqual(len({id(o) for o in self.system.all_orders}), len(self.system.all_orders))
+        for customer in customers:
+            self.assertEqual(len(customer.orders), orders_per_customer)
+            self.assertEqual(self.system.get_customer_stats(customer.username).order_count, orders_per_customer)
+        assigned = [a.current_order for a in self.system.delivery_agents.values() if a.current_order]
+        self.assertEqual(len(assigned), len({id(o) for o in assigned}))
+        self.assertGreater(len(assigned), 0)
+        delivering = [o for o in self.system.all_orders if o.status == "Delivering"]
+        self.assertEqual(len(delivering), len(assigned))
+
+
+    def test_place_orders_batch(self):
+        self.system.register_customer("beth", "pw", "Beth Harmon")
+        self.system.register_customer("cole", "pw", "Cole Porter")
+        entries = [
+            {"username": "beth", "order_type": "Takeaway", "items": {"Pizza": 1}},
+            {"username": "cole", "order_type": "Home Delivery", "items": {"Sushi": 2}, "promo_code": "SAVE10"},
+            {"username": "nobody", "order_type": "Takeaway", "items": {"Pizza": 1}},
+            {"username": "beth", "order_type": "Takeaway", "items": {"Ice Cream": 1}},
+            {"username": "cole", "order_type": "Takeaway", "items": {"Pasta": -1}},
+            {"username": "beth", "order_type": "Takeaway", "items": {"Salad": 1}, "promo_code": "BOGUS"},
+        ]
+        orders, errors = self.system.place_orders_batch(entries)
+        self.assertEqual([o.customer for o in orders], ["beth", "cole"])
+        self.assertEqual([index for index, _ in errors], [2, 3, 4, 5])
+        self.assertIn("not available", errors[1][1])
+        self.assertAlmostEqual(orders[1].calculate_total(), 2 * 15.99 * 0.9, places=2)
+        self.assertEqual(len(self.system.all_orders), 2)
+        self.assertEqual(self.system.get_customer_stats("cole").order_count, 1)
+        # The batch is committed once, so a fresh load sees it
+        FoodDeliverySystem._instance = None
+        self.assertEqual(len(FoodDeliverySystem.get_instance().all_orders), 2)
+
+    def test_place_orders_batch_awaits_agents_when_fleet_is_busy(self):
+        self.system.register_customer("dora", "pw", "Dora Explorer")
+        for agent in self.system.delivery_agents.values():
+            agent.current_order = Order("dora", "Takeaway", {"Pizza": 1})
+        orders, errors = self.system.place_orders_batch(
+            [{"username": "dora", "order_type": "Home Delivery", "items": {"Burger": 1}}])
+        self.assertEqual(errors, [])
+        self.assertEqual(orders[0].status, "Awaiting Delivery Agent")
+
+
+    def test_import_customers_csv_in_chunks(self):
+        self.system.register_customer("existing", "pw", "Existing User")
+        progress = []
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "customers.csv")
+            with open(path, "w", newline="") as f:
+                f.write("username,password,name,address,notifications_enabled\n"
+                        "ann,pw1,Ann Lee,1 High St,false\n"
+                        "existing,pw2,Someone Else,,\n"
+                        "ben,pw3,Ben Stone,,\n"
+                        "ann,pw4,Ann Again,,\n"
+                        "nopass,,No Password,,\n")
+            summary = import_records(self.system, "customers", path, chunk_size=2,
+                                     progress=lambda s: progress.append(dict(s)))
+        self.assertEqual(summary, {"read": 5, "imported": 2, "duplicates": 2, "errors": 1})
+        self.assertEqual(len(progress), 3)
+        self.assertFalse(self.system.customers["ann"].notifications_enabled)
+        self.assertEqual(self.system.customers["ann"].address, "1 High St")
+        self.assertEqual(self.system.customers["existing"].name, "Existing User")
+        self.assertEqual(self.system.login_customer("ben", "pw3").name, "Ben Stone")
+
+    def test_import_agents_jsonl_gzip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "agents.jsonl.gz")
+            with gzip.open(path, "wt") as f:
+                f.write('{"agent_id": "DA3", "name": "Agent C"}\n{"agent_id": "DA1", "name": "Dup"}\n')
+            summary = import_records(self.system, "agents", path)
+        self.assertEqual(summary["imported"], 1)
+        self.assertEqual(summary["duplicates"], 1)
+        self.assertEqual(self.system.delivery_agents["DA3"].name, "Agent C")
+        self.assertEqual(self.system.delivery_agents["DA1"].name, "Agent A")
+
+
+    def test_customer_orders_pagination(self):
+        customer = self.system.register_customer("emma", "pw", "Emma Stone")
+        entries = [{"username": "emma", "order_type": "Takeaway", "items": {"Pizza": n}} for n in range(1, 8)]
+        orders, _ = self.system.place_orders_batch(entries)
+        # Spread the orders over seven days, oldest first
+        for days_ago, order in zip(range(7, 0, -1), orders):
+            order.order_time = datetime.datetime.now() - datetime.timedelta(days=days_ago)
+        self.system._rebuild_order_indexes()
+
+        page, cursor = self.system.get_customer_orders_page(customer, page_size=3)
+        self.assertEqual([o.items["Pizza"] for o in page], [7, 6, 5])
+        page, cursor = self.system.get_customer_orders_page(customer, page_size=3, cursor=cursor)
+        self.assertEqual([o.items["Pizza"] for o in page], [4, 3, 2])
+        page, cursor = self.system.get_customer_orders_page(customer, page_size=3, cursor=cursor)
+        self.assertEqual([o.items["Pizza"] for o in page], [1])
+        self.assertIsNone(cursor)
+
+        page, cursor = self.system.get_customer_orders_page(
+            customer, page_size=10,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=4, hours=12),
+            end_date=datetime.datetime.now() - datetime.timedelta(days=1, hours=12))
+        self.assertEqual([o.items["Pizza"] for o in page], [6, 5, 4])
+        self.assertIsNone(cursor)
+
+    def test_manager_orders_pagination_with_status_filter(self):
+        first = self.system.register_customer("finn", "pw", "Finn Wolfhard")
+        second = self.system.register_customer("gina", "pw", "Gina Torres")
+        for customer in [first, second, first, second]:
+            self.system.place_order(customer, "Takeaway", {"Burger": 1})
+        self.system.all_orders[1].status = "Cancelled"
+        self.system.all_orders[3].status = "Cancelled"
+
+        page, cursor = self.system.list_orders_page(page_size=1, status="Cancelled")
+        self.assertEqual(page, [self.system.all_orders[3]])
+        page, cursor = self.system.list_orders_page(page_size=1, cursor=cursor, status="Cancelled")
+        self.assertEqual(page, [self.system.all_orders[1]])
+        self.assertIsNone(cursor)
+        self.assertEqual(len(self.system.list_orders_page(page_size=10)[0]), 4)
+        with self.assertRaises(ValueError):
+            self.system.list_orders_page(cursor="not-a-cursor")
+
+    def test_passwords_stored_as_salted_hashes(self):
+        first = self.system.register_customer("hana", "same-pass", "Hana Lee")
+        second = self.system.register_customer("ivan", "same-pass", "Ivan Petrov")
+        self.assertFalse(hasattr(first, "password"))
+        self.assertNotIn("same-pass", first.password_hash)
+        self.assertNotEqual(first.password_hash, second.password_hash)
+        self.assertTrue(first.check_password("same-pass"))
+        self.assertFalse(first.check_password("other-pass"))
+
+    def test_legacy_plaintext_password_upgraded_on_login(self):
+        customer = self.system.register_customer("jade", "old-pass", "Jade Fox")
+        # Simulate a customer pickled before passwords were hashed
+        state = dict(customer.__dict__)
+        del state["password_hash"]
+        state["password"] = "old-pass"
+        legacy = Customer.__new__(Customer)
+        legacy.__setstate__(state)
+        self.system.customers["jade"] = legacy
+
+        self.assertTrue(legacy.needs_rehash())
+        with self.assertRaises(ValueError):
+            self.system.login_customer("jade", "wrong-pass")
+        self.system.login_customer("jade", "old-pass")
+        self.assertFalse(legacy.needs_rehash())
+        self.assertFalse(hasattr(legacy, "_legacy_password"))
+        self.assertTrue(legacy.check_password("old-pass"))
+
+    def test_session_cache_expiry_and_revocation(self):
+        sessions = SessionCache(ttl_seconds=0.05, max_sessions=2)
+        token = sessions.issue("customer", "kai")
+        self.assertEqual(sessions.resolve(token), ("customer", "kai"))
+        sessions.issue("customer", "lea")
+        sessions.issue("manager", "manager")
+        # The oldest session was dropped to stay within max_sessions
+        self.assertIsNone(sessions.resolve(token))
+        token = sessions.issue("customer", "lea")
+        self.assertEqual(sessions.revoke_user("customer", "lea"), 1)
+        self.assertIsNone(sessions.resolve(token))
+        time.sleep(0.06)
+        self.assertEqual(sessions.purge_expired(), 1)
+        self.assertEqual(len(sessions), 0)
+
+    def test_order_events_published(self):
+        events = []
+        self.system.event_bus.subscribe(events.append)
+        customer = self.system.register_customer("lena", "pw", "Lena Headey")
+        order = self.system.place_order(customer, "Takeaway", {"Salad": 1})
+        order.estimated_time = datetime.datetime.now()
+        self.system.check_unassigned_orders()
+        self.system.check_unassigned_orders()    # Ready is only announced once
+        self.system.mark_order_received(customer, order.order_id)
+        self.assertEqual([e.type for e in events], ["order_placed", "order_ready", "order_delivered"])
+        self.assertEqual(events[-1].status, "Picked Up")
+        self.assertEqual({e.username for e in events}, {"lena"})
+
+    def test_notifications_coalesced_per_customer(self):
+        sink = MemorySink()
+        worker = NotificationWorker(self.system, sink)
+        self.system.event_bus.subscribe(worker.enqueue)
+        mia = self.system.register_customer("mia", "pw", "Mia Wallace")
+        ned = self.system.register_customer("ned", "pw", "Ned Stark")
+        self.system.update_notification_preferences("ned", False)
+        first = self.system.place_order(mia, "Takeaway", {"Pizza": 1})
+        self.system.place_order(ned, "Takeaway", {"Burger": 1})
+        second = self.system.place_order(mia, "Takeaway", {"Sushi": 1})
+        self.system.cancel_order(mia, first.order_id)
+
+        self.assertEqual(worker.flush(), 1)
+        [batch] = sink.batches
+        [notification] = batch
+        self.assertEqual(notification["username"], "mia")
+        # Only the latest event of each order is kept
+        self.assertEqual(sorted((u["order_id"], u["type"]) for u in notification["updates"]),
+                         sorted([(first.order_id, "order_cancelled"), (second.order_id, "order_placed")]))
+        self.assertEqual(worker.suppressed, 1)
+
+    def test_tenants_have_separate_menus_and_stores(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = TenantRegistry(tmp, max_active=2)
+            north = registry.create_tenant("north", menu={"Dosa": 5.5}, agents={"N1": "Nora"})
+            registry.create_tenant("south")
+            customer = north.register_customer("omar", "pw", "Omar Sy")
+            order = north.place_order(customer, "Takeaway", {"Dosa": 2})
+            self.assertAlmostEqual(order.total, 11.0)
+            with self.assertRaises(ValueError):
+                north.place_order(customer, "Takeaway", {"Pizza": 1})
+            self.assertNotIn("omar", registry.get("south").customers)
+            self.assertEqual(list(registry.get("north").delivery_agents), ["N1"])
+            self.assertFalse(os.path.exists(PERSISTENCE_FILE))
+            with self.assertRaises(ValueError):
+                registry.get("../escape")
+
+    def test_tenant_registry_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = TenantRegistry(tmp, max_active=2)
+            for tenant_id in ["a", "b", "c"]:
+                registry.create_tenant(tenant_id)
+            self.assertEqual(registry.active_tenants(), ["b", "c"])
+            registry.get("b")
+            with registry.use("c") as system:
+                system.register_customer("pia", "pw", "Pia Zadora")
+                registry.get("a")
+                # "c" is in use, so the least recently used idle tenant went instead
+                self.assertEqual(registry.active_tenants(), ["c", "a"])
+            # Evicted tenants are reloaded from their own store
+            self.assertIn("pia", TenantRegistry(tmp).get("c").customers)
+            self.assertEqual(registry.evict_idle(0), ["c", "a"])
+            self.assertEqual(len(registry), 0)
+            self.assertEqual(registry.list_tenants(), ["a", "b", "c"])
+
+    def test_tenant_store_loads_do_not_block_other_tenants(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, "tenants")
+            registry = TenantRegistry(base)
+            self.assertEqual(registry.list_tenants(), [])
+            self.assertFalse(os.path.exists(base))      # Created with the first tenant
+            registry.create_tenant("fast")
+            TenantRegistry(base).create_tenant("slow")
+            loading, release = threading.Event(), threading.Event()
+            original = tenants_module.load_system
+            def slow_load(cls, path):
+                loading.set()
+                release.wait(5)
+                return original(cls, path)
+            tenants_module.load_system = slow_load
+            try:
+                loader = threading.Thread(target=registry.get, args=("slow",))
+                loader.start()
+                self.assertTrue(loading.wait(5))
+                start = time.perf_counter()
+                registry.get("fast")
+                self.assertEqual(registry.active_tenants(), ["fast"])
+                self.assertLess(time.perf_counter() - start, 1)
+                release.set()
+                loader.join(5)
+            finally:
+                tenants_module.load_system = original
+            self.assertEqual(registry.active_tenants(), ["fast", "slow"])
+
+    def test_tenant_api_server_routes_per_restaurant(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = TenantRegistry(tmp, max_active=1)
+            registry.create_tenant("north", menu={"Dosa": 5.5})
+            registry.create_tenant("south")
+            registry.close()
+            api = TenantApiServer(registry, sink_factory=lambda tenant_id: MemorySink())
+            async def scenario():
+                await api.handle("POST", "/tenants/north/customers",
+                                 body=b'{"username": "omar", "password": "pw", "name": "Omar"}')
+                _, login = await api.handle("POST", "/tenants/north/login",
+                                            body=b'{"username": "omar", "password": "pw"}')
+                auth = {"authorization": f"Bearer {login['token']}"}
+                placed = await api.handle("POST", "/tenants/north/orders", auth,
+                                          b'{"order_type": "Takeaway", "items": {"Dosa": 2}}')
+                # Sessions belong to one restaurant; loading south unloads north (max_active=1)
+                other = await api.handle("GET", "/tenants/south/orders?limit=5", auth)
+                listed = await api.handle("GET", "/tenants/north/orders?limit=5", auth)
+                missing = await api.handle("GET", "/tenants/west/orders")
+                unrouted = await api.handle("GET", "/orders")
+                return placed, other, listed, missing, unrouted
+            placed, other, listed, missing, unrouted = asyncio.run(scenario())
+            self.assertEqual(placed[0], 201)
+            self.assertAlmostEqual(placed[1]["total"], 11.0)
+            self.assertEqual(other[0], 401)
+            self.assertEqual([o["order_id"] for o in listed[1]["orders"]], [placed[1]["order_id"]])
+            self.assertEqual((missing[0], unrouted[0]), (404, 404))
+            self.assertEqual(registry.active_tenants(), ["north"])
+            self.assertEqual(registry.evict_idle(0), ["north"])
+            asyncio.run(api.stop())
+            self.assertIn("omar", TenantRegistry(tmp).get("north").customers)
+
+    def test_tenant_api_server_lets_go_of_unloaded_restaurants(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = TenantRegistry(tmp, max_active=1)
+            registry.create_tenant("north")
+            registry.create_tenant("south")
+            registry.close()
+            api = TenantApiServer(registry, sink_factory=lambda tenant_id: MemorySink())
+            async def scenario():
+                await api.handle("POST", "/tenants/north/customers",
+                                 body=b'{"username": "omar", "password": "pw", "name": "Omar"}')
+                _, login = await api.handle("POST", "/tenants/north/login",
+                                            body=b'{"username": "omar", "password": "pw"}')
+                north = weakref.ref(registry.get("north"))
+                await api.handle("GET", "/tenants/south/orders")     # Unloads north (max_active=1)
+                gc.collect()
+                unloaded = north() is None
+                # The session outlives the unload and works on the reloaded system
+                listed = await api.handle("GET", "/tenants/north/orders",
+                                          {"authorization": f"Bearer {login['token']}"})
+                return unloaded, listed
+            unloaded, listed = asyncio.run(scenario())
+            self.assertTrue(unloaded)
+            self.assertEqual(listed[0], 200)
+            self.assertIsNone(api._apis["south"].system)
+            self.assertEqual(list(api._notifiers), ["north"])
+            asyncio.run(api.stop())
+
+    def test_order_ids_unique_and_time_sortable(self):
+        generator = OrderIdGenerator()
+        ids = [generator.new_id(1700000000.5) for _ in range(1000)] + [generator.new_id(1700000001.0)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(order_id_time(ids[0]), datetime.datetime.fromtimestamp(1700000000.5))
+
+        customer = self.system.register_customer("quinn", "pw", "Quinn Fabray")
+        first = self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+        second = self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+        self.assertLess(first.order_id, second.order_id)
+        self.system.cancel_order(customer, second.order_id)
+        self.assertEqual(first.status, "Placed")
+        self.assertIs(self.system.find_order(first.order_id), first)
+
+    def test_legacy_order_ids_migrated(self):
+        customer = self.system.register_customer("rosa", "pw", "Rosa Diaz")
+        orders = [self.system.place_order(customer, "Takeaway", {"Salad": 1}) for _ in range(3)]
+        # Simulate a store from before time-sortable ids, where ids collided within a second
+        for order in orders:
+            order.order_id = "O-20250101120000-rosa"
+        orders[0].order_id = "O-20250101115959-rosa"
+        del self.system.orders_by_id
+        restored = pickle.loads(pickle.dumps(self.system))
+
+        restored_orders = restored.customers["rosa"].get_order_history()
+        self.assertTrue(all(is_order_id(o.order_id) for o in restored_orders))
+        self.assertEqual(len({o.order_id for o in restored_orders}), 3)
+        self.assertEqual([o.legacy_order_id for o in restored_orders],
+                         ["O-20250101115959-rosa", "O-20250101120000-rosa", "O-20250101120000-rosa"])
+        self.assertIs(restored.find_order("O-20250101115959-rosa"), restored_orders[0])
+        self.assertIs(restored.find_order(restored_orders[2].order_id), restored_orders[2])
+
+    def test_legacy_orders_priced_from_their_stores_menu(self):
+        customer = self.system.register_customer("lena", "pw", "Lena Olin")
+        order = self.system.place_order(customer, "Takeaway", {"Pizza": 2}, discount=50)
+        # Simulate a store from before price snapshots and the catalog, with its own menu
+        for name in ("unit_prices", "subtotal", "discount_amount", "total"):
+            delattr(order, name)
+        state = self.system.__getstate__()
+        del state["catalog"], state["customer_stats"]
+        state["menu"] = {"Pizza": 20.0}
+        restored = FoodDeliverySystem.__new__(FoodDeliverySystem)
+        restored.__setstate__(pickle.loads(pickle.dumps(state)))
+        legacy = restored.all_orders[0]
+        self.assertEqual(legacy.unit_prices, (20.0,))
+        self.assertAlmostEqual(legacy.total, 20.0)
+        self.assertAlmostEqual(restored.get_customer_stats("lena").total_spend, 20.0)
+        # Later price changes leave the migrated order alone
+        restored.update_menu_prices({"Pizza": 30.0})
+        self.assertAlmostEqual(pickle.loads(pickle.dumps(restored)).all_orders[0].total, 20.0)
+
+    def test_promotion_rules(self):
+        now = datetime.datetime.now()
+        customer = self.system.register_customer("sam", "pw", "Sam Wilson")
+        self.system.add_promotion(Promotion("OLD", 20, expires_at=now - datetime.timedelta(days=1)))
+        self.system.add_promotion(Promotion("ONCE", 20, max_uses_per_customer=1))
+        self.system.add_promotion(Promotion("BIG", 20, min_basket=30))
+        self.system.add_promotion(Promotion("SUSHI", 50, items=["Sushi"]))
+
+        with self.assertRaisesRegex(ValueError, "expired"):
+            self.system.place_order(customer, "Takeaway", {"Pizza": 1}, promo_code="OLD")
+        first = self.system.place_order(customer, "Takeaway", {"Pizza": 1}, promo_code="ONCE")
+        self.assertEqual(first.promo_code, "ONCE")
+        with self.assertRaisesRegex(ValueError, "maximum number of times"):
+            self.system.place_order(customer, "Takeaway", {"Pizza": 1}, promo_code="ONCE")
+        # Cancelling gives the use back
+        self.system.cancel_order(customer, first.order_id)
+        self.system.place_order(customer, "Takeaway", {"Pizza": 1}, promo_code="ONCE")
+        with self.assertRaisesRegex(ValueError, "minimum order"):
+            self.system.place_order(customer, "Takeaway", {"Pizza": 1}, promo_code="BIG")
+        with self.assertRaisesRegex(ValueError, "does not apply"):
+            self.system.place_order(customer, "Takeaway", {"Pizza": 1}, promo_code="SUSHI")
+        # Scoped promotions only discount their items: half of the sushi, none of the pizza
+        order = self.system.place_order(customer, "Takeaway", {"Sushi": 2, "Pizza": 1}, promo_code="SUSHI")
+        self.assertAlmostEqual(order.discount_amount, 15.99, places=2)
+        self.assertEqual(self.system.promotions.uses["ONCE"], 1)
+
+    def test_best_automatic_promotion_and_usage_limit(self):
+        customer = self.system.register_customer("tara", "pw", "Tara Reid")
+        self.system.promo_codes = {}
+        self.system.add_promotion(Promotion("PIZZA5", 5, items=["Pizza"], automatic=True))
+        self.system.add_promotion(Promotion("LAUNCH", 30, max_uses=10, automatic=True))
+        self.assertEqual(self.system.place_order(customer, "Takeaway", {"Burger": 1}).promo_code, "LAUNCH")
+
+        customers = [self.system.register_customer(f"rush{i}", "pw", f"Rush {i}") for i in range(6)]
+        threads = [threading.Thread(target=lambda c=c: [self.system.place_order(c, "Takeaway", {"Pizza": 1})
+                                                        for _ in range(3)]) for c in customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Exactly the remaining nine uses of LAUNCH were given out; later orders got the next best
+        codes = [o.promo_code for o in self.system.all_orders]
+        self.assertEqual(codes.count("LAUNCH"), 10)
+        self.assertEqual(codes.count("PIZZA5"), 9)
+        self.assertEqual(self.system.promotions.uses["LAUNCH"], 10)
+
+    def test_menu_catalog_versions_and_availability(self):
+        customer = self.system.register_customer("ugo", "pw", "Ugo Tognazzi")
+        first_version = self.system.catalog.version
+        before = self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+        version = self.system.update_menu_prices({"Pizza": 14.99, "Salad": 8.0})
+        self.assertEqual(version, first_version + 1)    # Both prices change in one version
+        after = self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+
+        self.assertEqual((before.menu_version, before.total), (first_version, 12.99))
+        self.assertEqual((after.menu_version, after.total), (version, 14.99))
+        self.assertEqual(self.system.catalog.price_at("Pizza", before.menu_version), 12.99)
+
+        self.system.set_menu_item_available("Sushi", False)
+        with self.assertRaisesRegex(ValueError, "not available"):
+            self.system.place_order(customer, "Takeaway", {"Sushi": 1})
+        self.system.set_menu_item_available("Sushi", True)
+        self.system.place_order(customer, "Takeaway", {"Sushi": 1})
+
+    def test_menu_catalog_lookup_and_persistence(self):
+        item = self.system.add_menu_item("Ramen", 13.5, category="Mains")
+        self.assertEqual(self.system.catalog.find(item.item_id).name, "Ramen")
+        self.assertIn("Ramen", [i.name for i in self.system.catalog.by_category()["Mains"]])
+        with self.assertRaises(ValueError):
+            self.system.add_menu_item("Ramen", 10)
+        with self.assertRaises(ValueError):
+            self.system.update_menu_prices({"Unknown": 1})
+        # The catalog and its price history survive a reload
+        FoodDeliverySystem._instance = None
+        reloaded = FoodDeliverySystem.get_instance()
+        self.assertEqual(reloaded.menu["Ramen"], 13.5)
+        self.assertEqual(reloaded.catalog.version, self.system.catalog.version)
+
+    def test_benchmark_suite_report_and_baseline(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            baseline_path = os.path.join(tmpdir, "baseline.json")
+            args = ["--sizes", "200", "--operations", "place_order", "get_order_details", "save_system",
+                    "--iterations", "5", "--quiet"]
+            self.assertEqual(benchmark_suite.main(args + ["--out", baseline_path]), 0)
+            with open(baseline_path) as f:
+                report = json.load(f)
+            self.assertEqual([r["operation"] for r in report["results"]],
+                             ["place_order", "get_order_details", "save_system"])
+            for result in report["results"]:
+                self.assertEqual((result["size"], result["count"]), (200, 5))
+                self.assertGreater(result["ops_per_second"], 0)
+                self.assertIn("p99", result["latency_ms"])
+                self.assertIn("peak_memory_bytes", result)
+
+        # A throughput drop beyond the threshold is flagged as a regression
+        slower = [dict(r, ops_per_second=r["ops_per_second"] / 2) for r in report["results"]]
+        comparison = benchmark_suite.compare(slower, report, threshold=10)
+        self.assertTrue(all(c["regression"] for c in comparison))
+        self.assertFalse(any(c["regression"] for c in benchmark_suite.compare(report["results"], report, 10)))
+
+    def test_generated_dataset_is_reproducible(self):
+        end = datetime.datetime(2025, 3, 1, 20, 0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            stores = []
+            for name in ["a.pkl", "b.pkl"]:
+                system = FoodDeliverySystem()
+                system.persistence_file = os.path.join(tmpdir, name)
+                summary = generate_dataset(system, 2000, customers=100, agents=5, days=7, end=end, seed=3)
+                stores.append(system.persistence_file)
+            self.assertEqual(summary["orders"], 2000)
+            generated = load_system(FoodDeliverySystem, stores[0])
+            again = load_system(FoodDeliverySystem, stores[1])
+
+        self.assertEqual([(o.order_id, o.customer, o.items, o.status, o.rating) for o in generated.all_orders],
+                         [(o.order_id, o.customer, o.items, o.status, o.rating) for o in again.all_orders])
+        self.assertEqual((len(generated.customers), len(generated.delivery_agents)), (100, 5))
+        times = [o.order_time for o in generated.all_orders]
+        self.assertEqual(times, sorted(times))
+        self.assertTrue(end - datetime.timedelta(days=7) <= times[0] and times[-1] < end)
+        self.assertEqual(sorted(o.order_id for o in generated.all_orders), [o.order_id for o in generated.all_orders])
+        # Orders from the last hour are still open; older ones have finished or were cancelled
+        self.assertTrue(all(o.status == "Placed" for o in generated.all_orders
+                            if end - o.order_time < datetime.timedelta(minutes=60)))
+        self.assertIn("Cancelled", {o.status for o in generated.all_orders})
+        self.assertTrue(all(o.status == "Delivered" for o in generated.all_orders if o.rating is not None))
+        stats = generated.get_customer_stats("user0000000")
+        self.assertEqual(stats.order_count, len(generated.customers["user0000000"].orders))
+        self.assertIsNotNone(generated.login_customer("user0000000", "password123"))
+        self.assertIsNotNone(generated.find_order(generated.all_orders[0].order_id))
+        with self.assertRaises(ValueError):
+            generate_dataset(generated, 10)
+
+    @unittest.skipUnless(hasattr(time, "tzset"), "Changing the local timezone needs time.tzset")
+    def test_generated_dataset_does_not_depend_on_timezone(self):
+        original = os.environ.get("TZ")
+        runs = []
+        try:
+            # POSIX rules, so no timezone database is needed
+            for zone in ["UTC0", "EST+05EDT,M3.2.0,M11.1.0", "IST-05:30"]:
+                os.environ["TZ"] = zone
+                time.tzset()
+                system = FoodDeliverySystem()
+                system.set_autosave(False)
+                generate_dataset(system, 500, customers=50, agents=3, days=10, seed=5)
+                runs.append([(o.order_id, o.order_time.timestamp(), o.items, o.status_history, o.rating)
+                             for o in system.all_orders])
+                self.assertEqual(system.get_customer_stats("user0000000").order_count,
+                                 len(system.customers["user0000000"].orders))
+        finally:
+            if original is None:
+                os.environ.pop("TZ", None)
+            else:
+                os.environ["TZ"] = original
+            time.tzset()
+        self.assertEqual(len(runs[0]), 500)
+        self.assertEqual(runs[0], runs[1])
+        self.assertEqual(runs[0], runs[2])
+
+    def test_autosave_records_save_timings(self):
+        REGISTRY.reset()
+        customer = self.system.register_customer("ivy", "pass1", "Ivy")
+        self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+
+        # Each change saved once, although the flush ran inside the timed change
+        self.assertIsNone(REGISTRY.value("fds_method_duration_seconds", method="flush"))
+        self.assertEqual(REGISTRY.value("fds_persistence_save_seconds", stage="serialize"), 2)
+        self.assertEqual(REGISTRY.value("fds_persistence_save_seconds", stage="write"), 2)
+        text = REGISTRY.render()
+        self.assertIn("# TYPE fds_persistence_save_seconds summary", text)
+        self.assertIn('fds_persistence_save_seconds_count{stage="write"} 2', text)
+
+    def test_metrics_recorded_and_exported(self):
+        REGISTRY.reset()
+        customer = self.system.register_customer("mia", "pass1", "Mia")
+        order = self.system.place_order(customer, "Home Delivery", {"Pizza": 1})
+        with self.assertRaises(ValueError):
+            self.system.place_order(customer, "Home Delivery", {"Nothing": 1})
+        self.system.get_order_details(order.order_id)    # Calls find_order, which is not counted again
+        self.system.check_unassigned_orders()
+
+        self.assertEqual(REGISTRY.value("fds_method_duration_seconds", method="place_order"), 2)
+        self.assertEqual(REGISTRY.value("fds_method_errors_total", method="place_order"), 1)
+        self.assertIsNone(REGISTRY.value("fds_method_duration_seconds", method="find_order"))
+        self.assertGreater(REGISTRY.value("fds_persistence_bytes_written_total"), 0)
+        self.assertEqual(REGISTRY.value("fds_idle_agents"), 2)
+        text = asyncio.run(ApiServer(self.system).handle("GET", "/metrics"))[1]
+        self.assertIn("# TYPE fds_method_duration_seconds summary", text)
+        self.assertIn('fds_method_duration_seconds_count{method="place_order"} 2', text)
+        self.assertIn('fds_method_duration_seconds{method="place_order",quantile="0.99"}', text)
+        self.assertIn("fds_orders_awaiting_agent 0", text)
+
+        # Turned off, nothing more is recorded
+        REGISTRY.enabled = False
+        try:
+            self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+        finally:
+            REGISTRY.enabled = True
+        self.assertEqual(REGISTRY.value("fds_method_duration_seconds", method="place_order"), 2)
+
+    def test_session_profiler_times_handlers_without_input_waits(self):
+        def slow_input(prompt=""):
+            time.sleep(0.05)
+            return "1"
+        def handle_choice(system):
+            return input("Choice: ") + system
+        ui = types.SimpleNamespace(handle_choice=handle_choice, helper=lambda: None)
+        original_input = builtins.input
+        builtins.input = slow_input
+        try:
+            profiler = SessionProfiler("all")
+            self.assertEqual(profiler.time_handlers(ui), 1)
+            profiler.start()
+            self.assertEqual(ui.handle_choice("!"), "1!")
+            profiler.stop()
+        finally:
+            builtins.input = original_input
+        self.assertIs(ui.handle_choice, handle_choice)     # Unwrapped again on stop
+        self.assertGreaterEqual(profiler.input_wait, 0.05)
+        self.assertLess(profiler.handler_times["handle_choice"].total, 0.04)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "profile.txt")
+            profiler.write(path)
+            with open(path) as f:
+                report = f.read()
+            self.assertTrue(os.path.exists(path + ".pstats"))
+        self.assertIn("handle_choice", report)
+        self.assertIn("=== CPU: top", report)
+        self.assertIn("=== Memory: peak traced", report)
+        with self.assertRaises(ValueError):
+            SessionProfiler("disk")
+
+
+    def test_loading_a_store_does_not_freeze_the_collector(self):
+        customer = self.system.register_customer("alice", "pw", "Alice")
+        self.system.place_order(customer, "Takeaway", {"Pizza": 2})
+        frozen = gc.get_freeze_count()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "store.pkl")
+            save_system(self.system, path)
+            loaded = load_system(FoodDeliverySystem, path)
+        self.assertEqual(len(loaded.all_orders), 1)
+        self.assertIs(loaded.customers["alice"].orders[0], loaded.all_orders[0])
+        # Only the startup path freezes, and the collector runs again after the load
+        self.assertEqual(gc.get_freeze_count(), frozen)
+        self.assertTrue(gc.isenabled())
+
+    def test_startup_benchmark_budget_and_baseline(self):
+        results = [{"size": 1000, "time_to_prompt_s": 0.5},
+                   {"size": 10000, "time_to_prompt_s": 0.9}]
+        baseline = {"results": [{"size": 1000, "time_to_prompt_s": 0.5},
+                                {"size": 10000, "time_to_prompt_s": 0.6}]}
+        self.assertEqual(startup_benchmark.check(results), [])
+        over_budget = startup_benchmark.check(results, budget=0.8)
+        self.assertEqual([(f["size"], f["reason"]) for f in over_budget], [(10000, "over the 0.8s budget")])
+        regressions = startup_benchmark.check(results, baseline=baseline, threshold=20)
+        self.assertEqual([f["size"] for f in regressions], [10000])
+
+    def test_batch_script_runs_commands_without_prompts(self):
+        script = [
+            "# Register, order and cancel",
+            '{"cmd": "register", "username": "amy", "password": "pw", "name": "Amy"}',
+            '{"cmd": "order", "order_type": "Home Delivery", "items": {"Pizza": 2}, "ref": "first"}',
+            '{"cmd": "order", "order_type": "Takeaway", "items": {"Nothing": 1}}',
+            '{"cmd": "cancel", "ref": "first"}',
+            "not json",
+            '{"cmd": "report", "kind": "popular-items"}',
+            "",
+            '{"cmd": "logout"}',
+            '{"cmd": "order", "order_type": "Takeaway", "items": {"Pizza": 1}}',
+            '{"cmd": "fly"}',
+        ]
+        saves = []
+        original_flush = FoodDeliverySystem.flush
+        def flush(system):
+            saves.append(original_flush(system))
+            return saves[-1]
+        out = io.StringIO()
+        FoodDeliverySystem.flush = flush
+        try:
+            summary = run_script(self.system, script, out)
+        finally:
+            FoodDeliverySystem.flush = original_flush
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        self.assertEqual([(r["line"], r["cmd"], r["ok"]) for r in results],
+                         [(2, "register", True), (3, "order", True), (4, "order", False), (5, "cancel", True),
+                          (6, None, False), (7, "report", True), (9, "logout", True), (10, "order", False),
+                          (11, "fly", False)])
+        self.assertEqual(results[3]["result"]["order_id"], results[1]["result"]["order_id"])
+        self.assertIn("Pizza", results[5]["result"]["report"])
+        self.assertEqual(results[7]["error"], "Please log in first.")
+        self.assertEqual(self.system.customers["amy"].orders[0].status, "Cancelled")
+        self.assertEqual((summary["commands"], summary["ok"], summary["errors"]), (9, 5, 4))
+        self.assertEqual(summary["latency_ms"]["order"]["count"], 3)
+        self.assertEqual(summary["latency_ms"]["invalid"]["count"], 2)
+        self.assertEqual(saves, [True])     # Saved once, at the end
+
+        # Stops at the first failure when asked
+        summary = run_script(self.system, ['{"cmd": "dispatch"}', "{}", '{"cmd": "dispatch"}'], stop_on_error=True)
+        self.assertEqual((summary["commands"], summary["errors"]), (2, 1))
+
+    def test_journal_records_and_replays_calls(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.jsonl.gz")
+            recorder = JournalRecorder(path).attach(self.system)
+            customer = self.system.register_customer("jay", "secret", "Jay")
+            first = self.system.place_order(customer, "Home Delivery", {"Burger": 1})
+            second = self.system.place_order(customer, "Takeaway", {"Pizza": 2})
+            self.system.cancel_order(customer, second.order_id)
+            with self.assertRaises(ValueError):
+                self.system.login_customer("jay", "wrong")
+            self.system.set_autosave(False)     # Persistence plumbing is not recorded
+            recorder.close()
+            self.system.find_customer("jay")    # Not recorded once closed
+            records = list(read_trace(path))
+
+            self.assertEqual([r["m"] for r in records], ["register_customer", "place_order", "place_order",
+                                                         "cancel_order", "login_customer"])
+            self.assertEqual(recorder.count, 5)
+            self.assertNotIn("secret", json.dumps(records))
+            # Passwords are keyed with the trace's own random key, so traces do not share digests
+            with gzip.open(path, "rt") as f:
+                key = bytes.fromhex(json.loads(f.readline())["digest_key"])
+            digest = "hmac-sha256:" + hmac.new(key, b"secret", hashlib.sha256).hexdigest()
+            self.assertEqual(records[0]["a"]["password"], digest)
+            other = JournalRecorder(os.path.join(tmp, "other.jsonl"))
+            other.close()
+            with open(other.path) as f:
+                self.assertNotEqual(json.loads(f.readline())["digest_key"], key.hex())
+            self.assertEqual(records[1]["a"]["customer"], {"$customer": "jay"})
+            self.assertEqual(records[2]["r"], [second.order_id])
+            self.assertEqual(records[4]["e"], "Incorrect password.")
+            self.assertIsNone(self.system._journal)
+
+            # Replaying against a fresh system re-creates the same orders under new ids
+            fresh = FoodDeliverySystem()
+            summary = replay_trace(fresh, path)
+            self.assertEqual((summary["calls"], summary["errors"], summary["mismatched"]), (5, 1, 0))
+            self.assertEqual(summary["methods"]["place_order"]["count"], 2)
+            self.assertIn("recorded_p99_ms", summary["methods"]["place_order"])
+            replayed = fresh.customers["jay"].orders
+            self.assertEqual([order.status for order in replayed], [first.status, "Cancelled"])
+            self.assertNotEqual(replayed[1].order_id, second.order_id)
+
+            # Paced replay reports how late calls started
+            summary = replay_trace(FoodDeliverySystem(), path, speed=1000)
+            self.assertIn("max_lag_ms", summary)
+
+    def test_old_finished_orders_archived_and_still_queried(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            system = FoodDeliverySystem()
+            system.persistence_file = os.path.join(tmp, "store.pkl")
+            ann = system.register_customer("ann", "pw", "Ann")
+            orders = [system.place_order(ann, "Takeaway", {"Pizza": 1 + i}) for i in range(5)]
+            # The first three finished 40 days ago; the fourth is old but still open
+            old = time.time() - 40 * 86400
+            for order, status in zip(orders[:4], ["Picked Up", "Cancelled", "Picked Up", "Placed"]):
+                order.order_time = datetime.datetime.fromtimestamp(old)
+                order.status_history = [("Placed", old)]
+                if status != "Placed":
+                    order.status = status
+                    order.status_history[-1] = (status, old)
+            system._rebuild_order_indexes()
+            report = system.manager.view_restaurant_pov(system.order_history())
+            page_ids = [order.order_id for order in system.list_orders_page(10)[0]]
+
+            self.assertEqual(system.archive_orders(older_than_days=30), 3)
+            self.assertEqual(len(system.all_orders), 2)
+            self.assertEqual(system.customers["ann"].orders, orders[3:])
+            self.assertNotIn(orders[0].order_id, system.orders_by_id)
+            self.assertEqual(system.archive_orders(older_than_days=30), 0)
+
+            # History, lookups and reports still see archived orders
+            reloaded = load_system(FoodDeliverySystem, system.persistence_file)
+            ann = reloaded.customers["ann"]
+            self.assertEqual(len(reloaded.all_orders), 2)
+            self.assertEqual(len(reloaded.order_history()), 5)
+            self.assertEqual(reloaded.manager.view_restaurant_pov(reloaded.order_history()), report)
+            self.assertEqual(sorted(o.order_id for o in reloaded.get_customer_orders(ann)),
+                             sorted(o.order_id for o in orders))
+            archived = reloaded.find_order(orders[1].order_id, ann)
+            self.assertEqual((archived.status, archived.total), ("Cancelled", orders[1].total))
+            with self.assertRaises(ValueError):
+                reloaded.cancel_order(ann, orders[0].order_id)
+
+            # Pages merge memory and the archive, newest first, across cursors
+            first, cursor = reloaded.list_orders_page(2)
+            rest, end = reloaded.list_orders_page(10, cursor)
+            self.assertEqual([order.order_id for order in first + rest], page_ids)
+            self.assertIsNone(end)
+            history, _ = reloaded.get_customer_orders_page(ann, 10)
+            self.assertEqual(len(history), 5)
+            self.assertEqual([o.order_id for o in reloaded.list_orders_page(10, status="Cancelled")[0]],
+                             [orders[1].order_id])
+
+            # A finished order archived but still in memory (its snapshot not yet saved) counts once
+            latest = reloaded.find_order(orders[4].order_id)
+            latest.status = "Picked Up"
+            reloaded._order_archive().add([latest])
+            for history in (reloaded.order_history(), reloaded.order_history(statuses=["Picked Up"])):
+                self.assertEqual(len(history), len(list(history)))
+            self.assertEqual(len(reloaded.order_history()), 5)
+
+    def test_archiving_does_not_block_changes_while_writing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            system = FoodDeliverySystem()
+            system.persistence_file = os.path.join(tmp, "store.pkl")
+            ann = system.register_customer("ann", "pw", "Ann")
+            bob = system.register_customer("bob", "pw", "Bob")
+            order = system.place_order(ann, "Takeaway", {"Pizza": 1})
+            old = time.time() - 40 * 86400
+            order.order_time = datetime.datetime.fromtimestamp(old)
+            order.status_history = [("Placed", old), ("Delivered", old)]
+            order._status = "Delivered"
+            system._rebuild_order_indexes()
+
+            # While the archive is written, other customers' changes (and a rating) go through
+            archive = system._order_archive(create=True)
+            write = archive.add
+            changes = []
+            def add(orders):
+                written = write(orders)
+                if not changes:
+                    worker = threading.Thread(target=lambda: (system.place_order(bob, "Takeaway", {"Pasta": 1}),
+                                                              system.rate_order(ann, order.order_id, 4, "Good")))
+                    worker.start()
+                    worker.join(5)
+                    changes.append(not worker.is_alive())
+                return written
+            archive.add = add
+
+            self.assertEqual(system.archive_orders(older_than_days=30), 1)
+            self.assertEqual(changes, [True])
+            self.assertEqual([o.customer for o in system.all_orders], ["bob"])
+            # The rating given meanwhile reached the archived copy
+            archived = load_system(FoodDeliverySystem, system.persistence_file).find_order(order.order_id)
+            self.assertEqual((archived.rating, archived.feedback), (4, "Good"))
+
+    def test_only_sessions_archive_and_standalone_commands_load_no_store(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                system = FoodDeliverySystem()
+                system.persistence_file = PERSISTENCE_FILE
+                ann = system.register_customer("ann", "pw", "Ann")
+                order = system.place_order(ann, "Takeaway", {"Pizza": 1})
+                old = time.time() - 40 * 86400
+                order.order_time = datetime.datetime.fromtimestamp(old)
+                order.status_history = [("Placed", old), ("Picked Up", old)]
+                order._status = "Picked Up"
+                system._rebuild_order_indexes()
+                system.save_state()
+
+                # Exporting reads the store without archiving or rewriting it
+                saved = os.path.getmtime(PERSISTENCE_FILE)
+                FoodDeliverySystem._instance = None
+                app_main.main(["export", "orders", "--out", "orders.csv"])
+                self.assertEqual(len(load_system(FoodDeliverySystem, PERSISTENCE_FILE).all_orders), 1)
+                self.assertEqual(os.path.getmtime(PERSISTENCE_FILE), saved)
+                self.assertFalse(os.path.exists(PERSISTENCE_FILE + ".archive.sqlite"))
+
+                # Generating writes only its own store
+                os.remove(PERSISTENCE_FILE)
+                FoodDeliverySystem._instance = None
+                with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                    app_main.main(["generate", "--orders", "20", "--out", "generated.pkl"])
+                self.assertTrue(os.path.exists("generated.pkl"))
+                self.assertFalse(os.path.exists(PERSISTENCE_FILE))
+            finally:
+                os.chdir(cwd)
+                FoodDeliverySystem._instance = None
+                gc.unfreeze()
+
+    def test_live_tracking_redraws_only_changed_rows(self):
+        customer = self.system.register_customer("liv", "pass", "Liv")
+        finished = self.system.place_order(customer, "Takeaway", {"Pizza": 1})
+        self.system.cancel_order(customer, finished.order_id)
+        delivery = self.system.place_order(customer, "Home Delivery", {"Burger": 1})
+        pickup = self.system.place_order(customer, "Takeaway", {"Pizza": 2})
+        tracker = OrderTracker(self.system, customer).start()
+        try:
+            # Only open orders are tracked; unchanged rows are not returned again
+            self.assertEqual(tracker.active, [delivery.order_id, pickup.order_id])
+            now = delivery.order_time + datetime.timedelta(seconds=30.5)
+            rows = dict(tracker.refresh(now))
+            self.assertIn("1m 29s left", rows[delivery.order_id])
+            self.assertEqual(tracker.refresh(now), [])
+            self.assertAlmostEqual(tracker.next_refresh, 0.5, places=3)
+
+            # Events bring in new orders and finish old ones, which then drop out
+            self.system.cancel_order(customer, pickup.order_id)
+            extra = self.system.place_order(customer, "Takeaway", {"Burger": 1})
+            self.assertTrue(tracker.changed.is_set())
+            rows = dict(tracker.refresh(now))
+            self.assertEqual(set(rows), {pickup.order_id, extra.order_id})
+            self.assertIn("Cancelled", rows[pickup.order_id])
+            self.assertEqual(tracker.active, [delivery.order_id, extra.order_id])
+
+            # Redrawn in place on a terminal
+            out = io.StringIO()
+            view = LiveOrderView(out, in_place=True)
+            view.draw([(delivery.order_id, "a"), (extra.order_id, "b")])
+            view.draw([(delivery.order_id, "c")])
+            self.assertEqual(out.getvalue(), "a\nb\n\x1b[2A\r\x1b[2Kc\x1b[2B\r")
+
+            # However often tracking refreshes, dispatch sweeps are shared
+            self.system.check_unassigned_orders()
+            swept = self.system._last_dispatch
+            track_orders(self.system, tracker, LiveOrderView(io.StringIO()), lambda timeout, changed: True)
+            self.assertEqual(self.system._last_dispatch, swept)
+        finally:
+            tracker.stop()
+        self.assertFalse(self.system.event_bus.has_subscribers())
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file